@@ -2,7 +2,7 @@
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 load_dotenv()
 
@@ -49,6 +49,30 @@ class Settings(BaseModel):
     CSV_CLEANUP_INTERVAL_HOURS: int = int(os.getenv("CSV_CLEANUP_INTERVAL_HOURS"))
     CLICKHOUSE_CLEANUP_INTERVAL_HOURS: int = int(os.getenv("CLICKHOUSE_CLEANUP_INTERVAL_HOURS"))
 
+    # === CSV ingestion ===
+    CSV_READ_CHUNK_BYTES: int = int(os.getenv("CSV_READ_CHUNK_BYTES", str(1024 * 1024)))
+    CSV_BATCH_ROWS: int = int(os.getenv("CSV_BATCH_ROWS", "20000"))
+    CSV_INGEST_WORKERS: int = int(os.getenv("CSV_INGEST_WORKERS", "2"))
+    CSV_INGEST_MAX_PENDING: int = int(os.getenv("CSV_INGEST_MAX_PENDING", "8"))
+    CSV_SPOOL_DIR: Optional[str] = os.getenv("CSV_SPOOL_DIR") or None
+    CSV_PARSE_PROCESSES: int = int(os.getenv("CSV_PARSE_PROCESSES", "2"))
+    CSV_PARSE_BLOCK_BYTES: int = int(os.getenv("CSV_PARSE_BLOCK_BYTES", str(8 * 1024 * 1024)))
+    CSV_UPLOAD_PART_BYTES: int = int(os.getenv("CSV_UPLOAD_PART_BYTES", str(8 * 1024 * 1024)))
+    CSV_UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("CSV_UPLOAD_SESSION_TTL_HOURS", "24"))
+    CSV_UPLOAD_MAX_BYTES: int = int(os.getenv("CSV_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    ARTICLE_RULES_PATH: str = os.getenv("ARTICLE_RULES_PATH") or os.path.join(os.path.dirname(__file__), "article_rules.json")
+    # Every file of a batch needs an ingest slot, so a batch is never allowed more files than there are slots
+    CSV_BATCH_MAX_FILES: int = min(
+        int(os.getenv("CSV_BATCH_MAX_FILES", str(CSV_INGEST_WORKERS + CSV_INGEST_MAX_PENDING))),
+        CSV_INGEST_WORKERS + CSV_INGEST_MAX_PENDING,
+    )
+    CSV_ROW_FINGERPRINTS: bool = os.getenv("CSV_ROW_FINGERPRINTS", "true").lower() == "true"
+    CSV_ARROW_FILE_TYPES: List[str] = [t.strip() for t in os.getenv("CSV_ARROW_FILE_TYPES", "").split(",") if t.strip()]
+    CSV_VALIDATE_SAMPLE_ROWS: int = int(os.getenv("CSV_VALIDATE_SAMPLE_ROWS", "250"))
+    CSV_DELETE_BATCH_ROWS: int = int(os.getenv("CSV_DELETE_BATCH_ROWS", "5000"))
+    CSV_DELETE_MAX_ROWS_PER_SECOND: int = int(os.getenv("CSV_DELETE_MAX_ROWS_PER_SECOND", "20000"))
+    PHONE_NORMALIZE_CACHE_SIZE: int = int(os.getenv("PHONE_NORMALIZE_CACHE_SIZE", "100000"))
+
     @property
     def database_url(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
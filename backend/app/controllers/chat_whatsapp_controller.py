@@ -1,9 +1,9 @@
 # app/controllers/chat_whatsapp_controller.py
 import logging
-from typing import List, Tuple, Optional
+from typing import IO, Any, Dict, Iterator, List, Tuple, Optional, Union
 import pandas as pd
-from io import StringIO
-from app.model.csv import ChatWhatsappRaw, JKT
+from app.utils.csv_spec import compile_spec, parse_csv
+from app.utils.ingest_report import IngestReport
 
 logger = logging.getLogger(__name__)
 
@@ -42,112 +42,66 @@ def _parse_custom_date(raw_date_series: pd.Series) -> pd.Series:
         )
     return parsed_dates
 
-async def parse_chat_whatsapp_csv(decoded_content: str, upload_id: int) -> Tuple[List[ChatWhatsappRaw], int]:
-    rows_to_add: List[ChatWhatsappRaw] = []
-    processed_row_count = 0
-    df = None
+def _clean_text_column(values: pd.Series) -> pd.Series:
+    # Tabs are dropped from string cells only and cells left empty become missing, as df.replace did before
+    if values.dtype != object:
+        return values
+    replaced = values.str.replace("\t", "", regex=False)
+    cleaned = replaced.where(replaced.notna() | values.isna(), values)
+    return cleaned.mask(cleaned.eq(""), None)
 
-    content_io = StringIO(decoded_content)
-
-    try:
-        df = pd.read_csv(content_io) 
-        logger.info("Standard parsing successful!")
-    except Exception as parse_error:
-        logger.info(f"Standard parsing failed: {parse_error}")
-        content_io.seek(0)
-    finally:
-        content_io.close()
-
-    if df is None or df.empty:
-        raise ValueError("CSV file is empty or could not be parsed correctly after UTF-8 decoding.")
-    
+def _drop_untyped_rows(df: pd.DataFrame) -> pd.DataFrame:
     logger.info(f"Initial data read, {len(df)} rows.")
-    
-    logger.info("=== CLEANING HEADERS ===")
-    df.columns = (
-        df.columns
-        .str.strip()
-        .str.replace(r"\s+", " ", regex=True)
-    )
-    
-    logger.info(f"CSV columns found after cleaning: {list(df.columns)}")
-
-    required_columns_cleaned = ['Content', 'Chats']
-    missing_cols = [col for col in required_columns_cleaned if col not in df.columns]
-    if missing_cols:
-        logger.info(f"Missing required columns AFTER cleaning: {missing_cols}. Available: {list(df.columns)}")
-        raise ValueError(f"Missing required columns: {missing_cols}")
+    return df.dropna(subset=['Type'])
 
-    logger.info("=== RUNNING FILTER TRANSFORMATION LOGIC ===")
-    df = df.dropna(subset=['Type'])
-    df = df.replace("\t", "", regex=True)
-    df = df.replace("", None, regex=True)
-    df = df.drop_duplicates()
+def _clean_text_columns(df: pd.DataFrame) -> pd.DataFrame:
+    for col in [*HEADER_TO_MODEL_MAP, 'Name']:
+        if col in df.columns and col != 'Date':
+            df[col] = _clean_text_column(df[col])
+    return df.drop_duplicates()
 
+def _drop_group_chats(df: pd.DataFrame) -> pd.DataFrame:
     group_chat_window = df[~df['Chats'].str.startswith('+', na=False)]
+    group_chat_names = group_chat_window['Name'].unique()
 
-    group_chat_window_names = group_chat_window['Name'].unique(),group_chat_window['Name'].count()
-
-    guest_chat_window = df[~df['Name'].isin(group_chat_window_names[0])]
-
-    df = guest_chat_window[~guest_chat_window['Chats'].isin(group_chat_window_names[0])]
-
-    df = df.copy()
-
-    logger.info("=== CONVERTING DATA TYPES ===")
-    if 'Date' in df.columns:
-        logger.info("Converting 'Date' column...")
-        df.loc[:, 'Date'] = _parse_custom_date(df['Date'])
-        failed_dates = df['Date'].isna().sum()
+    guest_chat_window = df[~df['Name'].isin(group_chat_names)]
+    return guest_chat_window[~guest_chat_window['Chats'].isin(group_chat_names)].copy()
 
+def _parse_message_dates(df: pd.DataFrame) -> pd.DataFrame:
+    df['Date'] = _parse_custom_date(df['Date'])
+    failed_dates = df['Date'].isna().sum()
     if failed_dates > 0:
         logger.warning(f"{failed_dates} date values could not be parsed and will be set to NULL.")
 
     df = df.dropna(subset=['Date']).copy()
     logger.info(f"After filtering invalid dates: {len(df)} rows.")
+    return df
+
+# Group-chat filtering and de-duplication need the whole export, so the
+# frame is read in one pass; only row materialization is batched.
+CHAT_WHATSAPP_SPEC = {
+    "file_type": "chat_whatsapp",
+    "header_map": HEADER_TO_MODEL_MAP,
+    "column_types": {
+        "phone_number": "text",
+        "message_type": "text",
+        "message": "text",
+        "message_date": "local_datetime",
+    },
+    "extra_columns": ["Name"],
+    "required_columns": ["Content", "Chats", "Date"],
+    "row_filters": [_drop_untyped_rows, _clean_text_columns, _drop_group_chats],
+    "hooks": [_parse_message_dates],
+    "whole_file": True,
+}
 
-    logger.info("=== PROCESSING ROWS ===")
-    processed_row_count = 0
-    for index, row in df.iterrows():
-        kwargs ={}
-        valid_row = False
-        
-        for csv_header_orig, model_attr in HEADER_TO_MODEL_MAP.items():
-            cleaned_header = ' '.join(csv_header_orig.strip().split())
-
-            if cleaned_header in df.columns and pd.notna(row[cleaned_header]):
-                raw_value = row[cleaned_header]
-                converted_value = None
-                try:
-                    if isinstance(raw_value, pd.Timestamp):
-                        py_datetime = raw_value.to_pydatetime()
-                        
-                        if model_attr == 'message_date' and py_datetime.tzinfo is None:
-                            converted_value = py_datetime.replace(tzinfo=JKT)
-                        else:
-                            converted_value = py_datetime
-                        
-                    else:
-                        converted_value = str(raw_value).strip()
-
-                    kwargs[model_attr] = converted_value
-                    valid_row = True
-                        
-                except Exception as e:
-                    logger.warning(f"Error converting row {index} for {model_attr}: {e}")
-                    converted_value = None
-
-        if valid_row:
-            rows_to_add.append(
-                ChatWhatsappRaw(
-                    csv_upload_id=upload_id,
-                    **kwargs
-                )
-            )
-            processed_row_count += 1
-
-    if not rows_to_add:
-        raise ValueError("No valid data rows found after parsing and filtering.")
+CHAT_WHATSAPP_PLAN = compile_spec(CHAT_WHATSAPP_SPEC)
 
-    logger.info(f"Successfully parsed {processed_row_count} rows from chat_whatsapp CSV.")
-    return rows_to_add, processed_row_count
\ No newline at end of file
+def parse_chat_whatsapp_csv(
+    source: Union[IO[bytes], IO[str]],
+    upload_id: int,
+    batch_rows: Optional[int] = None,
+    lenient: bool = False,
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[Dict[str, List[Any]], int]]:
+    return parse_csv(CHAT_WHATSAPP_PLAN, source, upload_id, batch_rows=batch_rows, lenient=lenient, report=report)
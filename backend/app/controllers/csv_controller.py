@@ -1,26 +1,300 @@
 # app/controllers/csv_controller.py
+import asyncio
+import codecs
 import logging
 import hashlib
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from typing import IO, Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
+from app.config.settings import settings
+from app.db.database import SessionLocal
+from app.jobs import csv_delete as delete_jobs
+from app.jobs import csv_ingest as ingest_jobs
+from app.model.csv import CSVUpload, CSVUploadSession
 from app.model.user import User
 from app.repositories import csv_repository as repo
-from app.controllers.reservation_controller import parse_reservation_csv
 from app.schemas.response import ApiResponse
-from app.schemas.uploadcsv import UploadOut
-from app.controllers.profile_guest_controller import parse_profile_guest_csv
-from app.controllers.chat_whatsapp_controller import parse_chat_whatsapp_csv
-from app.controllers.transaction_resto_controller import parse_transaction_resto_csv
+from app.schemas.uploadcsv import UploadBatchOut, UploadBatchRejectedOut, UploadDetailOut, UploadOut, UploadSessionCreate, UploadSessionOut, UploadValidationOut
+from app.controllers.csv_parse_tasks import CSV_PARSE_FUNCTIONS, CSV_PARSE_PLANS, iter_csv_batches_in_pool
+from app.utils.csv_spec import validate_sample
+from app.utils.csv_stream import CSVParseError
+from app.utils.ingest_report import IngestReport, merge_reports, record_stage, start_stage, summarize_report
+from app.utils.row_fingerprint import fingerprint_batch, fingerprint_columns
 
 logger = logging.getLogger(__name__)
 
-async def upload_csv_file(db: Session, file: UploadFile, file_type: str, current_user: User) -> ApiResponse[UploadOut]:
+CSV_BULK_SAVERS = {
+    "profile_guest": repo.bulk_save_profile_guest_rows,
+    "reservation": repo.bulk_save_reservation_rows,
+    "chat_whatsapp": repo.bulk_save_chat_whatsapp_rows,
+    "transaction_resto": repo.bulk_save_transaction_resto_rows,
+}
+
+def _remove_spool_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to remove spooled upload {path}: {e}")
+
+def _invalid_encoding_error(e: UnicodeDecodeError) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail=f"Invalid file encoding. Only UTF-8 encoded files are accepted. Error detail: {e}"
+    )
+
+def _too_large_error(filename: str, limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"{filename}: file is too large, the limit is {limit} bytes."
+    )
+
+def _spool_stream(source: IO[bytes], filename: str, max_bytes: Optional[int] = None) -> Tuple[str, str, int]:
+    # Reading stops as soon as the limit is passed, so neither a huge upload nor a zip bomb can fill the spool directory
+    max_bytes = settings.CSV_UPLOAD_MAX_BYTES if max_bytes is None else max_bytes
+    hasher = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    total_bytes = 0
+
+    spool = tempfile.NamedTemporaryFile(
+        mode="wb",
+        prefix="csv_upload_",
+        suffix=".csv",
+        dir=settings.CSV_SPOOL_DIR,
+        delete=False,
+    )
+    try:
+        with spool:
+            while True:
+                chunk = source.read(settings.CSV_READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                total_bytes += len(chunk)
+                if total_bytes > max_bytes:
+                    raise _too_large_error(filename, settings.CSV_UPLOAD_MAX_BYTES)
+                hasher.update(chunk)
+                decoder.decode(chunk)
+                spool.write(chunk)
+            decoder.decode(b"", final=True)
+    except UnicodeDecodeError as e:
+        _remove_spool_file(spool.name)
+        logger.info(f"File decoding failed for {filename}. Encoding is not UTF-8: {e}")
+        raise _invalid_encoding_error(e)
+    except Exception:
+        _remove_spool_file(spool.name)
+        raise
+
+    return spool.name, hasher.hexdigest(), total_bytes
+
+async def _spool_upload(file: UploadFile) -> Tuple[str, str, int]:
+    # The request's UploadFile is closed once the response is sent, so the worker reads from its own copy on disk
+    return await asyncio.to_thread(_spool_stream, file.file, file.filename)
+
+def _save_fingerprinted_batch(
+    db: Session,
+    file_type: str,
+    upload_id: int,
+    rows: Dict[str, List[Any]],
+    row_count: int,
+    columns: Tuple[Tuple[str, ...], Tuple[str, ...]],
+    row_counts: Dict[str, int],
+):
+    row_hashes, key_hashes = fingerprint_batch(file_type, rows, columns[0], columns[1], row_count)
+    stored = repo.get_stored_row_hashes(db=db, row_hashes=list(set(row_hashes)), exclude_upload_id=upload_id)
+
+    # Only rows another active upload already holds are skipped; identical lines within this export
+    # (two equal resto line items, say) are all kept, as a plain insert would
+    keep: List[int] = []
+    skipped: Dict[bytes, bytes] = {}
+    for position, row_hash in enumerate(row_hashes):
+        if row_hash in stored:
+            skipped[row_hash] = key_hashes[position]
+        else:
+            keep.append(position)
+
+    kept_keys = [key_hashes[position] for position in keep]
+    known_keys = repo.get_stored_key_hashes(db=db, key_hashes=list(set(kept_keys))) if keep else set()
+    changed = sum(1 for key_hash in kept_keys if key_hash in known_keys)
+    row_counts["new"] += len(keep) - changed
+    row_counts["changed"] += changed
+    row_counts["unchanged"] += row_count - len(keep)
+
+    row_ids: List[Optional[int]] = []
+    if keep:
+        if len(keep) < row_count:
+            rows = {column: [values[position] for position in keep] for column, values in rows.items()}
+        row_ids = repo.allocate_raw_row_ids(db=db, file_type=file_type, count=len(keep))
+        rows["id"] = row_ids
+        CSV_BULK_SAVERS[file_type](db=db, rows=rows)
+
+    repo.save_row_fingerprints(
+        db=db,
+        upload_id=upload_id,
+        row_hashes=[row_hashes[position] for position in keep] + list(skipped),
+        key_hashes=kept_keys + list(skipped.values()),
+        row_ids=row_ids + [None] * len(skipped),
+    )
+
+def _ingest_csv_stream(
+    db: Session,
+    file_type: str,
+    source: IO[bytes],
+    upload_id: int,
+    lenient: bool,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    report: Optional[IngestReport] = None,
+) -> Tuple[int, Dict[str, int]]:
+    bulk_save = CSV_BULK_SAVERS[file_type]
+    # Fingerprints rely on Postgres sequences for the row ids they point at
+    columns = None
+    if settings.CSV_ROW_FINGERPRINTS and db.get_bind().dialect.name == "postgresql":
+        columns = fingerprint_columns(file_type, repo.get_raw_model_columns(file_type))
+    parse_pool = ingest_jobs.get_csv_parse_pool()
+    if parse_pool:
+        batches = iter_csv_batches_in_pool(
+            parse_pool,
+            file_type,
+            source,
+            upload_id,
+            batch_rows=settings.CSV_BATCH_ROWS,
+            lenient=lenient,
+            block_bytes=settings.CSV_PARSE_BLOCK_BYTES,
+            max_in_flight=settings.CSV_PARSE_PROCESSES * 2,
+            report=report,
+        )
+    else:
+        batches = CSV_PARSE_FUNCTIONS[file_type](
+            source,
+            upload_id,
+            batch_rows=settings.CSV_BATCH_ROWS,
+            lenient=lenient,
+            report=report,
+        )
+
+    count = 0
+    row_counts = {"new": 0, "changed": 0, "unchanged": 0}
+    for rows_to_add, batch_count in batches:
+        started = start_stage()
+        if columns:
+            _save_fingerprinted_batch(db, file_type, upload_id, rows_to_add, batch_count, columns, row_counts)
+        else:
+            bulk_save(db=db, rows=rows_to_add)
+            row_counts["new"] += batch_count
+        record_stage(report, "insert", started, batch_count)
+        count += batch_count
+        logger.info(f"Upload {upload_id}: flushed batch of {batch_count} rows ({count} so far)")
+        if on_progress:
+            on_progress(count, source.tell())
+    return count, row_counts
+
+def _save_ingest_report(
+    db: Session,
+    upload_id: int,
+    report: IngestReport,
+    started: float,
+    row_count: int,
+    lenient: bool,
+):
+    parse_processes = settings.CSV_PARSE_PROCESSES if ingest_jobs.get_csv_parse_pool() else 0
+    summary = summarize_report(report, time.perf_counter() - started, row_count, parse_processes)
+    summary["lenient"] = lenient
+    try:
+        repo.save_upload_ingest_report(db=db, upload_id=upload_id, ingest_report=summary)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to save ingest report for upload ID {upload_id}: {e}")
+
+def _process_upload_in_background(upload_id: int, file_type: str, spool_path: str, decode_report: Optional[IngestReport] = None):
+    db = SessionLocal()
+    # Progress is committed on its own session; the ingest session keeps the rows in one transaction until the end
+    progress_db = SessionLocal()
+    started = time.perf_counter()
+    report: IngestReport = {}
+    merge_reports(report, decode_report)
+    count = 0
+    lenient = False
+    try:
+        upload = repo.get_upload_by_id(db=db, upload_id=upload_id)
+        if not upload:
+            logger.info(f"Upload {upload_id} no longer exists, skipping processing")
+            return
+
+        repo.mark_upload_processing_started(db=progress_db, upload_id=upload_id)
+
+        def on_progress(rows_processed: int, bytes_processed: int):
+            try:
+                repo.update_upload_progress(
+                    db=progress_db,
+                    upload_id=upload_id,
+                    rows_processed=rows_processed,
+                    bytes_processed=bytes_processed,
+                )
+            except Exception as e:
+                progress_db.rollback()
+                logger.warning(f"Failed to record progress for upload ID {upload_id}: {e}")
+
+        try:
+            with open(spool_path, "rb") as source:
+                try:
+                    count, row_counts = _ingest_csv_stream(
+                        db, file_type, source, upload_id, lenient=False, on_progress=on_progress, report=report
+                    )
+                except CSVParseError as parse_error:
+                    logger.info(f"Standard parsing failed for upload ID {upload_id}, retrying leniently: {parse_error}")
+                    db.rollback()
+                    source.seek(0)
+                    # Only the lenient pass is reported; the failed pass still counts towards the wall time
+                    report = {stage: stats for stage, stats in report.items() if stage == "decode"}
+                    lenient = True
+                    count, row_counts = _ingest_csv_stream(
+                        db, file_type, source, upload_id, lenient=True, on_progress=on_progress, report=report
+                    )
+
+            commit_started = start_stage()
+            repo.update_upload_status_success(
+                db=db,
+                upload=upload,
+                row_count=count,
+                row_counts=row_counts
+            )
+            record_stage(report, "commit", commit_started, count)
+            logger.info(
+                f"Upload {upload_id} processed successfully with {count} rows "
+                f"({row_counts['new']} new, {row_counts['changed']} changed, {row_counts['unchanged']} unchanged)"
+            )
+
+        except Exception as e:
+            db.rollback()
+            error_msg = str(e)
+            logger.info(f"Error processing file for upload ID {upload_id}: {error_msg}")
+
+            repo.update_upload_status_failure(
+                db=db,
+                upload=upload,
+                error_message=error_msg
+            )
+
+        # Written after the final commit so the commit itself is part of the report; failed uploads keep
+        # the stages they got through
+        _save_ingest_report(progress_db, upload_id, report, started, count, lenient)
+    finally:
+        db.close()
+        progress_db.close()
+        _remove_spool_file(spool_path)
+
+def _validate_upload_request(file_type: Optional[str], filename: str):
     if not file_type:
         logger.info("file_type is missing")
         raise HTTPException(status_code=400, detail="file_type is required")
 
-    supported_types = ["profile_guest", "reservation", "chat_whatsapp", "transaction_resto"]
+    supported_types = list(CSV_BULK_SAVERS.keys())
     if file_type not in supported_types:
         logger.info(f"Handler not found for type: {file_type}")
         raise HTTPException(
@@ -28,40 +302,52 @@ async def upload_csv_file(db: Session, file: UploadFile, file_type: str, current
             detail=f"Invalid file_type. Supported types are: {supported_types}",
         )
 
-    if not file.filename.lower().endswith(".csv"):
-        logger.info(f"Invalid file extension: {file.filename}")
+    if not filename.lower().endswith(".csv"):
+        logger.info(f"Invalid file extension: {filename}")
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
 
-    logger.info(f"Reading file: {file.filename}")
-    contents = await file.read()
-    if not contents:
-        raise HTTPException(status_code=400, detail="File is empty.")
-
-    try:
-        content_str = contents.decode("utf-8-sig")
-        logger.info("Successfully decoded file content as UTF-8.")
-    except UnicodeDecodeError as e:
-        logger.info(f"File decoding failed for {file.filename}. Encoding is not UTF-8: {e}")
+def _enqueue_spooled_upload(
+    db: Session,
+    spool_path: str,
+    filename: str,
+    file_type: str,
+    file_hash: str,
+    total_bytes: int,
+    current_user: User,
+    batch_id: Optional[str] = None,
+    decode_report: Optional[IngestReport] = None,
+) -> CSVUpload:
+    # The spool file stays with the caller until the job is queued; from then on the job removes it
+    existing = repo.get_active_upload_by_hash(db=db, file_hash=file_hash)
+    if existing:
+        logger.info(f"Rejecting duplicate of upload ID {existing.id} ({existing.status}) for {filename}")
         raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file encoding. Only UTF-8 encoded files are accepted. Error detail: {e}"
+            status_code=409,
+            detail=f"This file has already been uploaded (upload ID {existing.id}, status {existing.status})."
         )
 
-    file_hash = hashlib.sha256(contents).hexdigest()
-    logger.info(f"File hash calculated: {file_hash[:10]}...")
+    if not ingest_jobs.try_reserve_ingest_slot():
+        logger.info(f"CSV ingest queue is full, rejecting {filename}")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many CSV uploads are being processed. Please try again shortly."
+        )
 
     new_upload = None
     try:
         new_upload = repo.create_upload_record(
             db=db,
-            file_name=file.filename,
+            file_name=filename,
             file_type=file_type,
             user_id=current_user.user_id,
-            file_hash=file_hash
+            file_hash=file_hash,
+            total_bytes=total_bytes,
+            batch_id=batch_id
         )
         logger.info(f"CSVUpload record created with ID: {new_upload.id}, status: PROCESSING")
     except IntegrityError as e:
         db.rollback()
+        ingest_jobs.release_ingest_slot()
         logger.info(f"Database IntegrityError on hash insert, likely race condition: {e}")
         raise HTTPException(
             status_code=409,
@@ -69,99 +355,444 @@ async def upload_csv_file(db: Session, file: UploadFile, file_type: str, current
         )
     except Exception as e:
          db.rollback()
+         ingest_jobs.release_ingest_slot()
          logger.info(f"Failed to create initial upload record: {e}")
          raise HTTPException(status_code=500, detail="Failed to create upload record in database.")
 
+    upload_id = new_upload.id
     try:
-        if file_type == 'reservation':
-            rows_to_add, count = await parse_reservation_csv(
-                content_str,
-                new_upload.id
-            )
+        ingest_jobs.submit_csv_ingest(
+            lambda: _process_upload_in_background(upload_id, file_type, spool_path, decode_report)
+        )
+    except Exception as e:
+        ingest_jobs.release_ingest_slot()
+        error_msg = f"Failed to queue upload for processing: {e}"
+        logger.info(f"{error_msg} (upload ID {upload_id})")
+        repo.update_upload_status_failure(db=db, upload=new_upload, error_message=error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
 
-            if rows_to_add:
-                repo.bulk_save_reservation_rows(db=db, rows=rows_to_add)
+    new_upload.uploader = current_user
+    return new_upload
 
-            repo.update_upload_status_success(
-                db=db,
-                upload=new_upload,
-                row_count=count
-            )
-            db.commit()
+async def upload_csv_file(db: Session, file: UploadFile, file_type: str, current_user: User) -> ApiResponse[UploadOut]:
+    _validate_upload_request(file_type, file.filename)
 
-        elif file_type == 'profile_guest':
-            rows_to_add, count = await parse_profile_guest_csv(
-                content_str,
-                new_upload.id
-            )
-            if rows_to_add:
-                repo.bulk_save_profile_guest_rows(db=db, rows=rows_to_add)
+    logger.info(f"Spooling file to disk: {file.filename}")
+    # Spooling runs in the request, so the decode stage is recorded here and handed to the ingest job
+    decode_report: IngestReport = {}
+    started = start_stage()
+    spool_path, file_hash, total_bytes = await _spool_upload(file)
+    record_stage(decode_report, "decode", started)
+    if total_bytes == 0:
+        _remove_spool_file(spool_path)
+        raise HTTPException(status_code=400, detail="File is empty.")
+    logger.info(f"Successfully validated {total_bytes} bytes as UTF-8.")
+    logger.info(f"File hash calculated: {file_hash[:10]}...")
 
-            repo.update_upload_status_success(
-                db=db,
-                upload=new_upload,
-                row_count=count
-            )
-            db.commit()
+    try:
+        new_upload = _enqueue_spooled_upload(
+            db, spool_path, file.filename, file_type, file_hash, total_bytes, current_user,
+            decode_report=decode_report
+        )
+    except Exception:
+        _remove_spool_file(spool_path)
+        raise
 
-        elif file_type == 'chat_whatsapp':
-            rows_to_add, count = await parse_chat_whatsapp_csv(
-                content_str,
-                new_upload.id
-            )
-            if rows_to_add:
-                repo.bulk_save_chat_whatsapp_rows(db=db, rows=rows_to_add)
+    return ApiResponse(
+        code=202,
+        messages="CSV upload accepted and is being processed",
+        data=[new_upload]
+    )
 
-            repo.update_upload_status_success(
-                db=db,
-                upload=new_upload,
-                row_count=count
-            )
-            db.commit()
+def _validate_csv_sample(source: IO[bytes], filename: str, file_type: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    rows = settings.CSV_VALIDATE_SAMPLE_ROWS
+    try:
+        result = validate_sample(CSV_PARSE_PLANS[file_type], source, head_rows=rows, tail_rows=rows)
+    except UnicodeDecodeError as e:
+        logger.info(f"Sample of {filename} is not UTF-8: {e}")
+        raise _invalid_encoding_error(e)
+    except ValueError as e:
+        logger.info(f"Sample of {filename} could not be parsed: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
 
-        elif file_type == 'transaction_resto':
-            rows_to_add, count = await parse_transaction_resto_csv(
-                content_str,
-                new_upload.id
-            )
-            if rows_to_add:
-                repo.bulk_save_transaction_resto_rows(db=db, rows=rows_to_add)
-            
-            repo.update_upload_status_success(
-                db=db,
-                upload=new_upload,
-                row_count=count
-            )
-            db.commit()
+    result["filename"] = filename
+    result["valid"] = result["error"] is None
+    result["elapsed_seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+async def validate_csv_file(file: UploadFile, file_type: str, current_user: User) -> ApiResponse[UploadValidationOut]:
+    # Dry run on the head and tail of the file; no upload record is created and no rows are stored
+    _validate_upload_request(file_type, file.filename)
+
+    result = await asyncio.to_thread(_validate_csv_sample, file.file, file.filename, file_type)
+    logger.info(
+        f"Validated {file.filename} as {file_type} for {current_user.username}: valid={result['valid']}, "
+        f"~{result['estimated_rows']} rows, {result['elapsed_seconds']}s"
+    )
+    return ApiResponse(
+        code=200,
+        messages="CSV file is valid" if result["valid"] else "CSV file does not match the expected format",
+        data=[result]
+    )
+
+# A batch is as far along as its slowest member, and failed once any member failed
+BATCH_STATUS_ORDER = ("PROCESSING", "FAILED", "COMPLETED", "DELETING", "DELETED")
+
+def _batch_status(uploads: List[CSVUpload]) -> str:
+    statuses = {upload.status for upload in uploads}
+    return next((status for status in BATCH_STATUS_ORDER if status in statuses), "REJECTED")
+
+def _infer_file_type(filename: str) -> Optional[str]:
+    name = os.path.basename(filename).lower()
+    # Longest first, so a type is never taken for a shorter one that shares its prefix
+    for file_type in sorted(CSV_BULK_SAVERS, key=len, reverse=True):
+        if name.startswith(file_type):
+            return file_type
+    return None
+
+def _validate_batch_member(file_type: Optional[str], filename: str):
+    if not file_type:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{filename}: file_type could not be determined. Start the file name with its type or pass file_types."
+        )
+    try:
+        _validate_upload_request(file_type, filename)
+    except HTTPException as e:
+        raise HTTPException(status_code=e.status_code, detail=f"{filename}: {e.detail}")
+
+def _is_zip_junk(name: str) -> bool:
+    return name.startswith("__MACOSX/") or os.path.basename(name).startswith(".")
+
+def _spool_zip_members(archive_file: IO[bytes], archive_name: str) -> List[Tuple[str, str, str, str, int]]:
+    spooled: List[Tuple[str, str, str, str, int]] = []
+    try:
+        with zipfile.ZipFile(archive_file) as archive:
+            members = [info for info in archive.infolist() if not info.is_dir() and not _is_zip_junk(info.filename)]
+            if len(members) > settings.CSV_BATCH_MAX_FILES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{archive_name}: a batch can hold at most {settings.CSV_BATCH_MAX_FILES} CSV files, got {len(members)}."
+                )
+            # Every member is checked before anything is extracted, so a bad archive costs no disk
+            typed = []
+            for info in members:
+                file_type = _infer_file_type(info.filename)
+                _validate_batch_member(file_type, info.filename)
+                typed.append((info, file_type))
+
+            # The declared sizes catch an oversized archive up front; the running total catches one that lies about them
+            if sum(info.file_size for info, _ in typed) > settings.CSV_UPLOAD_MAX_BYTES:
+                raise _too_large_error(archive_name, settings.CSV_UPLOAD_MAX_BYTES)
+            archive_bytes = 0
+            for info, file_type in typed:
+                with archive.open(info) as member:
+                    try:
+                        spool_path, file_hash, total_bytes = _spool_stream(
+                            member, info.filename, max_bytes=settings.CSV_UPLOAD_MAX_BYTES - archive_bytes
+                        )
+                    except HTTPException as e:
+                        if e.status_code == 413:
+                            raise _too_large_error(archive_name, settings.CSV_UPLOAD_MAX_BYTES)
+                        raise
+                archive_bytes += total_bytes
+                spooled.append((os.path.basename(info.filename), file_type, spool_path, file_hash, total_bytes))
+    except zipfile.BadZipFile as e:
+        for _, _, spool_path, _, _ in spooled:
+            _remove_spool_file(spool_path)
+        raise HTTPException(status_code=400, detail=f"{archive_name}: not a valid ZIP archive ({e})")
+    except Exception:
+        for _, _, spool_path, _, _ in spooled:
+            _remove_spool_file(spool_path)
+        raise
+    return spooled
+
+async def upload_csv_batch(
+    db: Session,
+    files: List[UploadFile],
+    file_types: Optional[List[str]],
+    current_user: User,
+) -> ApiResponse[UploadBatchOut]:
+    # A ZIP member is typed by its name (e.g. reservation_2025-10-01.csv); a plain file takes the
+    # file_types entry at its position and falls back to its name when that entry is missing or empty
+    file_types = file_types or []
+    csv_files = []
+    zip_files = []
+    for position, file in enumerate(files):
+        if file.filename.lower().endswith(".zip"):
+            zip_files.append(file)
+            continue
+        given = file_types[position] if position < len(file_types) else None
+        file_type = given or _infer_file_type(file.filename)
+        _validate_batch_member(file_type, file.filename)
+        csv_files.append((file, file_type))
+
+    spooled: List[Tuple[str, str, str, str, int]] = []
+    try:
+        for file, file_type in csv_files:
+            spool_path, file_hash, total_bytes = await _spool_upload(file)
+            spooled.append((file.filename, file_type, spool_path, file_hash, total_bytes))
+        for file in zip_files:
+            spooled.extend(await asyncio.to_thread(_spool_zip_members, file.file, file.filename))
+    except Exception:
+        for _, _, spool_path, _, _ in spooled:
+            _remove_spool_file(spool_path)
+        raise
+
+    if not spooled or len(spooled) > settings.CSV_BATCH_MAX_FILES:
+        for _, _, spool_path, _, _ in spooled:
+            _remove_spool_file(spool_path)
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch must contain between 1 and {settings.CSV_BATCH_MAX_FILES} CSV files, got {len(spooled)}."
+        )
 
-        db.refresh(new_upload)
-        new_upload.uploader = current_user
+    # Members are queued one by one and run side by side on the ingest workers; one that cannot be
+    # queued (duplicate, full queue, empty file) is reported without holding back the others
+    batch_id = str(uuid.uuid4())
+    uploads: List[CSVUpload] = []
+    rejected: List[UploadBatchRejectedOut] = []
+    for position, (filename, file_type, spool_path, file_hash, total_bytes) in enumerate(spooled):
+        try:
+            if total_bytes == 0:
+                raise HTTPException(status_code=400, detail="File is empty.")
+            uploads.append(_enqueue_spooled_upload(
+                db, spool_path, filename, file_type, file_hash, total_bytes, current_user, batch_id=batch_id
+            ))
+        except HTTPException as e:
+            _remove_spool_file(spool_path)
+            rejected.append(UploadBatchRejectedOut(
+                filename=filename, file_type=file_type, status_code=e.status_code, detail=str(e.detail)
+            ))
+        except Exception:
+            for _, _, pending_path, _, _ in spooled[position:]:
+                _remove_spool_file(pending_path)
+            raise
+
+    logger.info(f"Batch {batch_id}: {len(uploads)} of {len(spooled)} files queued, {len(rejected)} rejected")
+    return ApiResponse(
+        code=202,
+        messages=f"{len(uploads)} of {len(spooled)} CSV files accepted and are being processed",
+        data=[UploadBatchOut(
+            batch_id=batch_id,
+            status=_batch_status(uploads),
+            uploads=[UploadOut.model_validate(upload) for upload in uploads],
+            rejected=rejected,
+        )]
+    )
 
-        return ApiResponse(
-            code=201,
-            messages="CSV uploaded and processed successfully",
-            data=[new_upload]
+async def get_upload_batch(db: Session, batch_id: str, current_user: User) -> ApiResponse[UploadBatchOut]:
+    uploads = repo.get_uploads_by_batch_and_user(db=db, batch_id=batch_id, user_id=current_user.user_id)
+    if not uploads:
+        raise HTTPException(
+            status_code=404,
+            detail="Upload batch not found or you do not have permission to view it"
         )
+    return ApiResponse(
+        code=200,
+        messages="CSV Upload Batch Fetched Successfully",
+        data=[UploadBatchOut(
+            batch_id=batch_id,
+            status=_batch_status(uploads),
+            uploads=[UploadOut.model_validate(upload) for upload in uploads],
+        )]
+    )
 
+def _upload_session_out(session: CSVUploadSession) -> UploadSessionOut:
+    received_parts = [part.part_number for part in session.parts]
+    return UploadSessionOut(
+        id=session.id,
+        filename=session.filename,
+        file_type=session.file_type,
+        status=session.status,
+        total_bytes=session.total_bytes,
+        part_size=session.part_size,
+        csv_upload_id=session.csv_upload_id,
+        created_at=session.created_at,
+        updated_at=session.updated_at,
+        received_parts=received_parts,
+        received_bytes=sum(part.size for part in session.parts),
+    )
+
+def _get_open_upload_session(db: Session, session_id: str, current_user: User) -> CSVUploadSession:
+    session = repo.get_upload_session_by_id_and_user(db=db, session_id=session_id, user_id=current_user.user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found or you do not have permission to use it")
+    if session.status != "OPEN":
+        raise HTTPException(status_code=409, detail=f"Upload session is already {session.status}.")
+    return session
+
+def _write_spool_part(path: str, offset: int, data: bytes):
+    with open(path, "r+b") as spool:
+        spool.seek(offset)
+        spool.write(data)
+
+def _digest_spool_file(path: str) -> str:
+    hasher = hashlib.sha256()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(settings.CSV_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            decoder.decode(chunk)
+    decoder.decode(b"", final=True)
+    return hasher.hexdigest()
+
+async def create_upload_session(db: Session, payload: UploadSessionCreate, current_user: User) -> ApiResponse[UploadSessionOut]:
+    _validate_upload_request(payload.file_type, payload.filename)
+    if payload.total_bytes > settings.CSV_UPLOAD_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File is too large: {payload.total_bytes} bytes, the limit is {settings.CSV_UPLOAD_MAX_BYTES} bytes.",
+        )
+
+    # The spool is sized up front so parts can land at their offsets in any order, from any API worker
+    fd, spool_path = tempfile.mkstemp(prefix="csv_upload_", suffix=".csv", dir=settings.CSV_SPOOL_DIR)
+    try:
+        os.ftruncate(fd, payload.total_bytes)
+    finally:
+        os.close(fd)
+
+    try:
+        session = repo.create_upload_session(
+            db=db,
+            file_name=payload.filename,
+            file_type=payload.file_type,
+            user_id=current_user.user_id,
+            total_bytes=payload.total_bytes,
+            part_size=settings.CSV_UPLOAD_PART_BYTES,
+            spool_path=spool_path,
+        )
     except Exception as e:
         db.rollback()
-        error_msg = str(e)
-        logger.info(f"Error processing file for upload ID {new_upload.id}: {error_msg}")
+        _remove_spool_file(spool_path)
+        logger.info(f"Failed to create upload session: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create upload session in database.")
 
-        repo.update_upload_status_failure(
-            db=db,
-            upload=new_upload,
-            error_message=error_msg
+    return ApiResponse(
+        code=201,
+        messages="Upload session created",
+        data=[_upload_session_out(session)]
+    )
+
+async def get_upload_session(db: Session, session_id: str, current_user: User) -> ApiResponse[UploadSessionOut]:
+    session = repo.get_upload_session_by_id_and_user(db=db, session_id=session_id, user_id=current_user.user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found or you do not have permission to view it")
+    return ApiResponse(
+        code=200,
+        messages="Upload Session Fetched Successfully",
+        data=[_upload_session_out(session)]
+    )
+
+async def upload_session_part(
+    db: Session,
+    session_id: str,
+    part_number: int,
+    chunks: AsyncIterator[bytes],
+    current_user: User,
+) -> ApiResponse[UploadSessionOut]:
+    session = _get_open_upload_session(db, session_id, current_user)
+
+    part_count = -(-session.total_bytes // session.part_size)
+    if part_number < 0 or part_number >= part_count:
+        raise HTTPException(status_code=400, detail=f"part_number must be between 0 and {part_count - 1}")
+
+    offset = part_number * session.part_size
+    expected_size = min(session.part_size, session.total_bytes - offset)
+
+    # The part is buffered first so the session lock below is held for the disk write only, not the network read
+    data = bytearray()
+    async for chunk in chunks:
+        if len(data) + len(chunk) > expected_size:
+            raise HTTPException(status_code=400, detail=f"Part {part_number} must be exactly {expected_size} bytes.")
+        data.extend(chunk)
+
+    written = len(data)
+    if written != expected_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Part {part_number} must be exactly {expected_size} bytes, received {written}."
+        )
+
+    # complete and abort move the session out of OPEN; a part arriving after that must not touch the spool
+    if not repo.lock_open_upload_session(db=db, session_id=session.id):
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Upload session is no longer accepting parts.")
+    try:
+        await asyncio.to_thread(_write_spool_part, session.spool_path, offset, bytes(data))
+    finally:
+        db.commit()
+
+    repo.save_upload_part(db=db, session_id=session.id, part_number=part_number, size=written)
+    db.refresh(session)
+    return ApiResponse(
+        code=200,
+        messages=f"Part {part_number} received",
+        data=[_upload_session_out(session)]
+    )
+
+async def complete_upload_session(db: Session, session_id: str, current_user: User) -> ApiResponse[UploadOut]:
+    session = _get_open_upload_session(db, session_id, current_user)
+    # The claim waits for parts still being written and turns away any that arrive later
+    if not repo.claim_upload_session(db=db, session_id=session.id, from_status="OPEN", to_status="COMPLETING"):
+        raise HTTPException(status_code=409, detail="Upload session is no longer open.")
+    db.refresh(session)
+    session_out = _upload_session_out(session)
+    if session_out.missing_parts:
+        repo.claim_upload_session(db=db, session_id=session.id, from_status="COMPLETING", to_status="OPEN")
+        raise HTTPException(
+            status_code=409,
+            detail=f"Upload is incomplete, missing parts: {session_out.missing_parts}"
         )
 
-        if isinstance(e, NotImplementedError):
-            raise HTTPException(status_code=400, detail=error_msg)
+    try:
+        # A 200 MB export takes around a second to hash, which should not hold up the event loop
+        file_hash = await asyncio.to_thread(_digest_spool_file, session.spool_path)
+    except UnicodeDecodeError as e:
+        logger.info(f"File decoding failed for {session.filename}. Encoding is not UTF-8: {e}")
+        repo.update_upload_session_status(db=db, session=session, status="REJECTED")
+        _remove_spool_file(session.spool_path)
+        raise _invalid_encoding_error(e)
+    except Exception:
+        repo.claim_upload_session(db=db, session_id=session.id, from_status="COMPLETING", to_status="OPEN")
+        raise
+    logger.info(f"File hash calculated for session {session.id}: {file_hash[:10]}...")
 
-        if isinstance(e, (HTTPException, ValueError)):
-             status_code = e.status_code if isinstance(e, HTTPException) else 400
-             raise HTTPException(status_code=status_code, detail=error_msg)
+    try:
+        new_upload = _enqueue_spooled_upload(
+            db, session.spool_path, session.filename, session.file_type, file_hash, session.total_bytes, current_user
+        )
+    except HTTPException as e:
+        # Only a duplicate is final; on a full queue or a database error the parts are kept and complete can be retried
+        if e.status_code == 409:
+            repo.update_upload_session_status(db=db, session=session, status="REJECTED")
+            _remove_spool_file(session.spool_path)
+        else:
+            repo.claim_upload_session(db=db, session_id=session.id, from_status="COMPLETING", to_status="OPEN")
+        raise
 
-        raise HTTPException(status_code=500, detail=f"Internal server error: {error_msg}")
+    repo.update_upload_session_status(db=db, session=session, status="COMPLETED", csv_upload_id=new_upload.id)
+    return ApiResponse(
+        code=202,
+        messages="CSV upload accepted and is being processed",
+        data=[new_upload]
+    )
+
+async def abort_upload_session(db: Session, session_id: str, current_user: User) -> ApiResponse[UploadSessionOut]:
+    session = _get_open_upload_session(db, session_id, current_user)
+    if not repo.claim_upload_session(db=db, session_id=session.id, from_status="OPEN", to_status="ABORTED"):
+        raise HTTPException(status_code=409, detail="Upload session is no longer open.")
+    _remove_spool_file(session.spool_path)
+    db.refresh(session)
+    return ApiResponse(
+        code=200,
+        messages="Upload session aborted",
+        data=[_upload_session_out(session)]
+    )
 
 async def get_all_uploads(db: Session, current_user: User) -> ApiResponse[UploadOut]:
     uploads = repo.get_uploads_by_user(db=db, user_id=current_user.user_id)
@@ -171,7 +802,7 @@ async def get_all_uploads(db: Session, current_user: User) -> ApiResponse[Upload
         data=uploads
     )
 
-async def get_upload_details(db: Session, upload_id: int, current_user: User) -> ApiResponse[UploadOut]:
+async def get_upload_details(db: Session, upload_id: int, current_user: User) -> ApiResponse[UploadDetailOut]:
     upload = repo.get_upload_by_id_and_user(
         db=db,
         upload_id=upload_id,
@@ -188,6 +819,57 @@ async def get_upload_details(db: Session, upload_id: int, current_user: User) ->
         data=[upload]
     )
 
+def _soft_delete_upload_in_background(upload_id: int):
+    # Rows are soft deleted in id order, one committed chunk at a time, so row locks stay short and the
+    # change feed sees a steady trickle instead of one huge transaction
+    db = SessionLocal()
+    try:
+        upload = repo.get_upload_by_id(db=db, upload_id=upload_id)
+        if not upload or upload.status != "DELETING":
+            logger.info(f"Upload ID {upload_id} is no longer being deleted, skipping")
+            return
+
+        file_type = upload.file_type
+        # A resumed job starts from the rows that are still live
+        rows_deleted = upload.rows_deleted or 0
+        row_ids = repo.get_live_raw_row_ids(db=db, upload=upload)
+        repo.set_upload_rows_to_delete(db=db, upload_id=upload_id, rows_to_delete=rows_deleted + len(row_ids))
+        logger.info(f"Soft deleting {len(row_ids)} {file_type} rows of upload ID {upload_id}")
+
+        chunk_rows = max(settings.CSV_DELETE_BATCH_ROWS, 1)
+        max_rate = settings.CSV_DELETE_MAX_ROWS_PER_SECOND
+        started = time.perf_counter()
+        for start in range(0, len(row_ids), chunk_rows):
+            if delete_jobs.csv_delete_stopping():
+                logger.info(f"Stopping the delete of upload ID {upload_id} at {rows_deleted} rows, it resumes on the next start")
+                return
+            chunk = row_ids[start:start + chunk_rows]
+            rows_deleted += repo.soft_delete_raw_rows(db=db, file_type=file_type, upload_id=upload_id, row_ids=chunk)
+            repo.update_upload_delete_progress(db=db, upload_id=upload_id, rows_deleted=rows_deleted)
+
+            if max_rate > 0:
+                ahead = (start + len(chunk)) / max_rate - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        repo.mark_upload_delete_finished(db=db, upload_id=upload_id)
+        logger.info(f"Upload ID {upload_id} deleted: {rows_deleted} {file_type} rows in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Deleting upload ID {upload_id} failed, it resumes on the next start: {e}", exc_info=True)
+    finally:
+        db.close()
+
+def resume_upload_deletes():
+    db = SessionLocal()
+    try:
+        upload_ids = [upload.id for upload in repo.get_uploads_by_status(db=db, status="DELETING")]
+    finally:
+        db.close()
+    for upload_id in upload_ids:
+        logger.info(f"Resuming the delete of upload ID {upload_id}")
+        delete_jobs.submit_csv_delete(lambda upload_id=upload_id: _soft_delete_upload_in_background(upload_id))
+
 async def delete_upload_file(db: Session, upload_id: int, current_user: User) -> ApiResponse[UploadOut]:
     upload = repo.get_upload_by_id_and_user(db=db, upload_id=upload_id, user_id=current_user.user_id)
     if not upload:
@@ -196,26 +878,30 @@ async def delete_upload_file(db: Session, upload_id: int, current_user: User) ->
     if upload.status == "DELETED":
         return ApiResponse(code=200, messages="Upload already in DELETED status.", data=[upload])
 
-    try:
-        repo.mark_upload_deleted(db=db, upload=upload, deleted_by_user_id=current_user.user_id)
+    if upload.status == "DELETING":
+        return ApiResponse(code=202, messages="Upload is already being deleted.", data=[upload])
 
-        counts = repo.soft_delete_all_children_by_upload(db=db, upload_id=upload.id)
+    try:
+        repo.mark_upload_deleting(db=db, upload=upload, deleted_by_user_id=current_user.user_id)
+        moved = repo.rehome_fingerprinted_rows(db=db, upload=upload)
 
         db.commit()
         db.refresh(upload)
-
-        return ApiResponse(
-            code=200,
-            messages=(
-                "File deleted (soft delete). "
-                f"{counts['reservation_raw']} reservation, "
-                f"{counts['profile_guest_raw']} profile guest, "
-                f"{counts['chat_whatsapp_raw']} chat WA, "
-                f"{counts['transaction_resto_raw']} transaction resto "
-                f"deleted (total {counts['total']})."
-            ),
-            data=[upload]
-        )
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to delete upload: {e}")
+
+    try:
+        delete_jobs.submit_csv_delete(lambda: _soft_delete_upload_in_background(upload_id))
+    except Exception as e:
+        # The upload stays DELETING, so the delete is picked up again on the next start
+        logger.error(f"Failed to queue the delete of upload ID {upload_id}: {e}")
+
+    return ApiResponse(
+        code=202,
+        messages=(
+            "File deletion started (soft delete). "
+            f"{moved} rows kept under later uploads that contain them."
+        ),
+        data=[upload]
+    )
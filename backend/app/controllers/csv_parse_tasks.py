@@ -0,0 +1,183 @@
+# app/controllers/csv_parse_tasks.py
+import io
+import logging
+from collections import deque
+from concurrent.futures import Executor
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from app.controllers.reservation_controller import RESERVATION_PLAN, parse_reservation_csv
+from app.controllers.profile_guest_controller import PROFILE_GUEST_PLAN, parse_profile_guest_csv
+from app.controllers.chat_whatsapp_controller import CHAT_WHATSAPP_PLAN, parse_chat_whatsapp_csv
+from app.controllers.transaction_resto_controller import (
+    TRANSACTION_RESTO_PLAN,
+    iter_transaction_resto_batches,
+    parse_transaction_resto_csv,
+    split_transaction_resto_frame,
+)
+from app.utils.csv_spec import build_batch, clean_frame, detect_date_formats, read_engine
+from app.utils.csv_stream import (
+    CSV_UNPARSEABLE_MESSAGE,
+    column_batch_size,
+    detect_csv_layout,
+    iter_record_blocks,
+    read_csv_chunks,
+    read_csv_header,
+)
+from app.utils.ingest_report import IngestReport, merge_reports, record_stage, start_stage
+
+logger = logging.getLogger(__name__)
+
+CSV_PARSE_FUNCTIONS = {
+    "profile_guest": parse_profile_guest_csv,
+    "reservation": parse_reservation_csv,
+    "chat_whatsapp": parse_chat_whatsapp_csv,
+    "transaction_resto": parse_transaction_resto_csv,
+}
+
+CSV_PARSE_PLANS = {
+    "profile_guest": PROFILE_GUEST_PLAN,
+    "reservation": RESERVATION_PLAN,
+    "chat_whatsapp": CHAT_WHATSAPP_PLAN,
+    "transaction_resto": TRANSACTION_RESTO_PLAN,
+}
+
+# Exports whose rows are independent of each other can be cut into record blocks and parsed in parallel;
+# the others need the whole frame (chat dedup, bill merging) and go to a single worker as one payload,
+# except transaction_resto, whose outlets share no bills and are spread over the workers
+BLOCK_PARSERS = {
+    "reservation": RESERVATION_PLAN,
+    "profile_guest": PROFILE_GUEST_PLAN,
+}
+
+ColumnBatch = Dict[str, List[Any]]
+
+def parse_csv_bytes(
+    file_type: str,
+    data: bytes,
+    upload_id: int,
+    batch_rows: Optional[int],
+    lenient: bool,
+) -> Tuple[List[Tuple[ColumnBatch, int]], IngestReport]:
+    parse = CSV_PARSE_FUNCTIONS[file_type]
+    report: IngestReport = {}
+    batches = list(parse(io.BytesIO(data), upload_id, batch_rows=batch_rows, lenient=lenient, report=report))
+    return batches, report
+
+def split_transaction_resto_bytes(data: bytes, lenient: bool):
+    report: IngestReport = {}
+    outlets = split_transaction_resto_frame(io.BytesIO(data), lenient=lenient, report=report)
+    return outlets, report
+
+def parse_csv_block(
+    file_type: str,
+    header: bytes,
+    block: bytes,
+    upload_id: int,
+    batch_rows: Optional[int],
+    lenient: bool,
+    log_details: bool,
+    sep: str,
+    quoting: int,
+    date_formats: Dict[str, Tuple[str, ...]],
+) -> Tuple[List[Tuple[ColumnBatch, int]], int, IngestReport]:
+    plan = BLOCK_PARSERS[file_type]
+    batches: List[Tuple[ColumnBatch, int]] = []
+    seen_rows = 0
+    report: IngestReport = {}
+
+    started = start_stage()
+    chunks = read_csv_chunks(
+        io.BytesIO(header + block), chunksize=batch_rows, lenient=lenient, sep=sep, quoting=quoting,
+        engine=read_engine(plan), include_columns=plan["read_columns"], as_text=plan["arrow"],
+    )
+    for chunk in chunks:
+        record_stage(report, "read", started, len(chunk))
+        started = start_stage()
+        if chunk.empty:
+            continue
+        df = clean_frame(plan, chunk, log_details=log_details and seen_rows == 0)
+        record_stage(report, "clean", started, len(df))
+        seen_rows += len(chunk)
+
+        started = start_stage()
+        batch = build_batch(plan, df, upload_id, date_formats, report)
+        batch_count = column_batch_size(batch)
+        record_stage(report, "convert", started, batch_count)
+        if batch_count:
+            batches.append((batch, batch_count))
+        started = start_stage()
+
+    return batches, seen_rows, report
+
+def iter_csv_batches_in_pool(
+    pool: Executor,
+    file_type: str,
+    source: IO[bytes],
+    upload_id: int,
+    batch_rows: Optional[int],
+    lenient: bool,
+    block_bytes: int,
+    max_in_flight: int,
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[ColumnBatch, int]]:
+    # Workers time their own stages and send the report back with their batches
+    if file_type == "transaction_resto":
+        # The export is read and split by outlet in one worker, then each outlet goes to its own worker
+        outlets, split_report = pool.submit(split_transaction_resto_bytes, source.read(), lenient).result()
+        merge_reports(report, split_report)
+        yield from iter_transaction_resto_batches(outlets, upload_id, batch_rows=batch_rows, executor=pool, report=report)
+        return
+
+    if file_type not in BLOCK_PARSERS:
+        batches, parse_report = pool.submit(parse_csv_bytes, file_type, source.read(), upload_id, batch_rows, lenient).result()
+        merge_reports(report, parse_report)
+        yield from batches
+        return
+
+    plan = BLOCK_PARSERS[file_type]
+    started = start_stage()
+    layout = detect_csv_layout(source, plan["read_columns"], default_skiprows=plan["skiprows"])
+    date_formats = detect_date_formats(plan, source, layout)
+    header = read_csv_header(source, skiprows=layout["skiprows"])
+    record_stage(report, "read", started)
+    in_flight = deque()
+    seen_rows = 0
+    processed_row_count = 0
+
+    try:
+        blocks = iter_record_blocks(source, block_bytes)
+        for index, block in enumerate(blocks):
+            in_flight.append(
+                pool.submit(
+                    parse_csv_block, file_type, header, block, upload_id, batch_rows, lenient, index == 0,
+                    layout["sep"], layout["quoting"], date_formats,
+                )
+            )
+            if len(in_flight) < max_in_flight:
+                continue
+
+            batches, block_seen_rows, block_report = in_flight.popleft().result()
+            seen_rows += block_seen_rows
+            merge_reports(report, block_report)
+            for batch, batch_count in batches:
+                processed_row_count += batch_count
+                yield batch, batch_count
+
+        while in_flight:
+            batches, block_seen_rows, block_report = in_flight.popleft().result()
+            seen_rows += block_seen_rows
+            merge_reports(report, block_report)
+            for batch, batch_count in batches:
+                processed_row_count += batch_count
+                yield batch, batch_count
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+    if seen_rows == 0:
+        raise ValueError(CSV_UNPARSEABLE_MESSAGE)
+
+    if processed_row_count == 0:
+        raise ValueError("No valid data rows found after parsing and filtering.")
+
+    logger.info(f"Successfully parsed {processed_row_count} {file_type} rows in worker processes.")
@@ -1,12 +1,16 @@
 # backend/app/controllers/room_build_controller.py
+import logging
 from typing import Optional, List
 from datetime import date
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 import app.repositories.room_build_repository as repo
+from app.jobs.room_build_sync import request_room_build_sync
 from app.model.room import RoomBuild
 
+logger = logging.getLogger(__name__)
+
 def register_room_build_controller(
     db: Session,
     built_date: date,
@@ -18,7 +22,9 @@ def register_room_build_controller(
         room_count=room_count,
         room_type_desc=room_type_desc,
     )
-    return repo.add_room_build(db, room_build)
+    room_build = repo.add_room_build(db, room_build)
+    request_room_build_sync()
+    return room_build
 
 def get_room_by_id_controller(db: Session, room_build_id: int):
     room_build = repo.get_room_by_id(db, room_build_id)
@@ -77,7 +83,9 @@ def update_room_build_controller(
     if room_type_desc is not None:
         room_build.room_type_desc = room_type_desc.strip()
 
-    return repo.update_room_build(db, room_build)
+    room_build = repo.update_room_build(db, room_build)
+    request_room_build_sync()
+    return room_build
 
 
 def register_bulk_room_build_controller(db: Session, rooms_data: list[dict]):
@@ -90,4 +98,6 @@ def register_bulk_room_build_controller(db: Session, rooms_data: list[dict]):
         )
         room_builds.append(room_build)
 
-    return repo.add_bulk_room_build(db, room_builds)
+    room_builds = repo.add_bulk_room_build(db, room_builds)
+    request_room_build_sync()
+    return room_builds
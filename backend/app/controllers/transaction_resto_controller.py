@@ -1,16 +1,20 @@
 # app/controllers/transaction_resto_controller.py
 import logging
-from typing import List, Tuple
+import time
+from concurrent.futures import Executor
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+import numpy as np
 import pandas as pd
-from io import StringIO
-import re
-from collections import defaultdict, deque
-from datetime import datetime
 
-from app.model.csv import JKT, TransactionRestoRaw
+from app.utils.article_rules import classify_article_numbers
+from app.utils.csv_spec import clean_frame, compile_spec, iter_frame_batches, read_frames
+from app.utils.csv_stream import CSV_UNPARSEABLE_MESSAGE
+from app.utils.ingest_report import IngestReport, merge_reports, record_stage, start_stage
 
 logger = logging.getLogger(__name__)
 
+TRANSACTION_RESTO_SKIPROWS = 2
+
 HEADER_TO_MODEL_MAP = {
     "Bill Number": "bill_number",
     "Article Number": "article_number",
@@ -73,211 +77,55 @@ def formatting_data(df: pd.DataFrame) -> pd.DataFrame:
 
     return df
 
+BILL_TRANSFER_PATTERN = r'(?:To|From)\s+Table\s+\d+\s*\*(\d+)'
+
+def _find_roots(parent: np.ndarray) -> np.ndarray:
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+def _bill_component_max(bills: np.ndarray, src: np.ndarray, dst: np.ndarray) -> Dict[int, int]:
+    codes, nodes = pd.factorize(np.concatenate([bills, src, dst]))
+    src_codes = codes[len(bills):len(bills) + len(src)]
+    dst_codes = codes[len(bills) + len(src):]
+
+    # Union-find over factorized bill numbers: every pass hooks the larger root of each edge onto the smaller one,
+    # so parents only ever point to lower codes and repeated passes converge without cycles
+    parent = np.arange(len(nodes))
+    while True:
+        parent = _find_roots(parent)
+        root_src, root_dst = parent[src_codes], parent[dst_codes]
+        pending = root_src != root_dst
+        if not pending.any():
+            break
+        high = np.maximum(root_src[pending], root_dst[pending])
+        low = np.minimum(root_src[pending], root_dst[pending])
+        parent[high] = low
+
+    comp_max = np.full(len(nodes), np.iinfo(np.int64).min, dtype=np.int64)
+    np.maximum.at(comp_max, parent, nodes.astype(np.int64))
+    return dict(zip(nodes.tolist(), comp_max[parent].tolist()))
+
 def update_bill_numbers(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df['Prev Bill Number'] = pd.to_numeric(df['Bill Number'], errors='coerce').fillna(0).astype(int)
 
-    pat = re.compile(r'(?:To|From)\s+Table\s+\d+\s*\*(\d+)')
-
-    adj = defaultdict(set)
-    for _, row in df.iterrows():
-        src = int(row['Bill Number'])
-        desc = str(row.get('Description', ''))
-        refs = {int(x) for x in pat.findall(desc)}
-        for dst in refs:
-            adj[src].add(dst)
-            adj[dst].add(src)
-
-    for b in df['Bill Number'].astype(int).unique():
-        _ = adj[b]
-
-    visited = set()
-    comp_max = {}
-    for start in adj.keys():
-        if start in visited:
-            continue
-        q = deque([start])
-        visited.add(start)
-        comp = []
-        mx = start
-        while q:
-            u = q.popleft()
-            comp.append(u)
-            if u > mx:
-                mx = u
-            for v in adj[u]:
-                if v not in visited:
-                    visited.add(v)
-                    q.append(v)
-        for u in comp:
-            comp_max[u] = mx
-
-    df['Bill Number'] = df['Bill Number'].astype(int).map(lambda b: comp_max.get(b, b))
-
-    return df
-
+    bills = df['Bill Number'].astype(int)
+    bill_values = bills.to_numpy(dtype=np.int64)
+    desc = df['Description'].astype(str).to_numpy() if 'Description' in df.columns else np.full(len(df), '', dtype=object)
+    refs = pd.Series(desc, dtype=object).str.extractall(BILL_TRANSFER_PATTERN)[0]
 
-def classify_article(article_number: int, outlet: str = 'Restaurant & Bar') -> str:
-    outlet = (outlet or '').strip()
+    # extractall is indexed by (row position, match number); the row position gives each edge its source bill
+    src = bill_values[refs.index.get_level_values(0).to_numpy(dtype=np.int64)]
+    dst = refs.astype(np.int64).to_numpy()
 
-    if outlet == 'Restaurant & Bar':
-        if 1 <= article_number <= 1000:
-            return 'Food'
-        elif 1001 <= article_number <= 2299:
-            return 'Beverages'
-        else:
-            return 'Others'
+    comp_max = _bill_component_max(bill_values, src, dst)
+    df['Bill Number'] = bills.map(comp_max)
 
-    elif outlet == 'Room Service':
-        if 1 <= article_number <= 499:
-            return 'Food'
-        elif 500 <= article_number <= 2999:
-            return 'Beverages'
-        else:
-            return 'Others'
-
-    elif outlet == 'Banquet':
-        return 'Others'
+    return df
 
-    else:
-        if 1 <= article_number <= 1000:
-            return 'Food'
-        elif 1001 <= article_number <= 2999:
-            return 'Beverages'
-        else:
-            return 'Others'
-
-
-def classify_subarticle(article_number: int, outlet: str = 'Restaurant & Bar') -> str:
-    outlet = (outlet or '').strip()
-    article_str = str(article_number)
-
-    if outlet == 'Restaurant & Bar':
-        if 1 <= article_number <= 1000:
-            if 1 <= article_number <= 40:
-                return 'Breakfast'
-            elif 41 <= article_number <= 80:
-                return 'Appetizer'
-            elif 81 <= article_number <= 120:
-                return 'Dessert'
-            elif 121 <= article_number <= 160:
-                return 'Pasta'
-            elif 161 <= article_number <= 200:
-                return 'Extra For Pasta'
-            elif 201 <= article_number <= 240:
-                return 'Pizza'
-            elif 241 <= article_number <= 280:
-                return 'Easy Bite'
-            else:
-                return 'Main Course'
-
-        elif 1001 <= article_number <= 2999:
-            if article_str.startswith('100'):
-                return 'Coffee'
-            elif article_str.startswith('104'):
-                return 'Tea'
-            elif article_str.startswith('108'):
-                return 'Softdrink'
-            elif article_str.startswith('112'):
-                return 'Mineral Water'
-            elif article_str.startswith('114'):
-                return 'Juice'
-            elif article_str.startswith('118'):
-                return 'Mocktail'
-            elif article_str.startswith('122'):
-                return 'Mixer'
-            elif article_str.startswith('200'):
-                return 'Beer'
-            elif article_str.startswith(('204', '205', '206', '207', '208')):
-                return 'Cocktail'
-            elif article_str.startswith(('210', '211', '212', '213', '214', '215')):
-                return 'Shoot'
-            elif article_str.startswith('22'):
-                return 'Bottle'
-            else:
-                return 'Beverages'
-
-        elif article_number >= 2300:
-            if article_str.startswith('23'):
-                return 'Promo'
-            elif article_str.startswith('30'):
-                return 'Cigarette'
-            elif article_str.startswith('31'):
-                return 'Miscellaneous'
-            elif article_str.startswith('35') and article_number not in [3514, 3515, 3516]:
-                return 'Merchandise'
-            elif article_str.startswith('40'):
-                return 'Soju'
-            elif article_str.startswith('69'):
-                return 'Compliment Cake'
-            elif article_str.startswith('891'):
-                return 'Discount'
-            elif article_str.startswith('98'):
-                return 'Compliment'
-            elif article_str.startswith('990'):
-                return 'Cash'
-            elif article_str.startswith('991'):
-                return 'Voucher'
-            elif article_str.startswith('993'):
-                return 'Credit Card'
-            elif article_str.startswith('995'):
-                return 'City Ledger'
-            else:
-                return 'Others'
-
-    elif outlet == 'Room Service':
-        if 1 <= article_number <= 10:
-            return 'Dessert'
-        elif 40 <= article_number <= 49:
-            return 'Pasta'
-        elif 121 <= article_number <= 129:
-            return 'Pizza'
-        elif 160 <= article_number <= 199:
-            return 'Snack'
-        elif 200 <= article_number <= 499:
-            return 'Main Course'
-        elif 500 <= article_number <= 599:
-            return 'Beer'
-        elif 600 <= article_number <= 699:
-            return 'Cocktail'
-        elif 700 <= article_number <= 799:
-            return 'Canned'
-        elif 800 <= article_number <= 899:
-            return 'Water'
-        elif 900 <= article_number <= 999:
-            return 'Coffee'
-        elif 1000 <= article_number <= 1099:
-            return 'Mocktail'
-        elif 1100 <= article_number <= 1199:
-            return 'Tea'
-        elif 1200 <= article_number <= 1299:
-            return 'Juice'
-        elif 2000 <= article_number <= 2999:
-            return 'Bottle'
-        elif 3000 <= article_number <= 3099:
-            return 'Promo'
-        else:
-            return 'Others'
-
-    elif outlet == 'Banquet':
-        if article_number == 3:
-            return 'Room Rental'
-        elif article_number == 4:
-            return 'Coffee Break'
-        elif article_number == 5:
-            return 'Lunch'
-        elif article_number == 6:
-            return 'Dinner'
-        else:
-            return 'Other'
-
-    return 'Unknown'
-
-def _to_str_or_none(val):
-    if val is None:
-        return None
-    s = str(val).strip()
-    return s if s != "" else None
 
 def process_outlet_data(df: pd.DataFrame, outlet_name: str) -> pd.DataFrame:
     if df.empty:
@@ -339,65 +187,14 @@ def process_outlet_data(df: pd.DataFrame, outlet_name: str) -> pd.DataFrame:
 
     outlet_name_effective = grouped_df['Outlet'].iloc[0] if not grouped_df.empty else outlet_name
 
-    grouped_df['Article'] = grouped_df['Article Number'].apply(
-        lambda x: classify_article(x, outlet_name_effective)
-    )
-    grouped_df['Subarticle'] = grouped_df['Article Number'].apply(
-        lambda x: classify_subarticle(x, outlet_name_effective)
-    )
+    grouped_df['Article'] = classify_article_numbers(grouped_df['Article Number'], outlet_name_effective, kind='article')
+    grouped_df['Subarticle'] = classify_article_numbers(grouped_df['Article Number'], outlet_name_effective, kind='subarticle')
 
     logger.info(f"   - {outlet_name} processed: {grouped_df.shape[0]} records")
     return grouped_df
 
 
-async def parse_transaction_resto_csv(decoded_content: str, upload_id: int) -> Tuple[List[TransactionRestoRaw], int]:
-    rows_to_add: List[TransactionRestoRaw] = []
-    processed_row_count = 0
-    df = None
-
-    content_io = StringIO(decoded_content)
-
-    try:
-        df = pd.read_csv(content_io, skiprows=2)
-        logger.info("Standard parsing with skiprows=2 successful!")
-    except Exception as parse_error:
-        logger.info(f"Standard parsing with skiprows=2 failed: {parse_error}")
-        content_io.seek(0)
-        try:
-            df = pd.read_csv(
-                content_io,
-                skiprows=2,
-                on_bad_lines='skip',
-                quoting=3,
-                sep=None,
-                engine='python'
-            )
-            logger.info("Second parsing attempt with skiprows=2 successful!")
-        except Exception as second_error:
-            logger.info(f"Second parsing attempt with skiprows=2 failed: {second_error}")
-    finally:
-        content_io.close()
-
-    if df is None or df.empty:
-        raise ValueError("CSV file is empty or could not be parsed correctly after UTF-8 decoding.")
-
-    logger.info("=== CSV COLUMNS DEBUG ===")
-    logger.info(f"DataFrame shape: {df.shape}")
-    actual_columns_before_clean = list(df.columns)
-    logger.info(f"Actual columns found BEFORE cleaning: {actual_columns_before_clean}")
-
-    logger.info("=== CLEANING HEADERS ===")
-    df.columns = (
-        df.columns
-        .str.strip()
-        .str.replace(r"\s+", " ", regex=True)
-    )
-    actual_columns_after_clean = list(df.columns)
-    logger.info(f"Cleaned columns: {actual_columns_after_clean}")
-
-    expected_cols_debug = list(HEADER_TO_MODEL_MAP.keys())
-    logger.info(f"Expected columns (from map): {expected_cols_debug}")
-
+def _split_outlets(df: pd.DataFrame) -> List[Tuple[str, pd.DataFrame]]:
     if 'Outlet' in df.columns:
         resto = df[df['Outlet'] == 'Restaurant & Bar']
         roomservice = df[df['Outlet'] == 'Room Service']
@@ -412,128 +209,148 @@ async def parse_transaction_resto_csv(decoded_content: str, upload_id: int) -> T
         roomservice = pd.DataFrame()
         banquet = pd.DataFrame()
 
-    df.dropna(how='all', inplace=True)
-    logger.info(f"After dropna(how='all'): {len(df)} records")
-
-    required_columns_cleaned = [
+    outlets = [("Restaurant & Bar", resto), ("Room Service", roomservice), ("Banquet", banquet)]
+    return [(outlet_name, part) for outlet_name, part in outlets if not part.empty]
+
+def _group_sample_outlets(df: pd.DataFrame) -> pd.DataFrame:
+    grouped = [process_outlet_data(part, outlet_name) for outlet_name, part in _split_outlets(df)]
+    return pd.concat(grouped, ignore_index=True) if grouped else df.iloc[0:0]
+
+def _store_sales_as_payment(batch: Dict[str, List[Any]]) -> None:
+    # Payment is stored as the grouped sales amount, as it always has been
+    batch["payment"] = batch["sales"]
+
+# Bills are read whole and split by outlet by hand; the spec covers reading, the required columns
+# and turning the grouped outlet frames (with their derived bill columns) into column batches
+TRANSACTION_RESTO_SPEC = {
+    "file_type": "transaction_resto",
+    "header_map": HEADER_TO_MODEL_MAP,
+    "derived_columns": {
+        "Prev Bill Number": "prev_bill_number",
+        "Bill Discount": "bill_discount",
+        "Bill Compliment": "bill_compliment",
+        "Total Deduction": "total_deduction",
+        "Article": "article_category",
+        "Subarticle": "article_subcategory",
+    },
+    "column_types": {
+        "quantity": "count",
+        "table_number": "count",
+        "sales": "cents",
+        "transaction_date": "local_datetime",
+        "bill_discount": "number",
+        "bill_compliment": "number",
+        "total_deduction": "number",
+    },
+    "skiprows": TRANSACTION_RESTO_SKIPROWS,
+    "required_columns": [
         'Date', 'Table Number', 'Bill Number', 'Article Number', 'Description',
         'Quantity', 'Sales', 'Payment', 'Outlet', 'Posting ID',
         'Start Time', 'Close Time', 'Time',
         'Guest Name', 'Travel Agent / Reserve Name', 'Reservation Number'
-    ]
-    missing_cols = [col for col in required_columns_cleaned if col not in df.columns]
-    if missing_cols:
-        logger.info(f"Missing required columns AFTER cleaning: {missing_cols}. Available: {list(df.columns)}")
-        raise ValueError(f"Missing required columns: {missing_cols}")
-
-    processed_dfs = []
-
-    if not resto.empty:
-        resto_processed = process_outlet_data(resto, "Restaurant & Bar")
-        if not resto_processed.empty:
-            processed_dfs.append(resto_processed)
-
-    if not roomservice.empty:
-        roomservice_processed = process_outlet_data(roomservice, "Room Service")
-        if not roomservice_processed.empty:
-            processed_dfs.append(roomservice_processed)
-
-    if not banquet.empty:
-        banquet_processed = process_outlet_data(banquet, "Banquet")
-        if not banquet_processed.empty:
-            processed_dfs.append(banquet_processed)
-
-    if processed_dfs:
-        grouped_df = pd.concat(processed_dfs, ignore_index=True)
-        logger.info(f"📊 Combined processed data shape: {grouped_df.shape}")
-    else:
-        grouped_df = pd.DataFrame()
-        logger.warning("⚠️ No data to process after outlet separation")
+    ],
+    "batch_hooks": [_store_sales_as_payment],
+    "whole_file": True,
+    "sample_hook": _group_sample_outlets,
+}
 
-    if grouped_df.empty:
-        raise ValueError("No valid data rows found after processing transaction resto CSV.")
+TRANSACTION_RESTO_PLAN = compile_spec(TRANSACTION_RESTO_SPEC)
 
-    for index, row in grouped_df.iterrows():
-        try:
-            ts = row.get('Date')
-            if isinstance(ts, pd.Timestamp):
-                py_dt = ts.to_pydatetime()
-            elif ts is None or (isinstance(ts, float) and pd.isna(ts)):
-                py_dt = None
-            else:
-                py_dt = pd.to_datetime(ts, errors='coerce')
-                if isinstance(py_dt, pd.Timestamp):
-                    py_dt = py_dt.to_pydatetime()
-                else:
-                    py_dt = None
-
-            if py_dt is not None and py_dt.tzinfo is None:
-                py_dt = py_dt.replace(tzinfo=JKT)
-
-            bill_number = _to_str_or_none(row.get('Bill Number'))
-            article_number = _to_str_or_none(row.get('Article Number'))
-            guest_name = _to_str_or_none(row.get('Guest Name'))
-            item_name = _to_str_or_none(row.get('Description'))
-
-            quantity = int(row.get('Quantity', 0) or 0)
-            sales_val = float(row.get('Sales', 0) or 0)
-            sales = int(round(sales_val * 100))
-
-            article_category = _to_str_or_none(row.get('Article', ''))
-            article_subcategory = _to_str_or_none(row.get('Subarticle', ''))
-
-            outlet = _to_str_or_none(row.get('Outlet', ''))
-            table_number = int(row.get('Table Number', 0) or 0)
-            posting_id = _to_str_or_none(row.get('Posting ID', ''))
-            reservation_number = _to_str_or_none(row.get('Reservation Number', ''))
-            travel_agent_name = _to_str_or_none(row.get('Travel Agent / Reserve Name', ''))
-            prev_bill_number = _to_str_or_none(row.get('Prev Bill Number', ''))
-
-            bill_discount = float(row.get('Bill Discount', 0) or 0)
-            bill_compliment = float(row.get('Bill Compliment', 0) or 0)
-            total_deduction = float(row.get('Total Deduction', 0) or 0)
-
-            start_time = _to_str_or_none(row.get('Start Time', ''))
-            close_time = _to_str_or_none(row.get('Close Time', ''))
-            time_str = _to_str_or_none(row.get('Time', ''))
-
-            tr = TransactionRestoRaw(
-                csv_upload_id=upload_id,
-                bill_number=bill_number,
-                article_number=article_number,
-                guest_name=guest_name,
-                item_name=item_name,
-                quantity=quantity,
-                sales=sales,
-                payment=sales,
-                outlet=outlet,
-                table_number=table_number,
-                posting_id=posting_id,
-                reservation_number=reservation_number,
-                travel_agent_name=travel_agent_name,
-                prev_bill_number=prev_bill_number,
-                transaction_date=py_dt,
-                start_time=start_time,
-                close_time=close_time,
-                time=time_str,
-                bill_discount=bill_discount,
-                bill_compliment=bill_compliment,
-                total_deduction=total_deduction,
-                article_category=article_category,
-                article_subcategory=article_subcategory,
-            )
+def split_transaction_resto_frame(
+    source: Union[IO[bytes], IO[str]],
+    lenient: bool = False,
+    report: Optional[IngestReport] = None,
+) -> List[Tuple[str, pd.DataFrame]]:
+    # Bill merging and per-bill grouping span the whole export, so the frame
+    # is read in one pass; only row materialization is batched.
+    started = start_stage()
+    df = next(read_frames(TRANSACTION_RESTO_PLAN, source, lenient=lenient), None)
 
-            rows_to_add.append(tr)
-            processed_row_count += 1
+    if df is None or df.empty:
+        raise ValueError(CSV_UNPARSEABLE_MESSAGE)
+    record_stage(report, "read", started, len(df))
+
+    started = start_stage()
+    df = clean_frame(TRANSACTION_RESTO_PLAN, df, log_details=True)
+
+    outlets = _split_outlets(df)
+    record_stage(report, "clean", started, len(df))
+    return outlets
+
+def process_transaction_resto_outlet(
+    part: pd.DataFrame,
+    outlet_name: str,
+    upload_id: int,
+    batch_rows: Optional[int] = None,
+) -> Tuple[List[Tuple[Dict[str, List[Any]], int]], int, float, IngestReport]:
+    # Each outlet keeps its own report, so a worker process can send it back with the batches
+    outlet_report: IngestReport = {}
+    started = time.perf_counter()
+    clean_started = start_stage()
+    grouped_df = process_outlet_data(part, outlet_name)
+    record_stage(outlet_report, "clean", clean_started, len(grouped_df))
+
+    batches = list(iter_frame_batches(TRANSACTION_RESTO_PLAN, grouped_df, upload_id, batch_rows, outlet_report))
+
+    return batches, len(grouped_df), time.perf_counter() - started, outlet_report
+
+def iter_transaction_resto_batches(
+    outlets: List[Tuple[str, pd.DataFrame]],
+    upload_id: int,
+    batch_rows: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[Dict[str, List[Any]], int]]:
+    # Outlets share no bills, so with an executor each one is grouped, merged and classified on its own worker;
+    # results are collected in outlet order so the rows come out as before
+    started = time.perf_counter()
+    if executor is None:
+        results = [process_transaction_resto_outlet(part, name, upload_id, batch_rows) for name, part in outlets]
+    else:
+        results = _run_outlets(executor, outlets, upload_id, batch_rows)
 
-        except Exception as e:
-            logger.warning(
-                f"Row {index + 2}: error building TransactionRestoRaw, skipped. Error: {e}"
-            )
-            continue
+    for (outlet_name, _), (_, grouped_count, elapsed, outlet_report) in zip(outlets, results):
+        logger.info(f"⏱️ {outlet_name}: {grouped_count} grouped records in {elapsed:.2f}s")
+        merge_reports(report, outlet_report)
+    logger.info(f"⏱️ All outlets processed in {time.perf_counter() - started:.2f}s")
 
-    if not rows_to_add:
+    if sum(grouped_count for _, grouped_count, _, _ in results) == 0:
+        logger.warning("⚠️ No data to process after outlet separation")
+        raise ValueError("No valid data rows found after processing transaction resto CSV.")
+
+    processed_row_count = 0
+    for batches, _, _, _ in results:
+        for batch, batch_count in batches:
+            processed_row_count += batch_count
+            yield batch, batch_count
+
+    if processed_row_count == 0:
         raise ValueError("No valid data rows found after parsing and filtering.")
 
     logger.info(f"Successfully parsed {processed_row_count} rows from transaction_resto CSV.")
-    return rows_to_add, processed_row_count
+
+def _run_outlets(
+    executor: Executor,
+    outlets: List[Tuple[str, pd.DataFrame]],
+    upload_id: int,
+    batch_rows: Optional[int],
+) -> List[Tuple[List[Tuple[Dict[str, List[Any]], int]], int, float, IngestReport]]:
+    futures = [
+        executor.submit(process_transaction_resto_outlet, part, outlet_name, upload_id, batch_rows)
+        for outlet_name, part in outlets
+    ]
+    try:
+        return [future.result() for future in futures]
+    finally:
+        for future in futures:
+            future.cancel()
+
+def parse_transaction_resto_csv(
+    source: Union[IO[bytes], IO[str]],
+    upload_id: int,
+    batch_rows: Optional[int] = None,
+    lenient: bool = False,
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[Dict[str, List[Any]], int]]:
+    outlets = split_transaction_resto_frame(source, lenient=lenient, report=report)
+    yield from iter_transaction_resto_batches(outlets, upload_id, batch_rows=batch_rows, report=report)
@@ -1,4 +1,5 @@
 # app/db/clickhouse.py
+import requests
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 from collections.abc import Generator
@@ -23,3 +24,21 @@ def get_clickhouse_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+def clickhouse_http_sql(sql: str, data: str = "") -> str:
+    # Statements the SQLAlchemy dialect does not handle well (mutations, bulk inserts) go over
+    # the HTTP interface; data is sent after the statement, e.g. rows for FORMAT JSONEachRow
+    auth = None
+    if settings.CLICKHOUSE_USER:
+        auth = (settings.CLICKHOUSE_USER, settings.CLICKHOUSE_PASSWORD or "")
+
+    body = f"{sql}\n{data}" if data else sql
+    resp = requests.post(
+        settings.clickhouse_base_url,
+        params=settings.clickhouse_default_params,
+        data=body.encode("utf-8"),
+        auth=auth,
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return resp.text
@@ -9,6 +9,27 @@ USING ivfflat (embedding vector_cosine_ops)
 WITH (lists = 100)
 """
 
+# create_all does not add columns to existing tables, so columns added after a table shipped are listed here
+SCHEMA_UPGRADE_SQL = [
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS total_bytes BIGINT",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS bytes_processed BIGINT DEFAULT 0",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMP(3) WITH TIME ZONE",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS processing_finished_at TIMESTAMP(3) WITH TIME ZONE",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS rows_new INTEGER DEFAULT 0",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS rows_changed INTEGER DEFAULT 0",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS rows_unchanged INTEGER DEFAULT 0",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS batch_id VARCHAR(36)",
+    "CREATE INDEX IF NOT EXISTS ix_csv_uploads_batch_id ON csv_uploads (batch_id)",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS ingest_report JSONB",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS rows_to_delete INTEGER",
+    "ALTER TABLE csv_uploads ADD COLUMN IF NOT EXISTS rows_deleted INTEGER DEFAULT 0",
+]
+
+def upgrade_schema_sync(engine: Engine) -> None:
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPGRADE_SQL:
+            conn.execute(text(statement))
+
 def init_db_sync(engine: Engine) -> None:
     with engine.begin() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
@@ -1,40 +1,26 @@
 # app/jobs/cleanup_clickhouse.py
 import logging
 
-import requests
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
 from app.config.settings import settings
+from app.db.clickhouse import clickhouse_http_sql
 
 logger = logging.getLogger(__name__)
 _ch_scheduler: AsyncIOScheduler | None = None
 
 CLICKHOUSE_TABLES = [
     "reservations_transformed",
+    "reservation_nights",
     "profile_guest_transformed",
     "chat_whatsapp_transformed",
     "transaction_resto_transformed",
 ]
 
 def _clickhouse_sql(sql: str) -> str:
-    base_url = settings.clickhouse_base_url
-    params = settings.clickhouse_default_params
-
-    auth = None
-    if settings.CLICKHOUSE_USER:
-        auth = (settings.CLICKHOUSE_USER, settings.CLICKHOUSE_PASSWORD or "")
-
     logger.info("[clickhouse_cleanup] Executing SQL: %s", sql)
-    resp = requests.post(
-        base_url,
-        params=params,
-        data=sql.encode("utf-8"),
-        auth=auth,
-        timeout=30,
-    )
-    resp.raise_for_status()
-    return resp.text
+    return clickhouse_http_sql(sql)
 
 async def _cleanup_clickhouse_once():
     logger.info(
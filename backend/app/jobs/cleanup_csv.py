@@ -1,5 +1,7 @@
 # app/jobs/cleanup_csv.py
 import logging
+import os
+from datetime import timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from contextlib import contextmanager
@@ -9,12 +11,15 @@ from sqlalchemy import delete
 from app.db.database import SessionLocal
 from app.model.csv import (
     CSVUpload,
+    CSVUploadSession,
     ReservationRaw,
     ChatWhatsappRaw,
     TransactionRestoRaw,
     ProfileGuestRaw,
+    now_jkt,
 )
 from app.config.settings import settings
+from app.repositories import csv_repository as repo
 
 logger = logging.getLogger(__name__)
 _csv_scheduler: AsyncIOScheduler | None = None
@@ -51,9 +56,24 @@ async def _cleanup_csv_data_once():
 
         db.commit()
 
+        # Sessions nobody resumed within the TTL give their spooled parts back, as does a complete that never finished;
+        # a completed session's spool belongs to its ingest job
+        cutoff = now_jkt() - timedelta(hours=settings.CSV_UPLOAD_SESSION_TTL_HOURS)
+        expired_sessions = repo.get_upload_sessions_updated_before(db=db, cutoff=cutoff)
+        for upload_session in expired_sessions:
+            if upload_session.status in ("OPEN", "COMPLETING"):
+                try:
+                    os.remove(upload_session.spool_path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning("[csv_cleanup] failed to remove spool %s: %s", upload_session.spool_path, e)
+            db.delete(upload_session)
+        db.commit()
+
         logger.info(
-            "[csv_cleanup] deleted %s reservation_raw rows, %s csv_upload records, %s profile_guest rows, %s chat_whatsapp rows, %s transaction_resto rows",
-            deleted_res, deleted_uploads, deleted_guest, deleted_chat, deleted_resto
+            "[csv_cleanup] deleted %s reservation_raw rows, %s csv_upload records, %s profile_guest rows, %s chat_whatsapp rows, %s transaction_resto rows, %s expired upload sessions",
+            deleted_res, deleted_uploads, deleted_guest, deleted_chat, deleted_resto, len(expired_sessions)
         )
 
 def start_csv_cleanup_scheduler():
@@ -0,0 +1,46 @@
+# app/jobs/csv_delete.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+_csv_delete_executor: ThreadPoolExecutor | None = None
+_csv_delete_lock = threading.Lock()
+_csv_delete_stopping = threading.Event()
+
+def start_csv_delete_worker():
+    global _csv_delete_executor
+    with _csv_delete_lock:
+        if _csv_delete_executor:
+            logger.info("[csv_delete] worker already running")
+            return
+        _csv_delete_stopping.clear()
+        # One worker, so deletes of several uploads never add up to more than the configured rows/s
+        _csv_delete_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="csv_delete")
+    logger.info("[csv_delete] worker started")
+
+def stop_csv_delete_worker():
+    global _csv_delete_executor
+    with _csv_delete_lock:
+        executor, _csv_delete_executor = _csv_delete_executor, None
+    if not executor:
+        return
+    # A running job stops after its current chunk; the upload stays DELETING and is resumed on the next start
+    _csv_delete_stopping.set()
+    executor.shutdown(wait=True, cancel_futures=True)
+    logger.info("[csv_delete] worker stopped")
+
+def csv_delete_stopping() -> bool:
+    return _csv_delete_stopping.is_set()
+
+def _run_job(job: Callable[[], None]):
+    try:
+        job()
+    except Exception as e:
+        logger.error("[csv_delete] job crashed: %s", e, exc_info=True)
+
+def submit_csv_delete(job: Callable[[], None]):
+    if not _csv_delete_executor:
+        start_csv_delete_worker()
+    _csv_delete_executor.submit(_run_job, job)
@@ -0,0 +1,71 @@
+# app/jobs/csv_ingest.py
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+_csv_ingest_executor: ThreadPoolExecutor | None = None
+_csv_parse_pool: ProcessPoolExecutor | None = None
+_csv_ingest_lock = threading.Lock()
+_csv_ingest_slots = threading.BoundedSemaphore(settings.CSV_INGEST_WORKERS + settings.CSV_INGEST_MAX_PENDING)
+
+def start_csv_ingest_workers():
+    global _csv_ingest_executor, _csv_parse_pool
+    with _csv_ingest_lock:
+        if _csv_ingest_executor:
+            logger.info("[csv_ingest] workers already running")
+            return
+
+        _csv_ingest_executor = ThreadPoolExecutor(
+            max_workers=settings.CSV_INGEST_WORKERS,
+            thread_name_prefix="csv_ingest",
+        )
+        # pandas parsing holds the GIL for long stretches, so it runs in separate processes
+        # to keep the API threads responsive; spawn avoids forking a process that already has threads and DB connections
+        if settings.CSV_PARSE_PROCESSES > 0:
+            _csv_parse_pool = ProcessPoolExecutor(
+                max_workers=settings.CSV_PARSE_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+    logger.info(
+        "[csv_ingest] workers started (workers=%s, max_pending=%s, parse_processes=%s)",
+        settings.CSV_INGEST_WORKERS, settings.CSV_INGEST_MAX_PENDING, settings.CSV_PARSE_PROCESSES,
+    )
+
+def stop_csv_ingest_workers():
+    global _csv_ingest_executor, _csv_parse_pool
+    with _csv_ingest_lock:
+        executor, _csv_ingest_executor = _csv_ingest_executor, None
+        parse_pool, _csv_parse_pool = _csv_parse_pool, None
+    if not executor:
+        return
+    executor.shutdown(wait=True, cancel_futures=False)
+    if parse_pool:
+        parse_pool.shutdown(wait=True, cancel_futures=True)
+    logger.info("[csv_ingest] workers stopped")
+
+def get_csv_parse_pool() -> ProcessPoolExecutor | None:
+    return _csv_parse_pool
+
+def try_reserve_ingest_slot() -> bool:
+    return _csv_ingest_slots.acquire(blocking=False)
+
+def release_ingest_slot():
+    _csv_ingest_slots.release()
+
+def _run_job(job: Callable[[], None]):
+    try:
+        job()
+    except Exception as e:
+        logger.error("[csv_ingest] job crashed: %s", e, exc_info=True)
+    finally:
+        release_ingest_slot()
+
+def submit_csv_ingest(job: Callable[[], None]):
+    # Caller must hold a slot from try_reserve_ingest_slot; it is released once the job finishes
+    if not _csv_ingest_executor:
+        start_csv_ingest_workers()
+    _csv_ingest_executor.submit(_run_job, job)
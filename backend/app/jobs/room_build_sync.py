@@ -0,0 +1,66 @@
+# app/jobs/room_build_sync.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.db.database import SessionLocal
+import app.repositories.room_build_repository as repo
+
+logger = logging.getLogger(__name__)
+_room_build_sync_executor: ThreadPoolExecutor | None = None
+_room_build_sync_lock = threading.Lock()
+_room_build_sync_queued = False
+_room_build_sync_version = 0
+
+def start_room_build_sync_worker():
+    global _room_build_sync_executor
+    with _room_build_sync_lock:
+        if _room_build_sync_executor:
+            logger.info("[room_build_sync] worker already running")
+            return
+        # One worker, so snapshots reach ClickHouse in the order they were read from Postgres
+        _room_build_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="room_build_sync")
+    logger.info("[room_build_sync] worker started")
+
+def stop_room_build_sync_worker():
+    global _room_build_sync_executor, _room_build_sync_queued
+    with _room_build_sync_lock:
+        executor, _room_build_sync_executor = _room_build_sync_executor, None
+        _room_build_sync_queued = False
+    if not executor:
+        return
+    executor.shutdown(wait=True, cancel_futures=True)
+    logger.info("[room_build_sync] worker stopped")
+
+def _next_version() -> int:
+    # Never behind the previous snapshot, even if the wall clock steps back
+    global _room_build_sync_version
+    with _room_build_sync_lock:
+        _room_build_sync_version = max(time.time_ns() // 1_000_000, _room_build_sync_version + 1)
+        return _room_build_sync_version
+
+def _sync_room_builds():
+    global _room_build_sync_queued
+    with _room_build_sync_lock:
+        # Writes from here on queue another run, which reads a snapshot that includes them
+        _room_build_sync_queued = False
+    db = SessionLocal()
+    try:
+        count = repo.replace_clickhouse_room_builds(repo.list_room_builds(db), _next_version())
+        logger.info(f"[room_build_sync] synced {count} room builds to ClickHouse")
+    except Exception as e:
+        # Postgres stays the source of truth; the next write or restart heals the mirror
+        logger.error(f"[room_build_sync] failed to sync room builds to ClickHouse: {e}", exc_info=True)
+    finally:
+        db.close()
+
+def request_room_build_sync():
+    # Call after the room_builds change is committed; several writes before the worker gets to it share one snapshot
+    global _room_build_sync_queued
+    if not _room_build_sync_executor:
+        start_room_build_sync_worker()
+    with _room_build_sync_lock:
+        if _room_build_sync_queued or not _room_build_sync_executor:
+            return
+        _room_build_sync_queued = True
+        _room_build_sync_executor.submit(_sync_room_builds)
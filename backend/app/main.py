@@ -6,6 +6,7 @@ from contextlib import asynccontextmanager
 from sqlalchemy import text
 
 from app.db.database import Base, engine
+from app.db.init_db import upgrade_schema_sync
 from app.db.clickhouse import clickhouse_engine
 from app.config.settings import settings
 from app.utils.cookies import set_auth_cookie
@@ -36,6 +37,21 @@ from app.jobs.cleanup_clickhouse import (
     stop_clickhouse_cleanup_scheduler,
 )
 
+from app.jobs.csv_ingest import (
+    start_csv_ingest_workers,
+    stop_csv_ingest_workers,
+)
+from app.jobs.csv_delete import (
+    start_csv_delete_worker,
+    stop_csv_delete_worker,
+)
+from app.controllers.csv_controller import resume_upload_deletes
+from app.jobs.room_build_sync import (
+    start_room_build_sync_worker,
+    stop_room_build_sync_worker,
+    request_room_build_sync,
+)
+
 logging.basicConfig(level=logging.INFO)
 
 try:
@@ -56,6 +72,14 @@ except Exception as e:
     logging.error(f"Failed to run create_all: {e}")
     raise
 
+try:
+    logging.info("Step 3: Applying schema upgrades for existing tables...")
+    upgrade_schema_sync(engine)
+    logging.info("Schema upgrades applied successfully.")
+except Exception as e:
+    logging.error(f"Failed to apply schema upgrades: {e}")
+    raise
+
 async def lifespan(app: FastAPI):
     try:
         with clickhouse_engine.connect() as conn:
@@ -67,10 +91,24 @@ async def lifespan(app: FastAPI):
     start_prealloc_cleanup_scheduler()
     start_csv_cleanup_scheduler()
     start_clickhouse_cleanup_scheduler()
+    start_csv_ingest_workers()
+    start_csv_delete_worker()
+    start_room_build_sync_worker()
+    try:
+        resume_upload_deletes()
+    except Exception as e:
+        logging.error("Failed to resume upload deletes: %s", e, exc_info=True)
+    try:
+        request_room_build_sync()
+    except Exception as e:
+        logging.error("Failed to queue room build sync: %s", e, exc_info=True)
     yield
     stop_prealloc_cleanup_scheduler()
     stop_csv_cleanup_scheduler()
     stop_clickhouse_cleanup_scheduler()
+    stop_csv_ingest_workers()
+    stop_csv_delete_worker()
+    stop_room_build_sync_worker()
 
 # Fast API
 app = FastAPI(title="DashAgent API", version="1.0.0", lifespan=lifespan)
@@ -1,6 +1,7 @@
 # app/model/csv.py
+import uuid
 from sqlalchemy.sql import func
-from sqlalchemy import BigInteger, Column, Date, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, UniqueConstraint, Index
+from sqlalchemy import BigInteger, Column, Date, Integer, String, DateTime, Text, Boolean, ForeignKey, Float, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime, timezone
@@ -26,6 +27,17 @@ class CSVUpload(Base):
     status = Column(String(50), default="PROCESSING", nullable=False)
     rows_processed = Column(Integer, default=0)
     error_message = Column(Text, nullable=True)
+    total_bytes = Column(BigInteger, nullable=True)
+    bytes_processed = Column(BigInteger, default=0)
+    processing_started_at = Column(DT_TZ_MS, nullable=True)
+    processing_finished_at = Column(DT_TZ_MS, nullable=True)
+    rows_new = Column(Integer, default=0)
+    rows_changed = Column(Integer, default=0)
+    rows_unchanged = Column(Integer, default=0)
+    batch_id = Column(String(36), nullable=True, index=True)
+    ingest_report = Column(postgresql.JSONB, nullable=True)
+    rows_to_delete = Column(Integer, nullable=True)
+    rows_deleted = Column(Integer, default=0)
 
     uploaded_by = Column(String(36), ForeignKey("users.user_id"), nullable=False, index=True)
     deleted_by = Column(String(36), ForeignKey("users.user_id"), nullable=True)
@@ -48,6 +60,58 @@ class CSVUpload(Base):
         ),
     )
 
+class CSVUploadSession(Base):
+    __tablename__ = "csv_upload_sessions"
+
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    filename = Column(String(255), nullable=False)
+    file_type = Column(String(50), nullable=False)
+    total_bytes = Column(BigInteger, nullable=False)
+    part_size = Column(Integer, nullable=False)
+    spool_path = Column(String(1024), nullable=False)
+    status = Column(String(20), default="OPEN", nullable=False, index=True)
+    csv_upload_id = Column(Integer, ForeignKey("csv_uploads.id", ondelete="SET NULL"), nullable=True)
+
+    created_by = Column(String(36), ForeignKey("users.user_id"), nullable=False, index=True)
+    created_at = Column(DT_TZ_MS, default=now_jkt)
+    updated_at = Column(DT_TZ_MS, default=now_jkt, onupdate=now_jkt)
+
+    parts = relationship(
+        "CSVUploadPart",
+        back_populates="session",
+        cascade="all, delete-orphan",
+        order_by="CSVUploadPart.part_number",
+    )
+
+class CSVUploadPart(Base):
+    __tablename__ = "csv_upload_parts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(36), ForeignKey("csv_upload_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    part_number = Column(Integer, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    created_at = Column(DT_TZ_MS, default=now_jkt)
+    session = relationship("CSVUploadSession", back_populates="parts")
+
+    __table_args__ = (
+        UniqueConstraint('session_id', 'part_number', name='uq_csv_upload_part'),
+    )
+
+class CSVRowFingerprint(Base):
+    __tablename__ = "csv_row_fingerprints"
+
+    # One entry per distinct row an upload contained; row_id is set when this upload's row is the stored copy
+    # and is NULL when the row was skipped because another active upload already holds it
+    csv_upload_id = Column(Integer, ForeignKey("csv_uploads.id", ondelete="CASCADE"), primary_key=True)
+    row_hash = Column(LargeBinary(16), primary_key=True)
+    key_hash = Column(LargeBinary(16), nullable=False)
+    row_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index('ix_csv_row_fingerprints_row_hash', 'row_hash'),
+        Index('ix_csv_row_fingerprints_stored_key', 'key_hash', postgresql_where=row_id.isnot(None)),
+    )
+
 class ReservationRaw(Base):
     __tablename__ = "reservation_raw"
     
@@ -7,6 +7,57 @@ from sqlalchemy import text
 
 from app.utils.common import parse_csv_list
 
+# Stay nights are read from reservation_nights, which mv_reservation_nights fills with one row per
+# reservations_transformed row and stay date. Rows of the same reservation are collapsed as
+# datamart_reservations does: each upload first keeps its latest version, then the rate is averaged
+# over the uploads that are still active and the dimensions come from the latest of them.
+_STAY_NIGHTS_SQL = """
+    SELECT
+        stay_date,
+        reservation_id,
+        room_rate,
+        segment,
+        room_type_desc,
+        local_region,
+        nationality,
+        age
+    FROM
+    (
+        SELECT
+            stay_date,
+            argMax(reservation_id, (csv_upload_id, id_latest)) AS reservation_id,
+            toDecimal64(coalesce(avg(room_rate), 0), 2)       AS room_rate,
+            argMax(segment, (csv_upload_id, id_latest))        AS segment,
+            coalesce(argMax(room_type_desc, (csv_upload_id, id_latest)), '') AS room_type_desc,
+            argMax(local_region, (csv_upload_id, id_latest))   AS local_region,
+            argMax(nationality, (csv_upload_id, id_latest))    AS nationality,
+            argMax(age, (csv_upload_id, id_latest))            AS age
+        FROM
+        (
+            SELECT
+                stay_date, guest_name, arrival_date, depart_date, room_number, csv_upload_id,
+                argMax(id, version)             AS id_latest,
+                argMax(reservation_id, version) AS reservation_id,
+                argMax(room_rate, version)      AS room_rate,
+                argMax(segment, version)        AS segment,
+                argMax(room_type_desc, version) AS room_type_desc,
+                argMax(local_region, version)   AS local_region,
+                argMax(nationality, version)    AS nationality,
+                argMax(age, version)            AS age,
+                argMax(deleted_at, version)     AS deleted_at
+            FROM default.reservation_nights FINAL
+            WHERE stay_date BETWEEN d_start AND d_end
+            GROUP BY
+                stay_date, guest_name, arrival_date, depart_date, room_number, csv_upload_id
+        ) AS upload_nights
+        WHERE deleted_at IS NULL
+        GROUP BY
+            stay_date, guest_name, arrival_date, depart_date, room_number
+    ) AS nights
+    WHERE 1 = 1
+    {filters_sql}
+"""
+
 _DIMENSION_SQL_TEMPLATE = """
 WITH
     toDate(:d_start) AS d_start,
@@ -16,19 +67,10 @@ SELECT
 FROM
 (
     SELECT
-        {dimension} AS value,
-        greatest(arrival_date, d_start) AS overlap_start,
-        least(depart_date,  d_end)      AS overlap_end
-    FROM default.datamart_reservations FINAL
-    WHERE
-        arrival_date <= d_end
-        AND depart_date  >= d_start
-) AS r
-ARRAY JOIN
-    arrayMap(
-        x -> r.overlap_start + toIntervalDay(x),
-        range(dateDiff('day', r.overlap_start, r.overlap_end) + 1)
-    ) AS day
+        {dimension} AS value
+    FROM
+    ({stay_nights_sql}) AS r
+)
 WHERE
     value IS NOT NULL
     AND value != ''
@@ -37,13 +79,17 @@ ORDER BY
 """
 
 
+def _stay_nights_sql(filters_sql: str = "") -> str:
+    return _STAY_NIGHTS_SQL.format(filters_sql=filters_sql)
+
+
 def _fetch_dimension_values(
     db: Session,
     dimension: str,
     start: date,
     end: date,
 ) -> List[str]:
-    sql = text(_DIMENSION_SQL_TEMPLATE.format(dimension=dimension))
+    sql = text(_DIMENSION_SQL_TEMPLATE.format(dimension=dimension, stay_nights_sql=_stay_nights_sql()))
     rows = db.execute(sql, {"d_start": start, "d_end": end}).all()
     return [r[0] for r in rows]
 
@@ -93,7 +139,17 @@ def _get_group_key_expr(group_by: str) -> Optional[str]:
     return None
 
 
-def get_aggregate_clickhouse(
+def _room_builds_filter(group_by: str, rt_list: List[str]) -> str:
+    if rt_list:
+        return "1 = 1" + _build_in_filter("room_type_desc", rt_list)
+    if group_by == "room_type_desc":
+        # Only the room types sold in the period count towards inventory, or all of them when
+        # nothing was sold
+        return "(empty(sold_room_types) OR has(sold_room_types, room_type_desc))"
+    return "1 = 1"
+
+
+def get_aggregate_occupancy_clickhouse(
     db: Session,
     start: date,
     end: date,
@@ -114,277 +170,228 @@ def get_aggregate_clickhouse(
     filters_sql += _build_in_filter("room_type_desc", rt_list)
     filters_sql += _build_in_filter("local_region", lr_list)
     filters_sql += _build_in_filter("nationality", nat_list)
+    stay_nights_sql = _stay_nights_sql(filters_sql)
+    room_builds_filter_sql = _room_builds_filter(group_by, rt_list)
 
     group_key_expr = _get_group_key_expr(group_by)
     has_breakdown = group_key_expr is not None
+    per_type = group_by == "room_type_desc"
 
     if has_breakdown:
-        sql = f"""
-        WITH
-            toDate(:d_start) AS d_start,
-            toDate(:d_end)   AS d_end,
-            dateDiff('day', d_start, d_end) + 1 AS period_days
-        SELECT
-            group_key,
-            sum(room_rate_per_night)   AS revenue_sum,
-            count()                    AS room_sold,
-            avg(room_rate_per_night)   AS arr_simple,
-            uniqExact(reservation_id)  AS bookings_count,
-            period_days
-        FROM
-        (
+        breakdown_sql = f"""
             SELECT
-                reservation_id,
-                room_rate AS room_rate_per_night,
-                segment,
-                room_type_desc,
-                local_region,
-                nationality,
-                age,
-                stay_date,
-                {group_key_expr} AS group_key
+                grouping(group_key)              AS is_total,
+                group_key,
+                toFloat64(sum(room_rate))        AS revenue_sum,
+                count()                          AS room_sold,
+                uniqExact(reservation_id)        AS bookings_count
             FROM
             (
                 SELECT
                     reservation_id,
                     room_rate,
-                    segment,
-                    room_type_desc,
-                    local_region,
-                    nationality,
-                    age,
-                    greatest(arrival_date, d_start) AS overlap_start,
-                    least(depart_date,  d_end)      AS overlap_end
-                FROM default.datamart_reservations FINAL
-                WHERE
-                    arrival_date <= d_end
-                    AND depart_date  >= d_start
-                    {filters_sql}
-            ) AS r
-            ARRAY JOIN
-                arrayMap(
-                    x -> r.overlap_start + toIntervalDay(x),
-                    range(dateDiff('day', r.overlap_start, r.overlap_end) + 1)
-                ) AS stay_date
-        ) AS expanded
-        GROUP BY
-            group_key
-        WITH ROLLUP
-        ORDER BY
-            group_key ASC NULLS FIRST
+                    {group_key_expr} AS group_key
+                FROM nights
+            ) AS expanded
+            GROUP BY
+                GROUPING SETS ((group_key), ())
         """
     else:
-        sql = f"""
-        WITH
-            toDate(:d_start) AS d_start,
-            toDate(:d_end)   AS d_end,
-            dateDiff('day', d_start, d_end) + 1 AS period_days
-        SELECT
-            NULL                         AS group_key,
-            sum(room_rate_per_night)     AS revenue_sum,
-            count()                      AS room_sold,
-            avg(room_rate_per_night)     AS arr_simple,
-            uniqExact(reservation_id)    AS bookings_count,
-            period_days
-        FROM
+        breakdown_sql = """
+            SELECT
+                1                                AS is_total,
+                NULL                             AS group_key,
+                toFloat64(sum(room_rate))        AS revenue_sum,
+                count()                          AS room_sold,
+                uniqExact(reservation_id)        AS bookings_count
+            FROM nights
+        """
+
+    if per_type:
+        per_type_join_sql = """
+        LEFT JOIN per_type AS pt
+            ON pt.room_type_desc = b.group_key
+        """
+        room_count_expr = "if(b.is_total = 1, p.period_room_count, pt.type_room_count)"
+        average_occupancy_expr = "if(b.is_total = 1, p.period_occ_sum, pt.type_occ_sum)"
+        adr_expr = "if(b.is_total = 1, p.period_adr_sum, pt.type_adr_sum)"
+    else:
+        per_type_join_sql = ""
+        room_count_expr = "p.period_room_count"
+        average_occupancy_expr = "if(b.is_total = 1, p.period_occ_sum, occupancy_rate)"
+        adr_expr = "if(b.is_total = 1, p.period_adr_sum, arr_simple)"
+
+    # Room counts per type and day come from the room_builds mirror: the latest build on or before
+    # the day (ASOF), 0 before a type's first build. Inventory and sales meet in one
+    # stay_date x room_type_desc grid, which gives the daily and per-type occupancy and ADR sums.
+    sql = f"""
+    WITH
+        toDate(:d_start) AS d_start,
+        toDate(:d_end)   AS d_end,
+        nights AS
+        (
+            {stay_nights_sql}
+        ),
+        (
+            SELECT groupUniqArray(room_type_desc) FROM nights WHERE room_type_desc != ''
+        ) AS sold_room_types,
+        builds AS
         (
             SELECT
-                reservation_id,
-                room_rate AS room_rate_per_night,
-                segment,
                 room_type_desc,
-                local_region,
-                nationality,
-                age,
-                stay_date
+                built_date,
+                max(room_count) AS room_count
+            FROM default.room_builds FINAL
+            WHERE {room_builds_filter_sql}
+            GROUP BY
+                room_type_desc, built_date
+        ),
+        inventory AS
+        (
+            SELECT
+                g.stay_date,
+                g.room_type_desc,
+                b.room_count
             FROM
             (
                 SELECT
-                    reservation_id,
-                    room_rate,
-                    segment,
+                    d_start + n.number AS stay_date,
+                    t.room_type_desc
+                FROM numbers(toUInt64(greatest(dateDiff('day', d_start, d_end) + 1, 0))) AS n
+                CROSS JOIN (SELECT DISTINCT room_type_desc FROM builds) AS t
+            ) AS g
+            ASOF LEFT JOIN builds AS b
+                ON b.room_type_desc = g.room_type_desc
+               AND g.stay_date >= b.built_date
+        ),
+        cells AS
+        (
+            SELECT
+                stay_date,
+                room_type_desc,
+                sum(room_count)   AS room_count,
+                sum(room_sold)    AS room_sold,
+                sum(revenue_sum)  AS revenue_sum
+            FROM
+            (
+                SELECT
+                    stay_date,
                     room_type_desc,
-                    local_region,
-                    nationality,
-                    age,
-                    greatest(arrival_date, d_start) AS overlap_start,
-                    least(depart_date,  d_end)      AS overlap_end
-                FROM default.datamart_reservations FINAL
-                WHERE
-                    arrival_date <= d_end
-                    AND depart_date  >= d_start
-                    {filters_sql}
-            ) AS r
-            ARRAY JOIN
-                arrayMap(
-                    x -> r.overlap_start + toIntervalDay(x),
-                    range(dateDiff('day', r.overlap_start, r.overlap_end) + 1)
-                ) AS stay_date
-        ) AS expanded
-        """
+                    toInt64(room_count)  AS room_count,
+                    toInt64(0)           AS room_sold,
+                    toFloat64(0)         AS revenue_sum
+                FROM inventory
+                UNION ALL
+                SELECT
+                    stay_date,
+                    room_type_desc,
+                    toInt64(0)                 AS room_count,
+                    toInt64(count())           AS room_sold,
+                    toFloat64(sum(room_rate))  AS revenue_sum
+                FROM nights
+                GROUP BY
+                    stay_date, room_type_desc
+            )
+            GROUP BY
+                stay_date, room_type_desc
+        ),
+        per_type AS
+        (
+            SELECT
+                room_type_desc,
+                sum(room_count)                                      AS type_room_count,
+                sum(if(room_count > 0, room_sold / room_count, 0))   AS type_occ_sum,
+                sum(if(room_sold > 0, revenue_sum / room_sold, 0))   AS type_adr_sum
+            FROM cells
+            GROUP BY
+                room_type_desc
+        ),
+        period AS
+        (
+            SELECT
+                sum(room_count)                                      AS period_room_count,
+                sum(if(room_count > 0, room_sold / room_count, 0))   AS period_occ_sum,
+                sum(if(room_sold > 0, revenue_sum / room_sold, 0))   AS period_adr_sum
+            FROM
+            (
+                SELECT
+                    stay_date,
+                    sum(room_count)   AS room_count,
+                    sum(room_sold)    AS room_sold,
+                    sum(revenue_sum)  AS revenue_sum
+                FROM cells
+                GROUP BY
+                    stay_date
+            )
+        )
+    SELECT
+        b.is_total                                                 AS is_total,
+        b.group_key                                                AS group_key,
+        b.revenue_sum                                              AS revenue_sum,
+        b.room_sold                                                AS room_sold,
+        b.bookings_count                                           AS bookings_count,
+        {room_count_expr}                                          AS room_count,
+        if(room_count > 0, b.room_sold / room_count, 0)            AS occupancy_rate,
+        {average_occupancy_expr}                                   AS average_occupancy_rate,
+        if(b.room_sold > 0, b.revenue_sum / b.room_sold, 0)        AS arr_simple,
+        {adr_expr}                                                 AS adr_simple
+    FROM
+    ({breakdown_sql}) AS b
+    {per_type_join_sql}
+    CROSS JOIN period AS p
+    ORDER BY
+        is_total DESC,
+        group_key ASC
+    """
 
     rows = list(db.execute(text(sql), {"d_start": start, "d_end": end}))
 
-    if not rows:
-        nights = (end - start).days + 1
-        if nights < 0:
-            nights = 0
-
-        return {
-            "period": {
-                "start": str(start),
-                "end": str(end),
-                "nights": nights,
-            },
-            "totals": {
-                "revenue_sum": 0.0,
-                "room_sold": 0,
-                "arr_simple": 0.0,
-                "bookings_count": 0,
-            },
-            "breakdown": [],
-        }
+    nights = (end - start).days + 1
+    if nights < 0:
+        nights = 0
 
-    period_days = int(rows[0].period_days)
+    totals = {
+        "room_sold": 0,
+        "bookings_count": 0,
+        "room_count": 0,
+        "revenue_sum": 0.0,
+        "occupancy_rate": 0.0,
+        "average_occupancy_rate": 0.0,
+        "arr_simple": 0.0,
+        "adr_simple": 0.0,
+    }
+    breakdown: List[Dict[str, Any]] = []
 
-    total_row = None
-    breakdown_rows = []
     for r in rows:
-        if r.group_key is None and total_row is None:
-            total_row = r
-        else:
-            breakdown_rows.append(r)
-
-    if total_row is None:
-        total_row = rows[0]
+        item = {
+            "room_sold": int(r.room_sold or 0),
+            "bookings_count": int(r.bookings_count or 0),
+            "room_count": int(r.room_count or 0),
+            "revenue_sum": float(r.revenue_sum or 0),
+            "occupancy_rate": float(r.occupancy_rate or 0),
+            "average_occupancy_rate": float(r.average_occupancy_rate or 0),
+            "arr_simple": float(r.arr_simple or 0),
+            "adr_simple": float(r.adr_simple or 0),
+        }
 
-    totals = {
-        "revenue_sum": float(total_row.revenue_sum or 0),
-        "room_sold": int(total_row.room_sold or 0),
-        "arr_simple": float(total_row.arr_simple or 0),
-        "bookings_count": int(total_row.bookings_count or 0),
-    }
+        if r.is_total:
+            totals = item
+            continue
 
-    breakdown = []
-    for row in breakdown_rows:
-        key = row.group_key
+        key = r.group_key
         if key is None:
             continue
         if isinstance(key, str) and key.strip() == "":
             continue
 
-        breakdown.append(
-            {
-                "key": key,
-                "revenue_sum": float(row.revenue_sum or 0),
-                "room_sold": int(row.room_sold or 0),
-                "arr_simple": float(row.arr_simple or 0),
-                "bookings_count": int(row.bookings_count or 0),
-            }
-        )
+        breakdown.append({"key": key, **item})
 
     return {
         "period": {
             "start": str(start),
             "end": str(end),
-            "nights": period_days,
+            "nights": nights,
         },
         "totals": totals,
         "breakdown": breakdown,
     }
-
-
-def get_nightly_totals_per_type_clickhouse(
-    db: Session,
-    start: date,
-    end: date,
-    segment_in: Optional[str],
-    room_type_desc_in: Optional[str],
-    local_region_in: Optional[str],
-    nationality_in: Optional[str],
-) -> List[Dict[str, Any]]:
-    seg_list = parse_csv_list(segment_in)
-    rt_list = parse_csv_list(room_type_desc_in)
-    lr_list = parse_csv_list(local_region_in)
-    nat_list = parse_csv_list(nationality_in)
-
-    filters_sql = ""
-    filters_sql += _build_in_filter("segment", seg_list)
-    filters_sql += _build_in_filter("room_type_desc", rt_list)
-    filters_sql += _build_in_filter("local_region", lr_list)
-    filters_sql += _build_in_filter("nationality", nat_list)
-
-    sql = f"""
-    WITH
-        toDate(:d_start) AS d_start,
-        toDate(:d_end)   AS d_end
-    SELECT
-        stay_date,
-        room_type_desc,
-        sum(room_rate_per_night) AS revenue_sum,
-        count()                  AS room_sold
-    FROM
-    (
-        SELECT
-            reservation_id,
-            room_rate AS room_rate_per_night,
-            segment,
-            room_type_desc,
-            local_region,
-            nationality,
-            age,
-            stay_date
-        FROM
-        (
-            SELECT
-                reservation_id,
-                room_rate,
-                segment,
-                room_type_desc,
-                local_region,
-                nationality,
-                age,
-                greatest(arrival_date, d_start) AS overlap_start,
-                least(depart_date,  d_end)      AS overlap_end
-            FROM default.datamart_reservations FINAL
-            WHERE
-                arrival_date <= d_end
-                AND depart_date  >= d_start
-                {filters_sql}
-        ) AS r
-        ARRAY JOIN
-            arrayMap(
-                x -> r.overlap_start + toIntervalDay(x),
-                range(dateDiff('day', r.overlap_start, r.overlap_end) + 1)
-            ) AS stay_date
-    ) AS expanded
-    GROUP BY
-        stay_date,
-        room_type_desc
-    ORDER BY
-        stay_date ASC,
-        room_type_desc ASC
-    """
-
-    rows = list(db.execute(text(sql), {"d_start": start, "d_end": end}))
-
-    result: List[Dict[str, Any]] = []
-    for r in rows:
-        if r.room_type_desc is None:
-            continue
-
-        raw_date = r.stay_date
-        if hasattr(raw_date, "date"):
-            stay_date = raw_date.date()
-        else:
-            stay_date = raw_date
-
-        result.append(
-            {
-                "stay_date": stay_date,
-                "room_type_desc": r.room_type_desc,
-                "revenue_sum": float(r.revenue_sum or 0),
-                "room_sold": int(r.room_sold or 0),
-            }
-        )
-    return result
@@ -1,14 +1,33 @@
 # app/repositories/csv_repository.py
 import logging
-from sqlalchemy import func
+from datetime import date, datetime
+from io import StringIO
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session, joinedload
-from typing import List, Dict
-from app.model.csv import CSVUpload, ChatWhatsappRaw, ReservationRaw, ProfileGuestRaw, TransactionRestoRaw
+from typing import Any, List, Dict, Optional, Set
+from app.model.csv import CSVUpload, CSVUploadPart, CSVUploadSession, CSVRowFingerprint, ChatWhatsappRaw, ReservationRaw, ProfileGuestRaw, TransactionRestoRaw, now_jkt
 from app.model.user import User 
+from app.utils.csv_stream import column_batch_size
 
 logger = logging.getLogger(__name__)
 
-def create_upload_record(db: Session, file_name: str, file_type: str, user_id: str, file_hash: str) -> CSVUpload:
+CSV_RAW_MODELS = {
+    "profile_guest": ProfileGuestRaw,
+    "reservation": ReservationRaw,
+    "chat_whatsapp": ChatWhatsappRaw,
+    "transaction_resto": TransactionRestoRaw,
+}
+
+def create_upload_record(
+    db: Session,
+    file_name: str,
+    file_type: str,
+    user_id: str,
+    file_hash: str,
+    total_bytes: Optional[int] = None,
+    batch_id: Optional[str] = None,
+) -> CSVUpload:
     logger.info(f"Creating CSVUpload record for {file_name} by user {user_id}")
     new_upload = CSVUpload(
         filename=file_name,
@@ -16,46 +35,250 @@ def create_upload_record(db: Session, file_name: str, file_type: str, user_id: s
         status="PROCESSING",
         rows_processed=0,
         uploaded_by=user_id,
-        file_hash=file_hash
+        file_hash=file_hash,
+        total_bytes=total_bytes,
+        bytes_processed=0,
+        batch_id=batch_id
     )
     db.add(new_upload)
     db.commit() 
     db.refresh(new_upload)
     return new_upload
 
-def bulk_save_reservation_rows(db: Session, rows: List[ReservationRaw]):
-    if not rows:
+_COPY_NULL = "\\N"
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+def _copy_columns(model, rows: Dict[str, List[Any]]) -> List[Any]:
+    # The primary key is only sent when the caller allocated ids up front
+    return [column for column in model.__table__.columns if not column.primary_key or column.key in rows]
+
+def _copy_defaults(columns: List[Any]) -> Dict[str, Any]:
+    # COPY bypasses the ORM, so Python-side defaults (e.g. now_jkt) are resolved here;
+    # like the ORM insert, a missing or None value falls back to the column default
+    defaults = {}
+    for column in columns:
+        default = column.default
+        if default is None:
+            defaults[column.key] = None
+        elif default.is_callable:
+            defaults[column.key] = default.arg(None)
+        else:
+            defaults[column.key] = default.arg
+    return defaults
+
+def _copy_rows(db: Session, model, rows: Dict[str, List[Any]], row_count: int):
+    columns = _copy_columns(model, rows)
+    defaults = _copy_defaults(columns)
+    column_defaults = [defaults[column.key] for column in columns]
+    column_values = [rows.get(column.key) or [None] * row_count for column in columns]
+
+    buffer = StringIO()
+    for record in zip(*column_values):
+        buffer.write("\t".join(
+            _copy_value(default if value is None else value)
+            for value, default in zip(record, column_defaults)
+        ))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    column_list = ", ".join(f'"{column.name}"' for column in columns)
+    copy_sql = f'COPY "{model.__tablename__}" ({column_list}) FROM STDIN'
+
+    # Runs on the session's own connection so the rows commit or roll back together with the upload status
+    db.flush()
+    dbapi_connection = db.connection().connection.dbapi_connection
+    cursor = dbapi_connection.cursor()
+    try:
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(copy_sql, buffer)
+        else:
+            with cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+def _bulk_insert_rows(db: Session, model, rows: Dict[str, List[Any]], row_count: int):
+    if db.get_bind().dialect.name == "postgresql":
+        _copy_rows(db, model, rows, row_count)
+    else:
+        keys = list(rows.keys())
+        db.bulk_insert_mappings(model, [dict(zip(keys, record)) for record in zip(*rows.values())])
+
+def bulk_save_reservation_rows(db: Session, rows: Dict[str, List[Any]]):
+    row_count = column_batch_size(rows)
+    if not row_count:
         return
-    logger.info(f"Bulk saving {len(rows)} ReservationRaw records...")
-    db.bulk_save_objects(rows)
+    logger.info(f"Bulk saving {row_count} ReservationRaw records...")
+    _bulk_insert_rows(db, ReservationRaw, rows, row_count)
 
-def bulk_save_profile_guest_rows(db: Session, rows: List[ProfileGuestRaw]):
-    if not rows:
+def bulk_save_profile_guest_rows(db: Session, rows: Dict[str, List[Any]]):
+    row_count = column_batch_size(rows)
+    if not row_count:
         return
-    logger.info(f"Bulk saving {len(rows)} ProfileGuestRaw records...")
-    db.bulk_save_objects(rows)
+    logger.info(f"Bulk saving {row_count} ProfileGuestRaw records...")
+    _bulk_insert_rows(db, ProfileGuestRaw, rows, row_count)
 
-def bulk_save_chat_whatsapp_rows(db: Session, rows: List[ChatWhatsappRaw]):
-    if not rows:
+def bulk_save_chat_whatsapp_rows(db: Session, rows: Dict[str, List[Any]]):
+    row_count = column_batch_size(rows)
+    if not row_count:
         return
-    logger.info(f"Bulk saving {len(rows)} ChatWhatsappRaw records...")
-    db.bulk_save_objects(rows)
+    logger.info(f"Bulk saving {row_count} ChatWhatsappRaw records...")
+    _bulk_insert_rows(db, ChatWhatsappRaw, rows, row_count)
 
-def bulk_save_transaction_resto_rows(db: Session, rows: List[TransactionRestoRaw]):
-    if not rows:
+def bulk_save_transaction_resto_rows(db: Session, rows: Dict[str, List[Any]]):
+    row_count = column_batch_size(rows)
+    if not row_count:
         return
-    logger.info(f"Bulk saving {len(rows)} TransactionRestoRaw records...")
-    db.bulk_save_objects(rows)
+    logger.info(f"Bulk saving {row_count} TransactionRestoRaw records...")
+    _bulk_insert_rows(db, TransactionRestoRaw, rows, row_count)
+
+def get_raw_model_columns(file_type: str) -> List[str]:
+    return [column.key for column in CSV_RAW_MODELS[file_type].__table__.columns]
+
+def allocate_raw_row_ids(db: Session, file_type: str, count: int) -> List[int]:
+    table = CSV_RAW_MODELS[file_type].__tablename__
+    result = db.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+        {"table": table, "count": count},
+    )
+    return [row[0] for row in result]
+
+def get_stored_row_hashes(db: Session, row_hashes: List[bytes], exclude_upload_id: int) -> Set[bytes]:
+    # FOR SHARE keeps the holding upload from being deleted until this ingest has recorded its claim on the rows
+    stored = (
+        db.query(CSVRowFingerprint.row_hash)
+        .filter(
+            CSVRowFingerprint.row_hash.in_(row_hashes),
+            CSVRowFingerprint.row_id.isnot(None),
+            CSVRowFingerprint.csv_upload_id != exclude_upload_id,
+        )
+        .with_for_update(read=True)
+        .all()
+    )
+    return {bytes(row_hash) for (row_hash,) in stored}
+
+def get_stored_key_hashes(db: Session, key_hashes: List[bytes]) -> Set[bytes]:
+    stored = (
+        db.query(CSVRowFingerprint.key_hash)
+        .filter(CSVRowFingerprint.key_hash.in_(key_hashes), CSVRowFingerprint.row_id.isnot(None))
+        .distinct()
+        .all()
+    )
+    return {bytes(key_hash) for (key_hash,) in stored}
+
+def save_row_fingerprints(
+    db: Session,
+    upload_id: int,
+    row_hashes: List[bytes],
+    key_hashes: List[bytes],
+    row_ids: List[Optional[int]],
+):
+    if not row_hashes:
+        return
+    # One entry per distinct row: a repeat within the upload, or a row skipped in an earlier batch, is ignored
+    db.execute(
+        pg_insert(CSVRowFingerprint).on_conflict_do_nothing(),
+        [
+            {"csv_upload_id": upload_id, "row_hash": row_hash, "key_hash": key_hash, "row_id": row_id}
+            for row_hash, key_hash, row_id in zip(row_hashes, key_hashes, row_ids)
+        ],
+    )
+
+def rehome_fingerprinted_rows(db: Session, upload: CSVUpload) -> int:
+    model = CSV_RAW_MODELS.get(upload.file_type)
+    if model is None:
+        return 0
+
+    # Waits for running ingests that skipped rows this upload holds, so their claims are visible to the move below
+    db.execute(
+        text(
+            "SELECT count(*) FROM (SELECT 1 FROM csv_row_fingerprints "
+            "WHERE csv_upload_id = :upload_id AND row_id IS NOT NULL FOR UPDATE) locked"
+        ),
+        {"upload_id": upload.id},
+    )
+
+    # Rows another completed upload also contained stay active under that upload instead of being soft deleted
+    moved = db.execute(
+        text(f"""
+            WITH moved AS (
+                SELECT DISTINCT ON (held.row_hash) held.row_hash, held.row_id, claim.csv_upload_id AS new_upload_id
+                FROM csv_row_fingerprints held
+                JOIN csv_row_fingerprints claim ON claim.row_hash = held.row_hash AND claim.row_id IS NULL
+                JOIN csv_uploads u ON u.id = claim.csv_upload_id AND u.status = 'COMPLETED'
+                WHERE held.csv_upload_id = :upload_id AND held.row_id IS NOT NULL
+                ORDER BY held.row_hash, claim.csv_upload_id DESC
+            ),
+            rehomed AS (
+                UPDATE "{model.__tablename__}" r SET csv_upload_id = moved.new_upload_id
+                FROM moved WHERE r.id = moved.row_id
+                RETURNING r.id
+            ),
+            claimed AS (
+                UPDATE csv_row_fingerprints f SET row_id = moved.row_id
+                FROM moved WHERE f.csv_upload_id = moved.new_upload_id AND f.row_hash = moved.row_hash
+            )
+            SELECT count(*) FROM rehomed
+        """),
+        {"upload_id": upload.id},
+    ).scalar()
+
+    db.query(CSVRowFingerprint).filter(CSVRowFingerprint.csv_upload_id == upload.id).delete(synchronize_session=False)
+    logger.info(f"Moved {moved} {model.__tablename__} rows of upload {upload.id} to later uploads holding the same rows")
+    return moved
+
+def mark_upload_processing_started(db: Session, upload_id: int):
+    logger.info(f"Upload {upload_id} picked up for processing")
+    db.query(CSVUpload).filter(CSVUpload.id == upload_id).update(
+        {
+            CSVUpload.processing_started_at: now_jkt(),
+            CSVUpload.rows_processed: 0,
+            CSVUpload.bytes_processed: 0,
+        },
+        synchronize_session=False
+    )
+    db.commit()
+
+def update_upload_progress(db: Session, upload_id: int, rows_processed: int, bytes_processed: int):
+    db.query(CSVUpload).filter(CSVUpload.id == upload_id).update(
+        {
+            CSVUpload.rows_processed: rows_processed,
+            CSVUpload.bytes_processed: bytes_processed,
+        },
+        synchronize_session=False
+    )
+    db.commit()
+
+def save_upload_ingest_report(db: Session, upload_id: int, ingest_report: Dict[str, Any]):
+    db.query(CSVUpload).filter(CSVUpload.id == upload_id).update(
+        {CSVUpload.ingest_report: ingest_report},
+        synchronize_session=False
+    )
+    db.commit()
 
 def update_upload_status_success(
     db: Session, 
     upload: CSVUpload, 
-    row_count: int
+    row_count: int,
+    row_counts: Optional[Dict[str, int]] = None
 ):
     logger.info(f"Updating upload {upload.id} to COMPLETED with {row_count} rows")
     upload.status = "COMPLETED"
     upload.rows_processed = row_count
+    if row_counts is not None:
+        upload.rows_new = row_counts["new"]
+        upload.rows_changed = row_counts["changed"]
+        upload.rows_unchanged = row_counts["unchanged"]
+    upload.bytes_processed = upload.total_bytes
     upload.error_message = None
+    upload.processing_finished_at = now_jkt()
     db.commit()
 
 def update_upload_status_failure(
@@ -66,8 +289,103 @@ def update_upload_status_failure(
     logger.warning(f"Updating upload {upload.id} to FAILED. Error: {error_message}")
     upload.status = "FAILED"
     upload.error_message = error_message
+    upload.processing_finished_at = now_jkt()
     db.commit()
 
+def get_upload_by_id(db: Session, upload_id: int) -> Optional[CSVUpload]:
+    return db.query(CSVUpload).filter(CSVUpload.id == upload_id).first()
+
+def get_active_upload_by_hash(db: Session, file_hash: str) -> Optional[CSVUpload]:
+    return (
+        db.query(CSVUpload)
+        .filter(CSVUpload.file_hash == file_hash, CSVUpload.status.in_(["COMPLETED", "PROCESSING"]))
+        .first()
+    )
+
+def create_upload_session(
+    db: Session,
+    file_name: str,
+    file_type: str,
+    user_id: str,
+    total_bytes: int,
+    part_size: int,
+    spool_path: str,
+) -> CSVUploadSession:
+    logger.info(f"Creating CSVUploadSession for {file_name} ({total_bytes} bytes) by user {user_id}")
+    session = CSVUploadSession(
+        filename=file_name,
+        file_type=file_type,
+        total_bytes=total_bytes,
+        part_size=part_size,
+        spool_path=spool_path,
+        status="OPEN",
+        created_by=user_id,
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    return session
+
+def get_upload_session_by_id_and_user(db: Session, session_id: str, user_id: str) -> Optional[CSVUploadSession]:
+    return (
+        db.query(CSVUploadSession)
+        .options(joinedload(CSVUploadSession.parts))
+        .filter(CSVUploadSession.id == session_id, CSVUploadSession.created_by == user_id)
+        .first()
+    )
+
+def save_upload_part(db: Session, session_id: str, part_number: int, size: int):
+    # A part that is sent again after a dropped response overwrites the same bytes, so its record is updated in place
+    part = (
+        db.query(CSVUploadPart)
+        .filter(CSVUploadPart.session_id == session_id, CSVUploadPart.part_number == part_number)
+        .first()
+    )
+    if part:
+        part.size = size
+    else:
+        db.add(CSVUploadPart(session_id=session_id, part_number=part_number, size=size))
+    db.query(CSVUploadSession).filter(CSVUploadSession.id == session_id).update(
+        {CSVUploadSession.updated_at: now_jkt()},
+        synchronize_session=False
+    )
+    db.commit()
+
+def update_upload_session_status(db: Session, session: CSVUploadSession, status: str, csv_upload_id: Optional[int] = None):
+    logger.info(f"Updating upload session {session.id} to {status}")
+    session.status = status
+    if csv_upload_id is not None:
+        session.csv_upload_id = csv_upload_id
+    db.commit()
+
+def lock_open_upload_session(db: Session, session_id: str) -> bool:
+    # A shared row lock, held until the caller commits: parts can be written side by side, while
+    # claim_upload_session waits for every part that is still being written
+    status = (
+        db.query(CSVUploadSession.status)
+        .filter(CSVUploadSession.id == session_id)
+        .with_for_update(read=True)
+        .scalar()
+    )
+    return status == "OPEN"
+
+def claim_upload_session(db: Session, session_id: str, from_status: str, to_status: str) -> bool:
+    updated = (
+        db.query(CSVUploadSession)
+        .filter(CSVUploadSession.id == session_id, CSVUploadSession.status == from_status)
+        .update(
+            {CSVUploadSession.status: to_status, CSVUploadSession.updated_at: now_jkt()},
+            synchronize_session=False
+        )
+    )
+    db.commit()
+    if updated:
+        logger.info(f"Updating upload session {session_id} from {from_status} to {to_status}")
+    return updated == 1
+
+def get_upload_sessions_updated_before(db: Session, cutoff: datetime) -> List[CSVUploadSession]:
+    return db.query(CSVUploadSession).filter(CSVUploadSession.updated_at < cutoff).all()
+
 def get_uploads_by_user(db: Session, user_id: str) -> List[CSVUpload]:
     logger.debug(f"Fetching all uploads for user {user_id}")
     return (
@@ -81,6 +399,19 @@ def get_uploads_by_user(db: Session, user_id: str) -> List[CSVUpload]:
         .all()
     )
 
+def get_uploads_by_batch_and_user(db: Session, batch_id: str, user_id: str) -> List[CSVUpload]:
+    logger.debug(f"Fetching uploads of batch {batch_id} for user {user_id}")
+    return (
+        db.query(CSVUpload)
+        .options(
+            joinedload(CSVUpload.uploader),
+            joinedload(CSVUpload.deleter),
+        )
+        .filter(CSVUpload.batch_id == batch_id, CSVUpload.uploaded_by == user_id)
+        .order_by(CSVUpload.id)
+        .all()
+    )
+
 def get_upload_by_id_and_user(db: Session, upload_id: int, user_id: str) -> CSVUpload:
     logger.debug(f"Fetching upload {upload_id} for user {user_id}")
     return (
@@ -93,62 +424,55 @@ def get_upload_by_id_and_user(db: Session, upload_id: int, user_id: str) -> CSVU
         .first()
     )
 
-def mark_upload_deleted(db: Session, upload: CSVUpload, deleted_by_user_id: str):
-    logger.info(f"Marking upload {upload.id} as DELETED by {deleted_by_user_id}")
-    upload.status = "DELETED"
+def mark_upload_deleting(db: Session, upload: CSVUpload, deleted_by_user_id: str):
+    logger.info(f"Marking upload {upload.id} as DELETING by {deleted_by_user_id}")
+    upload.status = "DELETING"
     upload.deleted_at = func.now()
     upload.deleted_by = deleted_by_user_id
+    upload.rows_deleted = 0
+    upload.rows_to_delete = None
     db.flush()
 
-def soft_delete_reservations_by_upload(db: Session, upload_id: int) -> int:
-    logger.info(f"Soft deleting reservation_raw for upload_id={upload_id}")
-    q = db.query(ReservationRaw).filter(ReservationRaw.csv_upload_id == upload_id)
-    affected = q.update(
-        {ReservationRaw.deleted_at: func.now()},
+def get_uploads_by_status(db: Session, status: str) -> List[CSVUpload]:
+    return db.query(CSVUpload).filter(CSVUpload.status == status).order_by(CSVUpload.id).all()
+
+def get_live_raw_row_ids(db: Session, upload: CSVUpload) -> List[int]:
+    model = CSV_RAW_MODELS[upload.file_type]
+    rows = (
+        db.query(model.id)
+        .filter(model.csv_upload_id == upload.id, model.deleted_at.is_(None))
+        .order_by(model.id)
+        .all()
+    )
+    return [row_id for (row_id,) in rows]
+
+def set_upload_rows_to_delete(db: Session, upload_id: int, rows_to_delete: int):
+    db.query(CSVUpload).filter(CSVUpload.id == upload_id).update(
+        {CSVUpload.rows_to_delete: rows_to_delete},
         synchronize_session=False
     )
-    logger.info(f"Affected rows in reservation_raw: {affected}")
-    return affected
-
-def soft_delete_profile_guest_by_upload(db: Session, upload_id: int) -> int:
-    logger.info(f"Soft deleting profile_guest_raw for upload_id={upload_id}")
-    q = db.query(ProfileGuestRaw).filter(
-        ProfileGuestRaw.csv_upload_id == upload_id,
-        ProfileGuestRaw.deleted_at.is_(None)
-    )
-    affected = q.update({ProfileGuestRaw.deleted_at: func.now()}, synchronize_session=False)
-    logger.info(f"Affected rows in profile_guest_raw: {affected}")
-    return affected
-
-def soft_delete_chat_whatsapp_by_upload(db: Session, upload_id: int) -> int:
-    logger.info(f"Soft deleting chat_whatsapp_raw for upload_id={upload_id}")
-    q = db.query(ChatWhatsappRaw).filter(
-        ChatWhatsappRaw.csv_upload_id == upload_id,
-        ChatWhatsappRaw.deleted_at.is_(None)
-    )
-    affected = q.update({ChatWhatsappRaw.deleted_at: func.now()}, synchronize_session=False)
-    logger.info(f"Affected rows in chat_whatsapp_raw: {affected}")
-    return affected
-
-def soft_delete_transaction_resto_by_upload(db: Session, upload_id: int) -> int:
-    logger.info(f"Soft deleting transaction_resto_raw for upload_id={upload_id}")
-    q = db.query(TransactionRestoRaw).filter(
-        TransactionRestoRaw.csv_upload_id == upload_id,
-        TransactionRestoRaw.deleted_at.is_(None)
-    )
-    affected = q.update({TransactionRestoRaw.deleted_at: func.now()}, synchronize_session=False)
-    logger.info(f"Affected rows in transaction_resto_raw: {affected}")
-    return affected
-
-def soft_delete_all_children_by_upload(db: Session, upload_id: int) -> Dict[str, int]:
-    res_count  = soft_delete_reservations_by_upload(db, upload_id)
-    prof_count = soft_delete_profile_guest_by_upload(db, upload_id)
-    wa_count   = soft_delete_chat_whatsapp_by_upload(db, upload_id)
-    resto_count= soft_delete_transaction_resto_by_upload(db, upload_id)
-    return {
-        "reservation_raw": res_count,
-        "profile_guest_raw": prof_count,
-        "chat_whatsapp_raw": wa_count,
-        "transaction_resto_raw": resto_count,
-        "total": res_count + prof_count + wa_count + resto_count,
-    }
\ No newline at end of file
+    db.commit()
+
+def soft_delete_raw_rows(db: Session, file_type: str, upload_id: int, row_ids: List[int]) -> int:
+    # Rows moved to another upload since their ids were read are left alone
+    model = CSV_RAW_MODELS[file_type]
+    return (
+        db.query(model)
+        .filter(model.id.in_(row_ids), model.csv_upload_id == upload_id, model.deleted_at.is_(None))
+        .update({model.deleted_at: func.now()}, synchronize_session=False)
+    )
+
+def update_upload_delete_progress(db: Session, upload_id: int, rows_deleted: int):
+    db.query(CSVUpload).filter(CSVUpload.id == upload_id).update(
+        {CSVUpload.rows_deleted: rows_deleted},
+        synchronize_session=False
+    )
+    db.commit()
+
+def mark_upload_delete_finished(db: Session, upload_id: int):
+    logger.info(f"Updating upload {upload_id} to DELETED")
+    db.query(CSVUpload).filter(CSVUpload.id == upload_id).update(
+        {CSVUpload.status: "DELETED"},
+        synchronize_session=False
+    )
+    db.commit()
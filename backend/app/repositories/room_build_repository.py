@@ -1,9 +1,12 @@
 # app/repositories/room_build_repository.py
+import json
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
 from typing import Optional, List, Tuple
 from datetime import date
 
+from app.config.settings import settings
+from app.db.clickhouse import clickhouse_http_sql
 from app.model.room import RoomBuild
 
 def get_room_by_id(db: Session, room_build_id: int) -> Optional[RoomBuild]:
@@ -57,6 +60,24 @@ def get_room_count_until_date(
     total_rooms = sum((room_count or 0) for (_type, room_count) in per_type_rows)
     return total_rooms or 0
 
+def replace_clickhouse_room_builds(rooms: List[RoomBuild], version: int) -> int:
+    # Writes a full snapshot under one version, which must be above every earlier snapshot's so it
+    # supersedes their rows per room_build_id in the ReplacingMergeTree mirror
+    if not rooms:
+        return 0
+    data = "\n".join(
+        json.dumps({
+            "room_build_id": room.room_build_id,
+            "built_date": room.built_date.isoformat(),
+            "room_count": room.room_count,
+            "room_type_desc": room.room_type_desc,
+            "version": version,
+        })
+        for room in rooms
+    )
+    clickhouse_http_sql(f"INSERT INTO {settings.CLICKHOUSE_DB}.room_builds FORMAT JSONEachRow", data)
+    return len(rooms)
+
 def add_room_build(db: Session, room: RoomBuild) -> RoomBuild:
     db.add(room)
     db.commit()
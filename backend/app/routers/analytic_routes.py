@@ -11,7 +11,6 @@ from app.controllers.analytics_controller import (
     get_aggregate_controller,
 )
 from app.db.clickhouse import get_clickhouse_db
-from app.db.database import get_db
 from app.middlewares.middleware import get_current_user, require_manager
 from app.model.user import User
 from app.schemas.response import ApiResponse
@@ -72,7 +71,6 @@ def get_aggregate(
     top_n: Optional[int] = Query(None, ge=1, le=50),
     include_other: bool = Query(False),
     db_ch: Session = Depends(get_clickhouse_db),
-    db_pg: Session = Depends(get_db),
     current_user: User = Depends(require_manager),
 ) -> ApiResponse[AggregateResponse]:
     try:
@@ -83,7 +81,6 @@ def get_aggregate(
 
         agg_dict = get_aggregate_controller(
             db_ch=db_ch,
-            db_pg=db_pg,
             start=start_dt,
             end=end_dt,
             group_by=group_by,
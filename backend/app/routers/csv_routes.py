@@ -1,14 +1,14 @@
 # app/routers/csv_routes.py
 import logging
-from typing import List
+from typing import List, Optional
 
 from app.db.database import get_db
 from app.model.user import User
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
 from sqlalchemy.orm import Session
 from app.middlewares.middleware import get_current_user
 
-from app.schemas.uploadcsv import UploadOut
+from app.schemas.uploadcsv import UploadBatchOut, UploadDetailOut, UploadOut, UploadSessionCreate, UploadSessionOut, UploadValidationOut
 from app.schemas.response import ApiResponse
 
 from app.controllers import csv_controller as controller
@@ -23,15 +23,23 @@ async def get_csv_info():
         "message": "CSV Upload System",
         "endpoints": {
             "upload": "POST /csv/upload",
+            "upload_batch": "POST /csv/upload-batch",
+            "validate": "POST /csv/validate",
+            "get_upload_batch": "GET /csv/upload-batches/{batch_id}",
             "list_uploads": "GET /csv/uploads",
             "get_upload": "GET /csv/uploads/{upload_id}",
             "supported_types": "GET /csv/types",
             "delete_upload": "DELETE /csv/uploads/{upload_id}",
+            "create_upload_session": "POST /csv/upload-sessions",
+            "get_upload_session": "GET /csv/upload-sessions/{session_id}",
+            "upload_part": "PUT /csv/upload-sessions/{session_id}/parts/{part_number}",
+            "complete_upload_session": "POST /csv/upload-sessions/{session_id}/complete",
+            "abort_upload_session": "DELETE /csv/upload-sessions/{session_id}",
         },
         "supported_types": ["profile_guest", "reservation", "chat_whatsapp", "transaction_resto"],
     }
 
-@router.post("/upload", response_model=ApiResponse[UploadOut], status_code=201)
+@router.post("/upload", response_model=ApiResponse[UploadOut], status_code=202)
 async def upload_csv(file: UploadFile = File(...), file_type: str = Form(None), db: Session = Depends(get_db), current_user: User = Depends(get_current_user) ):
     return await controller.upload_csv_file(
         db=db,
@@ -40,6 +48,73 @@ async def upload_csv(file: UploadFile = File(...), file_type: str = Form(None),
         current_user=current_user
     )
 
+@router.post("/validate", response_model=ApiResponse[UploadValidationOut])
+async def validate_csv(file: UploadFile = File(...), file_type: str = Form(None), current_user: User = Depends(get_current_user)):
+    return await controller.validate_csv_file(
+        file=file,
+        file_type=file_type,
+        current_user=current_user
+    )
+
+@router.post("/upload-batch", response_model=ApiResponse[UploadBatchOut], status_code=202)
+async def upload_csv_batch(files: List[UploadFile] = File(...), file_types: Optional[List[str]] = Form(None), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.upload_csv_batch(
+        db=db,
+        files=files,
+        file_types=file_types,
+        current_user=current_user
+    )
+
+@router.get("/upload-batches/{batch_id}", response_model=ApiResponse[UploadBatchOut])
+async def get_upload_batch(batch_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.get_upload_batch(
+        db=db,
+        batch_id=batch_id,
+        current_user=current_user
+    )
+
+@router.post("/upload-sessions", response_model=ApiResponse[UploadSessionOut], status_code=201)
+async def create_upload_session(payload: UploadSessionCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.create_upload_session(
+        db=db,
+        payload=payload,
+        current_user=current_user
+    )
+
+@router.get("/upload-sessions/{session_id}", response_model=ApiResponse[UploadSessionOut])
+async def get_upload_session(session_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.get_upload_session(
+        db=db,
+        session_id=session_id,
+        current_user=current_user
+    )
+
+@router.put("/upload-sessions/{session_id}/parts/{part_number}", response_model=ApiResponse[UploadSessionOut])
+async def upload_session_part(session_id: str, part_number: int, request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.upload_session_part(
+        db=db,
+        session_id=session_id,
+        part_number=part_number,
+        chunks=request.stream(),
+        current_user=current_user
+    )
+
+@router.post("/upload-sessions/{session_id}/complete", response_model=ApiResponse[UploadOut], status_code=202)
+async def complete_upload_session(session_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.complete_upload_session(
+        db=db,
+        session_id=session_id,
+        current_user=current_user
+    )
+
+@router.delete("/upload-sessions/{session_id}", response_model=ApiResponse[UploadSessionOut])
+async def abort_upload_session(session_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return await controller.abort_upload_session(
+        db=db,
+        session_id=session_id,
+        current_user=current_user
+    )
+
 @router.get("/uploads", response_model=ApiResponse[UploadOut])
 async def get_csv_uploads(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     return await controller.get_all_uploads(
@@ -47,7 +122,7 @@ async def get_csv_uploads(db: Session = Depends(get_db), current_user: User = De
         current_user=current_user
     )
 
-@router.get("/uploads/{upload_id}", response_model=ApiResponse[UploadOut])
+@router.get("/uploads/{upload_id}", response_model=ApiResponse[UploadDetailOut])
 async def get_csv_upload(upload_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     return await controller.get_upload_details(
         db=db,
@@ -55,7 +130,7 @@ async def get_csv_upload(upload_id: int, db: Session = Depends(get_db), current_
         current_user=current_user
     )
 
-@router.delete("/uploads/{upload_id}", response_model=ApiResponse[UploadOut])
+@router.delete("/uploads/{upload_id}", response_model=ApiResponse[UploadOut], status_code=202)
 async def delete_csv_upload(upload_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     return await controller.delete_upload_file(
         db=db,
@@ -1,10 +1,10 @@
 # schemas/user.py
-from pydantic import Field, ConfigDict
+from pydantic import Field, ConfigDict, computed_field
 from typing import Optional
 from app.utils.trim import TrimmedModel
 from app.model.user import UserRole
-from typing import List, Optional
-from datetime import datetime
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
 
 class UserOut(TrimmedModel):
     user_id: str
@@ -22,6 +22,126 @@ class UploadOut(TrimmedModel):
     rows_processed: int
     error_message: Optional[str] = None
     created_at: datetime
+    total_bytes: Optional[int] = None
+    bytes_processed: Optional[int] = None
+    processing_started_at: Optional[datetime] = None
+    processing_finished_at: Optional[datetime] = None
+    rows_new: Optional[int] = None
+    rows_changed: Optional[int] = None
+    rows_unchanged: Optional[int] = None
+    batch_id: Optional[str] = None
+    rows_to_delete: Optional[int] = None
+    rows_deleted: Optional[int] = None
     uploader: Optional[UserOut] = None
     deleter: Optional[UserOut] = None
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+    @computed_field
+    @property
+    def progress_percent(self) -> Optional[float]:
+        if self.status in ("COMPLETED", "DELETED"):
+            return 100.0
+        if self.status == "DELETING":
+            if not self.rows_to_delete:
+                return 0.0 if self.rows_to_delete is None else 100.0
+            return round(min(100.0 * (self.rows_deleted or 0) / self.rows_to_delete, 99.0), 1)
+        if not self.total_bytes:
+            return None
+        percent = 100.0 * (self.bytes_processed or 0) / self.total_bytes
+        # Bytes are read ahead of the insert, so a running upload never reports 100 until it commits
+        if self.status == "PROCESSING":
+            percent = min(percent, 99.0)
+        return round(percent, 1)
+
+    @computed_field
+    @property
+    def rows_per_second(self) -> Optional[float]:
+        if not self.processing_started_at:
+            return None
+        finished_at = self.processing_finished_at or datetime.now(timezone.utc)
+        elapsed = (finished_at - self.processing_started_at).total_seconds()
+        if elapsed <= 0:
+            return None
+        return round(self.rows_processed / elapsed, 1)
+
+class UploadDetailOut(UploadOut):
+    ingest_report: Optional[Dict[str, Any]] = None
+
+class UploadValidationColumnOut(TrimmedModel):
+    column: str
+    attribute: str
+    type: str
+    values: int
+    failed: int
+    failure_rate: Optional[float] = None
+
+class UploadValidationOut(TrimmedModel):
+    filename: str
+    file_type: str
+    valid: bool
+    columns: List[str] = []
+    missing_required_columns: List[str] = []
+    missing_columns: List[str] = []
+    sampled_rows: int
+    rows_after_filters: Optional[int] = None
+    estimated_rows: int
+    row_count_exact: bool
+    column_stats: List[UploadValidationColumnOut] = []
+    error: Optional[str] = None
+    elapsed_seconds: float
+
+class UploadBatchRejectedOut(TrimmedModel):
+    filename: str
+    file_type: Optional[str] = None
+    status_code: int
+    detail: str
+
+class UploadBatchOut(TrimmedModel):
+    batch_id: str
+    status: str
+    uploads: List[UploadOut] = []
+    rejected: List[UploadBatchRejectedOut] = []
+
+    @computed_field
+    @property
+    def rows_processed(self) -> int:
+        return sum(upload.rows_processed for upload in self.uploads)
+
+    @computed_field
+    @property
+    def progress_percent(self) -> Optional[float]:
+        total_bytes = sum(upload.total_bytes or 0 for upload in self.uploads)
+        if not total_bytes:
+            return None
+        done = sum((upload.total_bytes or 0) * (upload.progress_percent or 0.0) / 100.0 for upload in self.uploads)
+        return round(100.0 * done / total_bytes, 1)
+
+class UploadSessionCreate(TrimmedModel):
+    filename: str = Field(min_length=1, max_length=255)
+    file_type: str = Field(min_length=1)
+    total_bytes: int = Field(gt=0)
+
+class UploadSessionOut(TrimmedModel):
+    id: str
+    filename: str
+    file_type: str
+    status: str
+    total_bytes: int
+    part_size: int
+    csv_upload_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    received_parts: List[int] = []
+    received_bytes: int = 0
+    model_config = ConfigDict(from_attributes=True)
+
+    @computed_field
+    @property
+    def part_count(self) -> int:
+        return -(-self.total_bytes // self.part_size)
+
+    @computed_field
+    @property
+    def missing_parts(self) -> List[int]:
+        received = set(self.received_parts)
+        return [n for n in range(self.part_count) if n not in received]
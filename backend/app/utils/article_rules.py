@@ -0,0 +1,98 @@
+# app/utils/article_rules.py
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTLET = "*"
+
+_INT_MIN = np.iinfo(np.int64).min
+_INT_MAX = np.iinfo(np.int64).max
+
+_rules: Optional[Dict[str, Any]] = None
+_rules_mtime: Optional[float] = None
+_rules_lock = threading.Lock()
+
+def _compile_rule_set(raw: Dict[str, Any]) -> Dict[str, Any]:
+    rules = raw.get("rules") or []
+    return {
+        "mins": np.array([r.get("min", _INT_MIN) for r in rules], dtype=np.int64),
+        "maxs": np.array([r.get("max", _INT_MAX) for r in rules], dtype=np.int64),
+        "prefixes": [tuple(str(p) for p in r.get("prefix", ())) for r in rules],
+        "excludes": [np.array(r.get("exclude", ()), dtype=np.int64) for r in rules],
+        "labels": [str(r["label"]) for r in rules],
+        "default": str(raw["default"]),
+    }
+
+def _compile_rules(raw: Dict[str, Any]) -> Dict[str, Any]:
+    compiled = {"version": str(raw.get("version", ""))}
+    for kind in ("article", "subarticle"):
+        outlets = raw[kind]
+        if DEFAULT_OUTLET not in outlets:
+            raise ValueError(f"Article rules '{kind}' has no '{DEFAULT_OUTLET}' outlet")
+        compiled[kind] = {outlet.strip(): _compile_rule_set(rule_set) for outlet, rule_set in outlets.items()}
+    return compiled
+
+def get_article_rules() -> Dict[str, Any]:
+    global _rules, _rules_mtime
+    path = settings.ARTICLE_RULES_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        if _rules is None:
+            raise
+        return _rules
+    if _rules is not None and mtime == _rules_mtime:
+        return _rules
+
+    with _rules_lock:
+        if _rules is not None and mtime == _rules_mtime:
+            return _rules
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                compiled = _compile_rules(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if _rules is None:
+                raise
+            # A broken edit must not stop ingestion; keep classifying with the last good table
+            logger.error(f"Failed to reload article rules from {path}, keeping version {_rules['version']}: {e}")
+            _rules_mtime = mtime
+            return _rules
+
+        _rules, _rules_mtime = compiled, mtime
+        logger.info(f"Loaded article rules version {compiled['version']} from {path}")
+        return _rules
+
+def _classify_values(values: np.ndarray, rule_set: Dict[str, Any]) -> np.ndarray:
+    if not rule_set["labels"]:
+        return np.full(len(values), rule_set["default"], dtype=object)
+
+    texts = pd.Series(values).astype(str)
+    in_range = (values[None, :] >= rule_set["mins"][:, None]) & (values[None, :] <= rule_set["maxs"][:, None])
+    conditions: List[np.ndarray] = []
+    for i, (prefixes, excludes) in enumerate(zip(rule_set["prefixes"], rule_set["excludes"])):
+        cond = in_range[i]
+        if prefixes:
+            cond = cond & texts.str.startswith(prefixes).to_numpy(dtype=bool)
+        if len(excludes):
+            cond = cond & ~np.isin(values, excludes)
+        conditions.append(cond)
+    # np.select picks the first matching rule, which keeps the if/elif order of the table
+    return np.select(conditions, rule_set["labels"], default=rule_set["default"]).astype(object)
+
+def classify_article_numbers(article_numbers: pd.Series, outlet: Optional[str], kind: str = "article") -> pd.Series:
+    table = get_article_rules()[kind]
+    rule_set = table.get((outlet or "").strip(), table[DEFAULT_OUTLET])
+
+    # A bill export only carries a few hundred distinct articles, so each is classified once
+    codes, uniques = pd.factorize(article_numbers.astype(np.int64))
+    labels = _classify_values(np.asarray(uniques, dtype=np.int64), rule_set)
+    return pd.Series(labels[codes], index=article_numbers.index, dtype=object)
@@ -0,0 +1,538 @@
+# app/utils/csv_spec.py
+import io
+import logging
+import re
+from datetime import datetime
+from functools import partial
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from app.utils.csv_stream import (
+    CSV_UNPARSEABLE_MESSAGE,
+    column_batch_size,
+    csv_read_engine,
+    detect_csv_layout,
+    read_csv_chunks,
+    read_csv_head,
+    read_csv_sample,
+)
+from app.utils.ingest_report import IngestReport, record_date_failures, record_stage, start_stage
+from app.utils.date_normalize import (
+    normalize_iso_date_column,
+    normalize_local_midnight_column,
+    rank_iso_date_formats,
+    rank_local_date_formats,
+    to_iso_date_str,
+    to_local_midnight,
+)
+
+logger = logging.getLogger(__name__)
+
+JKT = ZoneInfo("Asia/Jakarta")
+
+# A spec is a plain dict describing one PMS export:
+#   file_type         upload type the spec parses
+#   header_map        CSV header -> model attribute; the first header present wins for an attribute
+#   derived_columns   columns the hooks add -> model attribute, converted like the mapped ones
+#   column_types      model attribute -> key of COLUMN_TYPES, "str" when not listed
+#   skiprows          line of the header row when it cannot be detected from the file head
+#   extra_columns     unmapped columns the filters or hooks read
+#   required_columns  cleaned headers that must be present
+#   row_filters       frame -> frame steps run in order after the required-column check
+#   hooks             frame -> frame steps run after the filters, just before conversion
+#   batch_hooks       in-place steps on each finished column batch
+#   whole_file        read the export as one frame (for filters that span all rows) instead of in chunks
+#   arrow             the steps only rely on text cells: every column is read as text, and CSV_ARROW_FILE_TYPES
+#                     may switch the spec to pyarrow
+#   sample_hook       frame -> frame step that regroups a cleaned sample the way the parser does outside the
+#                     spec, so /csv/validate converts the same columns the batches are built from
+
+ColumnBatch = Dict[str, List[Any]]
+FrameStep = Callable[[pd.DataFrame], pd.DataFrame]
+
+_EMPTY_NUMERIC_TOKENS = ["", "-", ".", "-."]
+
+_NUMERIC_TEXT_RE = r"-?(?:\d+(?:\.\d*)?|\.\d+)"
+
+def clean_header(name: str) -> str:
+    return " ".join(str(name).strip().split())
+
+def _is_missing(raw) -> bool:
+    return raw is None or (isinstance(raw, float) and pd.isna(raw))
+
+def _to_str_or_none(raw) -> Optional[str]:
+    if _is_missing(raw):
+        return None
+    s = str(raw).strip()
+    return s if s != "" else None
+
+def _to_text(raw) -> Optional[str]:
+    return None if _is_missing(raw) else str(raw).strip()
+
+def _to_int_or_none(raw) -> Optional[int]:
+    if _is_missing(raw):
+        return None
+    s = str(raw).strip()
+    s = s.replace(" ", "")
+    if "," in s and "." not in s:
+        s = s.replace(",", ".")
+    s = re.sub(r"[^\d\.\-]+", "", s)
+    if s in ("", "-", ".", "-."):
+        return None
+    try:
+        return int(float(s))
+    except Exception:
+        return None
+
+def _to_float_or_none(raw) -> Optional[float]:
+    if _is_missing(raw):
+        return None
+    s = str(raw).strip()
+    neg = False
+    if s.startswith("(") and s.endswith(")"):
+        neg = True
+        s = s[1:-1]
+    s = s.replace(",", "").replace(" ", "")
+    s = re.sub(r"[^\d.\-]+", "", s)
+    if s in ("", "-", ".", "-.",):
+        return None
+    try:
+        val = float(s)
+        return -val if neg else val
+    except Exception:
+        return None
+
+def _to_local_datetime(raw) -> Optional[datetime]:
+    ts = pd.to_datetime(raw, errors="coerce")
+    if not isinstance(ts, pd.Timestamp):
+        return None
+    py_datetime = ts.to_pydatetime()
+    return py_datetime.replace(tzinfo=JKT) if py_datetime.tzinfo is None else py_datetime
+
+def apply_scalar_fallback(out: np.ndarray, raw: pd.Series, failed: np.ndarray, converter) -> np.ndarray:
+    # Values the column-wise path could not convert go through the scalar
+    # helper once per distinct value, so edge cases keep the exact old result.
+    if not failed.any():
+        return out
+    codes, uniques = pd.factorize(raw[failed])
+    converted = np.empty(len(uniques), dtype=object)
+    for k, value in enumerate(uniques):
+        try:
+            converted[k] = converter(value)
+        except Exception:
+            converted[k] = None
+    out[failed] = converted[codes]
+    return out
+
+def _parse_numeric_text(s: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    valid = s.str.fullmatch(_NUMERIC_TEXT_RE).to_numpy(dtype=bool)
+    nums = np.full(len(s), np.nan)
+    if valid.any():
+        nums[valid] = s[valid].astype("float64").to_numpy()
+    return nums, valid
+
+def _int_column(raw: pd.Series) -> np.ndarray:
+    s = raw.astype(str).str.strip().str.replace(" ", "", regex=False)
+    comma_decimal = s.str.contains(",", regex=False) & ~s.str.contains(".", regex=False)
+    s = s.mask(comma_decimal, s.str.replace(",", ".", regex=False))
+    s = s.str.replace(r"[^\d\.\-]+", "", regex=True)
+
+    nums, valid = _parse_numeric_text(s)
+    out = np.full(len(s), None, dtype=object)
+    if valid.any():
+        out[valid] = [int(v) for v in np.trunc(nums[valid]).tolist()]
+
+    failed = ~valid & ~s.isin(_EMPTY_NUMERIC_TOKENS).to_numpy(dtype=bool)
+    return apply_scalar_fallback(out, raw, failed, _to_int_or_none)
+
+def _float_column(raw: pd.Series) -> np.ndarray:
+    s = raw.astype(str).str.strip()
+    neg = (s.str.startswith("(") & s.str.endswith(")")).to_numpy(dtype=bool)
+    s = s.mask(neg, s.str.slice(1, -1))
+    s = s.str.replace(",", "", regex=False).str.replace(" ", "", regex=False)
+    s = s.str.replace(r"[^\d.\-]+", "", regex=True)
+
+    nums, valid = _parse_numeric_text(s)
+    nums = np.where(neg, -nums, nums)
+    out = np.full(len(s), None, dtype=object)
+    if valid.any():
+        out[valid] = nums[valid].tolist()
+
+    failed = ~valid & ~s.isin(_EMPTY_NUMERIC_TOKENS).to_numpy(dtype=bool)
+    return apply_scalar_fallback(out, raw, failed, _to_float_or_none)
+
+def _str_column(raw: pd.Series) -> np.ndarray:
+    s = raw.astype(str).str.strip()
+    out = s.to_numpy(dtype=object)
+    out[(s == "").to_numpy(dtype=bool)] = None
+    return out
+
+def _text_column(raw: pd.Series) -> np.ndarray:
+    return raw.astype(str).str.strip().to_numpy(dtype=object)
+
+def _iso_date_column(raw: pd.Series, formats=None, report: Optional[IngestReport] = None) -> np.ndarray:
+    values, failures = normalize_iso_date_column(raw, formats=formats)
+    record_date_failures(report, str(raw.name), failures)
+    return values
+
+def _local_midnight_column(raw: pd.Series, formats=None, report: Optional[IngestReport] = None) -> np.ndarray:
+    values, failures = normalize_local_midnight_column(raw, JKT, formats=formats)
+    record_date_failures(report, str(raw.name), failures)
+    return values
+
+def _local_datetime_column(raw: pd.Series) -> np.ndarray:
+    # JKT is attached the way datetime.replace does it; tz_localize with a ZoneInfo zone
+    # resolves offsets element by element and is several times slower
+    out = np.full(len(raw), None, dtype=object)
+    if pd.api.types.is_datetime64_dtype(raw.dtype):
+        out[:] = [value.replace(tzinfo=JKT) for value in raw.array.to_pydatetime()]
+    elif isinstance(raw.dtype, pd.DatetimeTZDtype):
+        out[:] = list(raw.array.to_pydatetime())
+    else:
+        out[:] = [_to_local_datetime(value) for value in raw]
+    return out
+
+def _count_column(raw: pd.Series) -> np.ndarray:
+    out = np.full(len(raw), None, dtype=object)
+    out[:] = [int(value or 0) for value in raw.tolist()]
+    return out
+
+def _number_column(raw: pd.Series) -> np.ndarray:
+    out = np.full(len(raw), None, dtype=object)
+    out[:] = raw.astype("float64").tolist()
+    return out
+
+def _cents_column(raw: pd.Series) -> np.ndarray:
+    # np.round rounds halves to even like round() did per row
+    out = np.full(len(raw), None, dtype=object)
+    out[:] = np.round(raw.astype("float64").to_numpy() * 100).astype(np.int64).tolist()
+    return out
+
+# type name -> (column-wise converter, per-value fallback)
+COLUMN_TYPES = {
+    "str": (_str_column, _to_str_or_none),
+    "text": (_text_column, _to_text),
+    "int": (_int_column, _to_int_or_none),
+    "float": (_float_column, _to_float_or_none),
+    "iso_date": (_iso_date_column, to_iso_date_str),
+    "local_midnight": (_local_midnight_column, lambda raw: to_local_midnight(raw, JKT)),
+    "local_datetime": (_local_datetime_column, _to_local_datetime),
+    "count": (_count_column, lambda raw: int(raw or 0)),
+    "number": (_number_column, lambda raw: float(raw or 0)),
+    "cents": (_cents_column, lambda raw: int(round(float(raw or 0) * 100))),
+}
+
+# Date types whose format order is settled once per column from the head of the file
+DATE_FORMAT_RANKERS = {
+    "iso_date": rank_iso_date_formats,
+    "local_midnight": rank_local_date_formats,
+}
+
+DATE_HEAD_ROWS = 2000
+
+def compile_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    column_types = spec.get("column_types", {})
+    unknown = sorted(set(column_types.values()) - set(COLUMN_TYPES))
+    if unknown:
+        raise ValueError(f"Spec '{spec['file_type']}' uses unknown column types: {unknown}")
+
+    columns: List[Tuple[str, str, Any, Any]] = []
+    seen = set()
+    for header, model_attr in [*spec["header_map"].items(), *spec.get("derived_columns", {}).items()]:
+        cleaned = clean_header(header)
+        if (cleaned, model_attr) in seen:
+            continue
+        seen.add((cleaned, model_attr))
+        column_converter, scalar_converter = COLUMN_TYPES[column_types.get(model_attr, "str")]
+        columns.append((cleaned, model_attr, column_converter, scalar_converter))
+
+    return {
+        "spec": spec,
+        "file_type": spec["file_type"],
+        "columns": columns,
+        "read_columns": [*spec["header_map"], *spec.get("extra_columns", ())],
+        "skiprows": spec.get("skiprows", 0),
+        "required_columns": list(spec.get("required_columns", ())),
+        "steps": [*spec.get("row_filters", ()), *spec.get("hooks", ())],
+        "batch_hooks": list(spec.get("batch_hooks", ())),
+        "whole_file": spec.get("whole_file", False),
+        "arrow": spec.get("arrow", False),
+        "sample_hook": spec.get("sample_hook"),
+        "date_columns": {
+            model_attr: type_name for model_attr, type_name in column_types.items() if type_name in DATE_FORMAT_RANKERS
+        },
+    }
+
+def drop_blank_rows(df: pd.DataFrame) -> pd.DataFrame:
+    before = len(df)
+    df = df.dropna(how="all")
+    logger.info(f"Dropped {before - len(df)} blank rows, {len(df)} records left")
+    return df
+
+def numeric_rows(column: str) -> FrameStep:
+    # Report exports end with a summary section whose rows carry no running number
+    def keep_numbered_rows(df: pd.DataFrame) -> pd.DataFrame:
+        if column not in df.columns:
+            logger.info(f"Column '{column}' not found for summary filtering.")
+            return df
+        df = df[pd.to_numeric(df[column], errors="coerce").notna()]
+        logger.info(f"After filtering summary based on '{column}': {len(df)} records")
+        return df
+    return keep_numbered_rows
+
+def read_engine(plan: Dict[str, Any]) -> str:
+    return csv_read_engine(plan["file_type"]) if plan["arrow"] else "c"
+
+def read_frames(
+    plan: Dict[str, Any],
+    source: Union[IO[bytes], IO[str]],
+    batch_rows: Optional[int] = None,
+    lenient: bool = False,
+    layout: Optional[Dict[str, Any]] = None,
+) -> Iterator[pd.DataFrame]:
+    if layout is None:
+        layout = detect_csv_layout(source, plan["read_columns"], default_skiprows=plan["skiprows"])
+    return read_csv_chunks(
+        source,
+        chunksize=None if plan["whole_file"] else batch_rows,
+        lenient=lenient,
+        engine=read_engine(plan),
+        include_columns=plan["read_columns"],
+        as_text=plan["arrow"],
+        **layout,
+    )
+
+def detect_date_formats(plan: Dict[str, Any], source: IO[bytes], layout: Dict[str, Any]) -> Dict[str, Tuple[str, ...]]:
+    # Ranked on the cleaned head of the file, so every chunk and pool block reads a column in one order
+    if not plan["date_columns"]:
+        return {}
+    head = read_csv_head(source, DATE_HEAD_ROWS, skiprows=layout["skiprows"])
+    df = next(read_csv_chunks(io.BytesIO(head), sep=layout["sep"], quoting=layout["quoting"], as_text=True), None)
+    if df is None or df.empty:
+        return {}
+    try:
+        df = clean_frame(plan, df, log_details=False)
+    except ValueError:
+        # The parse itself reports the missing columns
+        return {}
+
+    formats: Dict[str, Tuple[str, ...]] = {}
+    for cleaned_header, model_attr, _, _ in plan["columns"]:
+        type_name = plan["date_columns"].get(model_attr)
+        if type_name is None or model_attr in formats or cleaned_header not in df.columns:
+            continue
+        formats[model_attr] = DATE_FORMAT_RANKERS[type_name](df[cleaned_header])
+    logger.info(f"Date formats for {plan['file_type']}: {formats}")
+    return formats
+
+def clean_frame(plan: Dict[str, Any], df: pd.DataFrame, log_details: bool) -> pd.DataFrame:
+    if log_details:
+        logger.info(f"=== {plan['file_type']} CSV COLUMNS ===")
+        logger.info(f"DataFrame shape: {df.shape}")
+        logger.info(f"Columns BEFORE cleaning: {list(df.columns)}")
+    df.columns = df.columns.map(clean_header)
+    if log_details:
+        logger.info(f"Cleaned columns: {list(df.columns)}")
+
+    missing_cols = [col for col in plan["required_columns"] if col not in df.columns]
+    if missing_cols:
+        logger.info(f"Missing required columns AFTER cleaning: {missing_cols}. Available: {list(df.columns)}")
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+    for step in plan["steps"]:
+        df = step(df)
+    return df
+
+def _convert_column(
+    cleaned_header: str,
+    model_attr: str,
+    column_converter,
+    scalar_converter,
+    col: pd.Series,
+) -> Tuple[np.ndarray, np.ndarray]:
+    mask = col.notna().to_numpy(dtype=bool)
+    values = np.full(len(col), None, dtype=object)
+
+    if mask.any():
+        raw = col[mask]
+        try:
+            values[mask] = column_converter(raw)
+        except Exception as e:
+            logger.warning(
+                f"Column '{cleaned_header}' -> {model_attr}: column-wise conversion failed, "
+                f"falling back to per-value conversion. Error: {e}"
+            )
+            values[mask] = apply_scalar_fallback(
+                np.full(len(raw), None, dtype=object),
+                raw,
+                np.ones(len(raw), dtype=bool),
+                scalar_converter,
+            )
+    return values, mask
+
+def build_batch(
+    plan: Dict[str, Any],
+    df: pd.DataFrame,
+    upload_id: int,
+    date_formats: Optional[Dict[str, Tuple[str, ...]]] = None,
+    report: Optional[IngestReport] = None,
+) -> ColumnBatch:
+    converted: Dict[str, np.ndarray] = {}
+    present: Dict[str, np.ndarray] = {}
+
+    for cleaned_header, model_attr, column_converter, scalar_converter in plan["columns"]:
+        if model_attr in converted or cleaned_header not in df.columns:
+            continue
+        if model_attr in plan["date_columns"]:
+            formats = (date_formats or {}).get(model_attr)
+            column_converter = partial(column_converter, formats=formats, report=report)
+        converted[model_attr], present[model_attr] = _convert_column(
+            cleaned_header, model_attr, column_converter, scalar_converter, df[cleaned_header]
+        )
+
+    if not converted:
+        return {}
+
+    # Rows without a single mapped value are dropped, as they were when built one ORM object at a time
+    keep = np.logical_or.reduce(list(present.values()))
+    batch = {attr: values[keep].tolist() for attr, values in converted.items()}
+    batch["csv_upload_id"] = [upload_id] * int(keep.sum())
+    for hook in plan["batch_hooks"]:
+        hook(batch)
+    return batch
+
+def iter_frame_batches(
+    plan: Dict[str, Any],
+    df: pd.DataFrame,
+    upload_id: int,
+    batch_rows: Optional[int] = None,
+    report: Optional[IngestReport] = None,
+    date_formats: Optional[Dict[str, Tuple[str, ...]]] = None,
+) -> Iterator[Tuple[ColumnBatch, int]]:
+    step = batch_rows or len(df) or 1
+    for start in range(0, len(df), step):
+        started = start_stage()
+        batch = build_batch(plan, df.iloc[start:start + step], upload_id, date_formats, report)
+        batch_count = column_batch_size(batch)
+        record_stage(report, "convert", started, batch_count)
+        if batch_count:
+            yield batch, batch_count
+
+def parse_csv(
+    plan: Dict[str, Any],
+    source: Union[IO[bytes], IO[str]],
+    upload_id: int,
+    batch_rows: Optional[int] = None,
+    lenient: bool = False,
+    report: Optional[IngestReport] = None,
+) -> Iterator[Tuple[ColumnBatch, int]]:
+    file_type = plan["file_type"]
+    seen_rows = 0
+    processed_row_count = 0
+
+    started = start_stage()
+    layout = detect_csv_layout(source, plan["read_columns"], default_skiprows=plan["skiprows"])
+    date_formats = detect_date_formats(plan, source, layout)
+    frames = read_frames(plan, source, batch_rows=batch_rows, lenient=lenient, layout=layout)
+    for chunk in frames:
+        record_stage(report, "read", started, len(chunk))
+        if chunk.empty:
+            started = start_stage()
+            continue
+        started = start_stage()
+        df = clean_frame(plan, chunk, log_details=seen_rows == 0)
+        record_stage(report, "clean", started, len(df))
+        seen_rows += len(chunk)
+
+        # Whole-file specs are read as one frame and only cut into batches after filtering
+        step = batch_rows if plan["whole_file"] else None
+        for batch, batch_count in iter_frame_batches(plan, df, upload_id, step, report, date_formats):
+            processed_row_count += batch_count
+            yield batch, batch_count
+        started = start_stage()
+
+    if seen_rows == 0:
+        raise ValueError(CSV_UNPARSEABLE_MESSAGE)
+
+    if processed_row_count == 0:
+        raise ValueError("No valid data rows found after parsing and filtering.")
+
+    logger.info(f"Successfully parsed {processed_row_count} {file_type} rows.")
+
+def _sample_column_stats(plan: Dict[str, Any], df: pd.DataFrame) -> List[Dict[str, Any]]:
+    # A conversion failed when a non-blank cell came out empty
+    column_types = plan["spec"].get("column_types", {})
+    stats: List[Dict[str, Any]] = []
+    seen = set()
+    for cleaned_header, model_attr, column_converter, scalar_converter in plan["columns"]:
+        if model_attr in seen or cleaned_header not in df.columns:
+            continue
+        seen.add(model_attr)
+        col = df[cleaned_header]
+        values, mask = _convert_column(cleaned_header, model_attr, column_converter, scalar_converter, col)
+        filled = mask & (col.astype(str).str.strip() != "").to_numpy(dtype=bool)
+        failed = int((filled & pd.isna(values)).sum())
+        filled_count = int(filled.sum())
+        stats.append({
+            "column": cleaned_header,
+            "attribute": model_attr,
+            "type": column_types.get(model_attr, "str"),
+            "values": filled_count,
+            "failed": failed,
+            "failure_rate": round(failed / filled_count, 4) if filled_count else None,
+        })
+    return stats
+
+def validate_sample(plan: Dict[str, Any], source: IO[bytes], head_rows: int, tail_rows: int) -> Dict[str, Any]:
+    # Dry run of the parser on the head and tail of an export: nothing is batched or stored. The sample
+    # is read with the C engine so every column of the file is reported, not only the mapped ones.
+    layout = detect_csv_layout(source, plan["read_columns"], default_skiprows=plan["skiprows"])
+    sample = read_csv_sample(source, head_rows, tail_rows, skiprows=layout["skiprows"], sep=layout["sep"])
+    sample["data"].decode("utf-8-sig")
+
+    df = next(
+        read_csv_chunks(io.BytesIO(sample["data"]), sep=layout["sep"], quoting=layout["quoting"], as_text=plan["arrow"]),
+        None,
+    )
+    if df is None:
+        raise ValueError(CSV_UNPARSEABLE_MESSAGE)
+
+    columns = [clean_header(name) for name in df.columns]
+    found = set(columns)
+    missing_required = [col for col in plan["required_columns"] if col not in found]
+    headers_by_attr: Dict[str, List[str]] = {}
+    for header, model_attr in plan["spec"]["header_map"].items():
+        headers_by_attr.setdefault(model_attr, []).append(clean_header(header))
+    missing_columns = [headers[0] for headers in headers_by_attr.values() if not found.intersection(headers)]
+
+    result = {
+        "file_type": plan["file_type"],
+        "columns": columns,
+        "missing_required_columns": missing_required,
+        "missing_columns": missing_columns,
+        "sampled_rows": len(df),
+        "rows_after_filters": None,
+        "estimated_rows": sample["row_count"],
+        "row_count_exact": sample["row_count_exact"],
+        "column_stats": [],
+        "error": None,
+    }
+    if missing_required:
+        result["error"] = f"Missing required columns: {missing_required}"
+        return result
+
+    try:
+        df = clean_frame(plan, df, log_details=False)
+        if plan["sample_hook"]:
+            df = plan["sample_hook"](df)
+    except Exception as e:
+        logger.info(f"Sample of {plan['file_type']} could not be cleaned: {e}")
+        result["error"] = str(e)
+        return result
+
+    result["rows_after_filters"] = len(df)
+    result["column_stats"] = _sample_column_stats(plan, df)
+    return result
@@ -0,0 +1,386 @@
+# app/utils/csv_stream.py
+import csv
+import io
+import logging
+import re
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+CSV_UNPARSEABLE_MESSAGE = "CSV file is empty or could not be parsed correctly after UTF-8 decoding."
+
+CSV_SNIFF_BYTES = 64 * 1024
+CSV_HEADER_SCAN_LINES = 50
+CSV_DELIMITERS = (",", ";", "\t", "|")
+CSV_MIN_HEADER_MATCHES = 2
+CSV_TAIL_ALIGN_LINES = 8
+
+# The tokens pandas reads as NaN by default, so both engines agree on what an empty cell is
+CSV_NULL_VALUES = [
+    "", " ", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+class CSVParseError(ValueError):
+    pass
+
+def _header_key(name: str) -> str:
+    return re.sub(r"\s+", " ", name).strip().casefold()
+
+def _split_line(line: str, sep: str) -> List[str]:
+    return next(csv.reader([line], delimiter=sep), [])
+
+def _matching_records(lines: List[str], sep: str, quoting: int, width: int) -> int:
+    records = list(csv.reader(io.StringIO("\n".join(lines)), delimiter=sep, quoting=quoting))
+    # The last record may be cut off by the end of the sample
+    return sum(1 for record in records[:-1] if len(record) == width)
+
+def detect_csv_layout(
+    source: Union[IO[bytes], IO[str]],
+    header_names: Iterable[str],
+    default_skiprows: int = 0,
+) -> Dict[str, Any]:
+    # Only the head of the file is read: the header row is the line naming the most known columns,
+    # which also settles the delimiter, so report preambles of any length are skipped without a retry
+    start = source.tell()
+    sample = source.read(CSV_SNIFF_BYTES)
+    source.seek(start)
+    if isinstance(sample, bytes):
+        sample = sample.decode("utf-8-sig", errors="ignore")
+    sample = sample.lstrip("\ufeff")
+    lines = sample.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+
+    known = {_header_key(name) for name in header_names}
+    best = (0, default_skiprows, ",")
+    for index, line in enumerate(lines[:CSV_HEADER_SCAN_LINES]):
+        for sep in CSV_DELIMITERS:
+            matches = len({_header_key(cell) for cell in _split_line(line, sep)} & known)
+            if matches > best[0]:
+                best = (matches, index, sep)
+
+    matches, skiprows, sep = best
+    if matches < min(CSV_MIN_HEADER_MATCHES, len(known)):
+        logger.info(f"No header row found in the first {CSV_HEADER_SCAN_LINES} lines, assuming skiprows={default_skiprows}")
+        return {"skiprows": default_skiprows, "sep": ",", "quoting": csv.QUOTE_MINIMAL}
+    if skiprows != default_skiprows:
+        logger.info(f"Header row found at line {skiprows + 1} instead of line {default_skiprows + 1}")
+
+    # A stray quote makes quoted parsing swallow the following lines; whichever mode keeps more
+    # records at the header's width wins, and quoted fields are kept on a tie
+    width = len(_split_line(lines[skiprows], sep))
+    body = lines[skiprows + 1:]
+    quoting = csv.QUOTE_MINIMAL
+    if _matching_records(body, sep, csv.QUOTE_NONE, width) > _matching_records(body, sep, csv.QUOTE_MINIMAL, width):
+        quoting = csv.QUOTE_NONE
+    logger.info(f"Detected CSV layout: skiprows={skiprows}, sep={sep!r}, quoting={quoting}, {matches} known columns")
+    return {"skiprows": skiprows, "sep": sep, "quoting": quoting}
+
+def csv_read_engine(file_type: str) -> str:
+    return "pyarrow" if file_type in settings.CSV_ARROW_FILE_TYPES else "c"
+
+def _arrow_column_names(header: bytes, sep: str, quoting: int) -> List[str]:
+    text = header.decode("utf-8-sig", errors="replace").lstrip("\ufeff")
+    names = next(csv.reader(io.StringIO(text), delimiter=sep, quoting=quoting), [])
+    # Same names pandas gives blank and repeated headers, so the cleaning code sees identical columns
+    counts: Dict[str, int] = {}
+    mangled: List[str] = []
+    for i, name in enumerate(names):
+        name = name or f"Unnamed: {i}"
+        if name in counts:
+            counts[name] += 1
+            name = f"{name}.{counts[name]}"
+        else:
+            counts[name] = 0
+        mangled.append(name)
+    return mangled
+
+def _arrow_frame(table: pa.Table, offset: int) -> pd.DataFrame:
+    df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    return df
+
+def _read_arrow_chunks(
+    source: IO[bytes],
+    skiprows: int,
+    chunksize: Optional[int],
+    lenient: bool,
+    sep: str,
+    quoting: int,
+    include_columns: Optional[Iterable[str]],
+) -> Iterator[pd.DataFrame]:
+    header = read_csv_header(source, skiprows=skiprows)
+    names = _arrow_column_names(header, sep, csv.QUOTE_NONE if lenient else quoting)
+    if not names:
+        raise CSVParseError(CSV_UNPARSEABLE_MESSAGE)
+
+    # Every column is read as text: the converters own the typing, and a column inferred as
+    # numbers from the first block can no longer break on a later one
+    wanted = {_header_key(name) for name in include_columns or ()}
+    included = [name for name in names if _header_key(name) in wanted] or names
+    skipped_rows = []
+
+    def skip_invalid_row(row) -> str:
+        skipped_rows.append(row.number)
+        return "skip"
+
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(column_names=names),
+        parse_options=pa_csv.ParseOptions(
+            delimiter=sep,
+            quote_char=False if lenient or quoting == csv.QUOTE_NONE else '"',
+            newlines_in_values=True,
+            invalid_row_handler=skip_invalid_row,
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in included},
+            include_columns=included,
+            null_values=CSV_NULL_VALUES,
+            strings_can_be_null=True,
+            quoted_strings_can_be_null=True,
+        ),
+    )
+
+    pending: List[pa.RecordBatch] = []
+    pending_rows = 0
+    offset = 0
+    for record_batch in reader:
+        pending.append(record_batch)
+        pending_rows += record_batch.num_rows
+        if chunksize is None or pending_rows < chunksize:
+            continue
+        table = pa.Table.from_batches(pending)
+        for start in range(0, table.num_rows - chunksize + 1, chunksize):
+            yield _arrow_frame(table.slice(start, chunksize), offset)
+            offset += chunksize
+        rest = table.slice(table.num_rows - table.num_rows % chunksize)
+        pending, pending_rows = rest.to_batches(), rest.num_rows
+
+    if skipped_rows:
+        logger.info(f"Skipped {len(skipped_rows)} rows with the wrong number of fields")
+    if pending_rows or chunksize is None:
+        yield _arrow_frame(pa.Table.from_batches(pending, schema=reader.schema), offset)
+
+def read_csv_chunks(
+    source: Union[IO[bytes], IO[str]],
+    skiprows: int = 0,
+    chunksize: Optional[int] = None,
+    lenient: bool = False,
+    sep: str = ",",
+    quoting: int = csv.QUOTE_MINIMAL,
+    engine: str = "c",
+    include_columns: Optional[Iterable[str]] = None,
+    as_text: bool = False,
+) -> Iterator[pd.DataFrame]:
+    mode = "lenient" if lenient else "standard"
+    if engine == "pyarrow":
+        # Reads the raw bytes into Arrow-backed text columns, limited to the columns the parser maps
+        frames = _read_arrow_chunks(source, skiprows, chunksize, lenient, sep, quoting, include_columns)
+        chunk_index = 0
+        while True:
+            try:
+                df = next(frames)
+            except StopIteration:
+                return
+            except pa.ArrowException as e:
+                logger.info(f"Arrow {mode} parsing with skiprows={skiprows} failed at chunk {chunk_index}: {e}")
+                raise CSVParseError(CSV_UNPARSEABLE_MESSAGE) from e
+
+            if chunk_index == 0:
+                logger.info(f"Arrow {mode} parsing with skiprows={skiprows} successful!")
+            chunk_index += 1
+            yield df
+
+    # Malformed lines are dropped in the same pass; lenient only gives up on quoting, for a stray
+    # quote past the sampled head that the C tokenizer cannot recover from
+    read_kwargs = {
+        "skiprows": skiprows,
+        "sep": sep,
+        "quoting": csv.QUOTE_NONE if lenient else quoting,
+        "on_bad_lines": "skip",
+        "encoding": "utf-8-sig",
+    }
+    if as_text:
+        # Like the Arrow path: every chunk would otherwise infer its own dtypes, and an ID column
+        # with a blank cell in one chunk would come back as '353.0' there and '353' elsewhere
+        read_kwargs["dtype"] = str
+
+    try:
+        if chunksize is None:
+            frames = iter([pd.read_csv(source, **read_kwargs)])
+        else:
+            frames = pd.read_csv(source, chunksize=chunksize, **read_kwargs)
+    except Exception as e:
+        logger.info(f"{mode.capitalize()} parsing with skiprows={skiprows} failed: {e}")
+        raise CSVParseError(CSV_UNPARSEABLE_MESSAGE) from e
+
+    chunk_index = 0
+    while True:
+        try:
+            df = next(frames)
+        except StopIteration:
+            break
+        except Exception as e:
+            logger.info(f"{mode.capitalize()} parsing with skiprows={skiprows} failed at chunk {chunk_index}: {e}")
+            raise CSVParseError(CSV_UNPARSEABLE_MESSAGE) from e
+
+        if chunk_index == 0:
+            logger.info(f"{mode.capitalize()} parsing with skiprows={skiprows} successful!")
+        chunk_index += 1
+        yield df
+
+def rows_to_column_batch(rows: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    keys = dict.fromkeys(key for row in rows for key in row)
+    return {key: [row.get(key) for row in rows] for key in keys}
+
+def column_batch_size(batch: Dict[str, List[Any]]) -> int:
+    return len(next(iter(batch.values()), []))
+
+def _read_record(source: IO[bytes]) -> bytes:
+    record = source.readline()
+    while record and record.count(b'"') % 2:
+        line = source.readline()
+        if not line:
+            break
+        record += line
+    return record
+
+def read_csv_header(source: IO[bytes], skiprows: int = 0) -> bytes:
+    for _ in range(skiprows):
+        if not source.readline():
+            return b""
+    # pandas skips blank lines before the header row as well
+    record = _read_record(source)
+    while record and not record.strip():
+        record = _read_record(source)
+    return record
+
+def _last_record_boundary(buf: bytes) -> int:
+    # Returns the end of the last complete record: a newline preceded by an even number of quotes
+    quotes_before = buf.count(b'"')
+    end = len(buf)
+    while True:
+        newline = buf.rfind(b"\n", 0, end)
+        if newline < 0:
+            return 0
+        quotes_before -= buf.count(b'"', newline, end)
+        if quotes_before % 2 == 0:
+            return newline + 1
+        end = newline
+
+def iter_record_blocks(source: IO[bytes], block_bytes: int) -> Iterator[bytes]:
+    pending = b""
+    while True:
+        data = source.read(block_bytes)
+        if not data:
+            if pending:
+                yield pending
+            return
+        buf = pending + data
+        cut = _last_record_boundary(buf)
+        if cut == 0:
+            pending = buf
+            continue
+        yield buf[:cut]
+        pending = buf[cut:]
+
+def _read_records(source: IO[bytes], limit: Optional[int] = None) -> List[bytes]:
+    # Blank lines are left out, as pandas skips them
+    records: List[bytes] = []
+    while limit is None or len(records) < limit:
+        record = _read_record(source)
+        if not record:
+            break
+        if record.strip():
+            records.append(record if record.endswith(b"\n") else record + b"\n")
+    return records
+
+def read_csv_head(source: IO[bytes], head_rows: int, skiprows: int = 0) -> bytes:
+    # The header and the first head_rows records; the source is left where it was
+    start = source.tell()
+    header = read_csv_header(source, skiprows)
+    if header and not header.endswith(b"\n"):
+        header += b"\n"
+    head = _read_records(source, head_rows)
+    source.seek(start)
+    return header + b"".join(head)
+
+def _record_width(record: bytes, sep: str) -> int:
+    rows = list(csv.reader(io.StringIO(record.decode("utf-8", errors="ignore")), delimiter=sep))
+    return len(rows[0]) if len(rows) == 1 else -1
+
+def _tail_record_start(buf: bytes, sep: str, width: int) -> int:
+    # A seek can land inside a quoted field that spans lines; of the first few line starts, the one
+    # whose records most often keep the header's width is taken as a record boundary
+    best = (-1, len(buf))
+    start = 0
+    for _ in range(CSV_TAIL_ALIGN_LINES):
+        newline = buf.find(b"\n", start)
+        if newline < 0:
+            break
+        start = newline + 1
+        records = _read_records(io.BytesIO(buf[start:]))
+        matches = sum(1 for record in records if _record_width(record, sep) == width)
+        if matches > best[0]:
+            best = (matches, start)
+        if matches == len(records):
+            break
+    return best[1]
+
+def read_csv_sample(
+    source: IO[bytes],
+    head_rows: int,
+    tail_rows: int,
+    skiprows: int = 0,
+    sep: str = ",",
+) -> Dict[str, Any]:
+    # Reads the header, the first head_rows and the last tail_rows records without scanning the middle
+    # of the file; the row count is exact when the two ends meet and estimated from the sampled
+    # record sizes otherwise
+    source.seek(0, io.SEEK_END)
+    total_bytes = source.tell()
+    source.seek(0)
+    header = read_csv_header(source, skiprows)
+    body_start = source.tell()
+    if header and not header.endswith(b"\n"):
+        header += b"\n"
+    head = _read_records(source, head_rows)
+    head_end = source.tell()
+
+    sampled_bytes = sum(len(record) for record in head)
+    tail_bytes = max(CSV_SNIFF_BYTES, 2 * tail_rows * sampled_bytes // max(len(head), 1))
+    exact = total_bytes - head_end <= tail_bytes
+    if exact:
+        rest = _read_records(source)
+    else:
+        source.seek(total_bytes - tail_bytes)
+        buf = source.read()
+        width = len(_split_line(header.decode("utf-8-sig", errors="ignore").rstrip("\r\n"), sep))
+        rest = _read_records(io.BytesIO(buf[_tail_record_start(buf, sep, width):]))
+    tail = rest[-tail_rows:] if tail_rows else []
+    if not exact and not head and not tail:
+        # No sampled record to average over (only blank lines at both ends, say), so the middle is counted after all
+        source.seek(head_end)
+        rest = _read_records(source)
+        tail = rest[-tail_rows:] if tail_rows else []
+        exact = True
+
+    if exact:
+        row_count = len(head) + len(rest)
+    else:
+        sampled_records = head + tail
+        average = sum(len(record) for record in sampled_records) / len(sampled_records)
+        row_count = round((total_bytes - body_start) / average)
+
+    return {
+        "data": header + b"".join(head + tail),
+        "sampled_rows": len(head) + len(tail),
+        "row_count": row_count,
+        "row_count_exact": exact,
+    }
@@ -0,0 +1,168 @@
+# app/utils/date_normalize.py
+import logging
+import re
+import warnings
+from datetime import date, datetime, tzinfo
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MIDNIGHT_SUFFIX_RE = r"\b00:00(:00)?\b"
+
+ISO_DATE_FORMATS = (
+    "%Y-%m-%d", "%d-%m-%Y", "%m-%d-%Y",
+    "%Y-%m-%d %H:%M:%S", "%d-%m-%Y %H:%M:%S", "%m-%d-%Y %H:%M:%S",
+)
+
+LOCAL_DATE_FORMATS = ("%Y-%m-%d",)
+
+FORMAT_SAMPLE_SIZE = 500
+
+# pandas warns on every fuzzy parse that it could not infer a format, or that the one it inferred ignores dayfirst
+FUZZY_PARSE_WARNINGS = r"(Could not infer format|Parsing dates in .* format when dayfirst=)"
+
+def _is_missing(raw) -> bool:
+    return raw is None or (isinstance(raw, float) and pd.isna(raw))
+
+def _parse_date_text(s: str, formats: Sequence[str]) -> Optional[date]:
+    dt = None
+    for fmt in formats:
+        try:
+            dt = pd.to_datetime(s, format=fmt, errors="raise", utc=False)
+            break
+        except ValueError:
+            dt = None
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message=FUZZY_PARSE_WARNINGS, category=UserWarning)
+        if dt is None or pd.isna(dt):
+            dt = pd.to_datetime(s, errors="coerce", dayfirst=True, utc=False)
+        if dt is None or pd.isna(dt):
+            dt = pd.to_datetime(s, errors="coerce", dayfirst=False, utc=False)
+
+    if dt is None or pd.isna(dt):
+        return None
+    return dt.date()
+
+def _clean_iso_text(s: str) -> str:
+    return re.sub(MIDNIGHT_SUFFIX_RE, "", s).strip().replace("/", "-")
+
+def _clean_local_text(s: str) -> str:
+    return re.sub(MIDNIGHT_SUFFIX_RE, "", s).strip()
+
+def to_iso_date_str(raw) -> Optional[str]:
+    if _is_missing(raw):
+        return None
+    s = str(raw).strip()
+    if not s:
+        return None
+
+    d = _parse_date_text(_clean_iso_text(s), ISO_DATE_FORMATS)
+    if d is None:
+        return None
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+def to_local_midnight(raw, tz: tzinfo) -> Optional[datetime]:
+    if _is_missing(raw):
+        return None
+    s = str(raw).strip()
+    if not s:
+        return None
+
+    d = _parse_date_text(_clean_local_text(s), LOCAL_DATE_FORMATS)
+    if d is None:
+        return None
+    return datetime(d.year, d.month, d.day, 0, 0, 0, tzinfo=tz)
+
+def _rank_formats(texts: pd.Series, formats: Sequence[str]) -> Tuple[str, ...]:
+    # The format that matches most of a sample is tried first, so a column written as mm/dd is read as
+    # mm/dd throughout instead of flipping to dd/mm whenever the day is 12 or less; ties keep the listed order
+    sample = texts[texts != ""].iloc[:FORMAT_SAMPLE_SIZE]
+    hits = [
+        int(pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum())
+        for fmt in formats
+    ]
+    order = sorted(range(len(formats)), key=lambda i: (-hits[i], i))
+    return tuple(formats[i] for i in order)
+
+def _distinct_texts(raw: pd.Series, clean_text) -> Tuple[np.ndarray, pd.Series, np.ndarray]:
+    codes, uniques = pd.factorize(raw, use_na_sentinel=True)
+    texts = pd.Series([str(value).strip() for value in uniques], dtype=object)
+    blank = (texts == "").to_numpy(dtype=bool)
+    return codes, texts.map(clean_text), blank
+
+# A chunked parse ranks the formats once from the head of the file and passes them to every chunk,
+# so a chunk whose days all happen to be 12 or less is read in the same order as the rest
+def rank_iso_date_formats(raw: pd.Series) -> Tuple[str, ...]:
+    _, texts, _ = _distinct_texts(raw.dropna(), _clean_iso_text)
+    return _rank_formats(texts, ISO_DATE_FORMATS)
+
+def rank_local_date_formats(raw: pd.Series) -> Tuple[str, ...]:
+    _, texts, _ = _distinct_texts(raw.dropna(), _clean_local_text)
+    return _rank_formats(texts, LOCAL_DATE_FORMATS)
+
+def _parse_distinct(texts: pd.Series, formats: Sequence[str]) -> np.ndarray:
+    parsed = pd.Series(pd.NaT, index=texts.index, dtype="datetime64[ns]")
+    pending = texts != ""
+    for fmt in formats:
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(texts[pending], format=fmt, errors="coerce")
+        pending = parsed.isna() & (texts != "")
+
+    out = np.full(len(texts), None, dtype=object)
+    ok = parsed.notna().to_numpy(dtype=bool)
+    if ok.any():
+        out[ok] = [ts.date() for ts in parsed[ok]]
+
+    # Whatever no explicit format matched gets the fuzzy day-first / month-first parse, once per distinct value
+    for i in np.flatnonzero(pending.to_numpy(dtype=bool)):
+        try:
+            out[i] = _parse_date_text(texts.iloc[i], ())
+        except Exception:
+            out[i] = None
+    return out
+
+def _normalize_column(
+    raw: pd.Series,
+    formats: Sequence[str],
+    ranked: Optional[Sequence[str]],
+    clean_text,
+    column: str,
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    codes, texts, blank = _distinct_texts(raw, clean_text)
+    dates = _parse_distinct(texts, ranked or _rank_formats(texts, formats))
+    failed_uniques = np.array([d is None for d in dates], dtype=bool) & ~blank
+    failures = int(failed_uniques[codes[codes >= 0]].sum()) if len(texts) else 0
+    if failures:
+        logger.warning(f"Column '{column}': {failures} of {len(raw)} date values could not be parsed and are stored as NULL.")
+    return codes, dates, failures
+
+# The trailing None in each lookup table is what factorize's -1 code (a missing cell) indexes
+def normalize_iso_date_column(
+    raw: pd.Series,
+    column: Optional[str] = None,
+    formats: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, int]:
+    codes, dates, failures = _normalize_column(raw, ISO_DATE_FORMATS, formats, _clean_iso_text, column or str(raw.name))
+    converted = np.array(
+        [None if d is None else f"{d.year:04d}-{d.month:02d}-{d.day:02d}" for d in dates] + [None],
+        dtype=object,
+    )
+    return converted[codes], failures
+
+def normalize_local_midnight_column(
+    raw: pd.Series,
+    tz: tzinfo,
+    column: Optional[str] = None,
+    formats: Optional[Sequence[str]] = None,
+) -> Tuple[np.ndarray, int]:
+    codes, dates, failures = _normalize_column(raw, LOCAL_DATE_FORMATS, formats, _clean_local_text, column or str(raw.name))
+    converted = np.array(
+        [None if d is None else datetime(d.year, d.month, d.day, 0, 0, 0, tzinfo=tz) for d in dates] + [None],
+        dtype=object,
+    )
+    return converted[codes], failures
@@ -0,0 +1,99 @@
+# app/utils/ingest_report.py
+import logging
+import resource
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# decode: spooling the upload (UTF-8 check and hash); read: layout detection and CSV tokenizing;
+# clean: header cleaning, filters and hooks; convert: typed column batches; insert: bulk saves
+# and fingerprints; commit: the final transaction commit
+INGEST_STAGES = ("decode", "read", "clean", "convert", "insert", "commit")
+
+# Non-blank date cells no format could read, per CSV column; kept next to the stages and stored as NULL
+DATE_FAILURES = "date_failures"
+
+IngestReport = Dict[str, Dict[str, Any]]
+
+# perf_counter and resident set size (MB) when a stage starts
+StageClock = Tuple[float, float]
+
+_PAGE_SIZE = resource.getpagesize()
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def current_rss_mb() -> float:
+    # ru_maxrss only ever grows, so it cannot tell which stage used the memory; without /proc
+    # the process peak is the best there is
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+    return round(resident_pages * _PAGE_SIZE / (1024 * 1024), 1)
+
+def start_stage() -> StageClock:
+    return time.perf_counter(), current_rss_mb()
+
+def _stage_entry(report: IngestReport, stage: str) -> Dict[str, Any]:
+    return report.setdefault(stage, {"seconds": 0.0, "rows": 0, "calls": 0, "rss_mb": 0.0, "rss_delta_mb": 0.0})
+
+def record_stage(report: Optional[IngestReport], stage: str, started: StageClock, rows: int = 0):
+    if report is None:
+        return
+    started_at, started_rss = started
+    ended_rss = current_rss_mb()
+    entry = _stage_entry(report, stage)
+    entry["seconds"] += time.perf_counter() - started_at
+    entry["rows"] += rows
+    entry["calls"] += 1
+    # RSS is read where the stage runs, so stages run in parse workers report the worker's memory:
+    # rss_mb is the largest resident size seen at a start or end, rss_delta_mb the largest growth of one call
+    entry["rss_mb"] = max(entry["rss_mb"], started_rss, ended_rss)
+    entry["rss_delta_mb"] = max(entry["rss_delta_mb"], round(ended_rss - started_rss, 1))
+
+def record_date_failures(report: Optional[IngestReport], column: str, failures: int):
+    if report is None or not failures:
+        return
+    counts = report.setdefault(DATE_FAILURES, {})
+    counts[column] = counts.get(column, 0) + failures
+
+def merge_reports(report: Optional[IngestReport], other: Optional[IngestReport]):
+    if report is None or not other:
+        return
+    for stage, stats in other.items():
+        if stage == DATE_FAILURES:
+            for column, failures in stats.items():
+                record_date_failures(report, column, failures)
+            continue
+        entry = _stage_entry(report, stage)
+        entry["seconds"] += stats["seconds"]
+        entry["rows"] += stats["rows"]
+        entry["calls"] += stats["calls"]
+        entry["rss_mb"] = max(entry["rss_mb"], stats["rss_mb"])
+        entry["rss_delta_mb"] = max(entry["rss_delta_mb"], stats["rss_delta_mb"])
+
+def summarize_report(report: IngestReport, wall_seconds: float, rows: int, parse_processes: int) -> Dict[str, Any]:
+    # Stage seconds are summed over parse workers, so with a pool they can add up to more than the wall time
+    stages = {}
+    for stage in [*INGEST_STAGES, *sorted(set(report) - set(INGEST_STAGES) - {DATE_FAILURES})]:
+        if stage not in report:
+            continue
+        entry = dict(report[stage])
+        entry["seconds"] = round(entry["seconds"], 4)
+        entry["rows_per_second"] = round(entry["rows"] / entry["seconds"], 1) if entry["rows"] and entry["seconds"] > 0 else None
+        stages[stage] = entry
+    return {
+        "stages": stages,
+        "wall_seconds": round(wall_seconds, 4),
+        "rows": rows,
+        "rows_per_second": round(rows / wall_seconds, 1) if wall_seconds > 0 else None,
+        "parse_processes": parse_processes,
+        "peak_rss_mb": peak_rss_mb(),
+        "date_failures": dict(report.get(DATE_FAILURES, {})),
+    }
@@ -0,0 +1,63 @@
+# app/utils/phone_normalize.py
+import logging
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import phonenumbers
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+ID_COUNTRY_PREFIX = "+62"
+
+# (leading digits, digits dropped before ID_COUNTRY_PREFIX is prepended, minimum length)
+# _norm_phone_id_logic in streaming-data/spark_apps/transform_reservasi.py applies the same rules and
+# drops the same bare numbers, but keeps "+..." numbers without the phonenumbers check done here
+PHONE_PREFIX_RULES = (
+    ("0", 1, 2),
+    ("8", 0, 1),
+    ("62", 2, 3),
+)
+
+@lru_cache(maxsize=settings.PHONE_NORMALIZE_CACHE_SIZE)
+def _validate_international(number: str) -> str:
+    try:
+        num = phonenumbers.parse(number, None)
+    except phonenumbers.NumberParseException:
+        return ""
+    return number if phonenumbers.is_valid_number(num) else ""
+
+def clean_phone_digits(raw: pd.Series) -> pd.Series:
+    texts = raw.astype(object).where(raw.notna(), "").astype(str)
+    return (
+        texts
+        .str.replace(r"[^0-9+]", "", regex=True)
+        .str.replace(r"(?<!^)\+", "", regex=True)
+        .str.rstrip("+")
+    )
+
+def _normalize_distinct(digits: pd.Series) -> np.ndarray:
+    out = np.full(len(digits), "", dtype=object)
+    pending = (digits != "").to_numpy(dtype=bool)
+
+    for prefix, drop, min_len in PHONE_PREFIX_RULES:
+        hit = pending & (digits.str.startswith(prefix) & (digits.str.len() >= min_len)).to_numpy(dtype=bool)
+        if hit.any():
+            out[hit] = (ID_COUNTRY_PREFIX + digits[hit].str[drop:]).to_numpy(dtype=object)
+            pending &= ~hit
+
+    # Only "+..." numbers no prefix rule covers reach phonenumbers; other bare numbers stay empty
+    pending &= digits.str.startswith("+").to_numpy(dtype=bool)
+    for i in np.flatnonzero(pending):
+        out[i] = _validate_international(digits.iloc[i])
+    return out
+
+def normalize_phone_column(raw: pd.Series) -> pd.Series:
+    # The same numbers repeat across rows, so the rules run once per distinct raw value;
+    # the trailing "" is what factorize's -1 code (a missing cell) indexes
+    codes, uniques = pd.factorize(raw, use_na_sentinel=True)
+    digits = clean_phone_digits(pd.Series(uniques, dtype=object))
+    converted = np.append(_normalize_distinct(digits), np.array([""], dtype=object))
+    return pd.Series(converted[codes], index=raw.index, dtype=object)
@@ -0,0 +1,33 @@
+# tests/conftest.py
+import os
+
+# app.config.settings reads these at import time; the parsers under test never connect to anything
+for name, value in {
+    "PORT": "8000",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_USER": "test",
+    "DB_PASSWORD": "test",
+    "DB_NAME": "test",
+    "JWT_SECRET_KEY": "test",
+    "JWT_EXPIRATION_DAYS": "1",
+    "BCRYPT_COST": "4",
+    "PASSWORD_PEPPER": "test",
+    "COOKIE_NAME": "session",
+    "COOKIE_PATH": "/",
+    "COOKIE_SAMESITE": "lax",
+    "OPENAI_API_KEY": "test",
+    "EXPERIENCE_VS_ID": "test",
+    "GOVERNANCE_VS_ID": "test",
+    "CLICKHOUSE_HOST": "localhost",
+    "CLICKHOUSE_PORT": "8123",
+    "CLICKHOUSE_USER": "test",
+    "CLICKHOUSE_PASSWORD": "test",
+    "CLICKHOUSE_DB": "default",
+    "PREALLOC_TTL_MINUTES_UNCONSUMED": "1",
+    "PREALLOC_TTL_MINUTES_CONSUMED": "1",
+    "PREALLOC_CLEANUP_INTERVAL_MINUTES": "1",
+    "CSV_CLEANUP_INTERVAL_HOURS": "1",
+    "CLICKHOUSE_CLEANUP_INTERVAL_HOURS": "1",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,36 @@
+# tests/test_csv_parse_pool.py
+import io
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import pytest
+
+from app.controllers.csv_parse_tasks import BLOCK_PARSERS, iter_csv_batches_in_pool
+from app.utils.csv_spec import parse_csv
+
+FIXTURE = Path(__file__).parent / "fixtures" / "reservation_sample.csv"
+
+def _rows(batches):
+    rows = []
+    for batch, batch_count in batches:
+        keys = sorted(batch)
+        rows.extend(tuple((key, batch[key][i]) for key in keys) for i in range(batch_count))
+    return rows
+
+@pytest.fixture(scope="module")
+def pool():
+    with ProcessPoolExecutor(max_workers=2, mp_context=get_context("spawn")) as executor:
+        yield executor
+
+@pytest.mark.parametrize("block_bytes", [2048, 7000])
+def test_pool_blocks_match_in_process_parse(pool, block_bytes):
+    data = FIXTURE.read_bytes()
+    expected = _rows(parse_csv(BLOCK_PARSERS["reservation"], io.BytesIO(data), 1, batch_rows=37))
+    pooled = _rows(
+        iter_csv_batches_in_pool(
+            pool, "reservation", io.BytesIO(data), 1, batch_rows=37, lenient=False,
+            block_bytes=block_bytes, max_in_flight=2,
+        )
+    )
+    assert pooled == expected
@@ -0,0 +1,26 @@
+# tests/test_csv_stream.py
+import io
+
+import pytest
+
+from app.utils.csv_stream import CSV_SNIFF_BYTES, read_csv_sample
+
+def _export(body: bytes) -> io.BytesIO:
+    return io.BytesIO(b"id,name\n" + body)
+
+def test_sample_estimates_rows_of_a_large_file():
+    body = b"".join(b"%05d,guest\n" % i for i in range(20_000))
+    sample = read_csv_sample(_export(body), head_rows=10, tail_rows=10)
+    assert not sample["row_count_exact"]
+    assert sample["sampled_rows"] == 20
+    assert sample["row_count"] == pytest.approx(20_000, rel=0.01)
+
+# Past CSV_SNIFF_BYTES of blank lines neither end yields a record to average over
+@pytest.mark.parametrize("body, head_rows, rows", [
+    (b"\n" * (2 * CSV_SNIFF_BYTES), 10, 0),
+    (b"1,a\n" + b"\n" * (2 * CSV_SNIFF_BYTES) + b"2,b\n", 0, 2),
+], ids=["blank-body", "no-head-rows"])
+def test_sample_counts_exactly_without_sampled_records(body, head_rows, rows):
+    sample = read_csv_sample(_export(body), head_rows=head_rows, tail_rows=0)
+    assert sample["row_count_exact"]
+    assert sample["row_count"] == rows
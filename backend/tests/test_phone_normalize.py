@@ -0,0 +1,24 @@
+# tests/test_phone_normalize.py
+import pandas as pd
+import pytest
+
+from app.utils.phone_normalize import normalize_phone_column
+
+# The bare-number cases are the ones _norm_phone_id_logic in the Spark reservation job must agree on;
+# "+..." numbers are only checked with phonenumbers here
+@pytest.mark.parametrize("raw, expected", [
+    ("0812-3456-789", "+628123456789"),
+    ("812 3456 789", "+628123456789"),
+    ("62 812 3456 789", "+628123456789"),
+    ("8", "+628"),
+    ("0", ""),
+    ("62", ""),
+    ("12345", ""),
+    ("+", ""),
+    ("", ""),
+    (None, ""),
+    ("+44 20 7946 0958", "+442079460958"),
+    ("+1 555", ""),
+])
+def test_normalize_phone_column(raw, expected):
+    assert normalize_phone_column(pd.Series([raw], dtype=object)).tolist() == [expected]
@@ -0,0 +1,62 @@
+# tests/test_reservation_converters.py
+import io
+import math
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app.controllers.reservation_controller import RESERVATION_PLAN, RESERVATION_SPEC
+from app.utils.csv_spec import JKT, _to_float_or_none, _to_int_or_none, clean_header, parse_csv
+from app.utils.date_normalize import to_iso_date_str, to_local_midnight
+
+FIXTURE = Path(__file__).parent / "fixtures" / "reservation_sample.csv"
+
+# The per-row helpers the reservation parser used before the column-wise converters
+SCALAR_CONVERTERS = {
+    "int": _to_int_or_none,
+    "float": _to_float_or_none,
+    "iso_date": to_iso_date_str,
+    "local_midnight": lambda raw: to_local_midnight(raw, JKT),
+}
+
+def _headers_by_attr():
+    headers = {}
+    for header, model_attr in RESERVATION_SPEC["header_map"].items():
+        headers.setdefault(model_attr, clean_header(header))
+    return headers
+
+def _expected_columns():
+    df = pd.read_csv(FIXTURE, skiprows=RESERVATION_PLAN["skiprows"], dtype=str, keep_default_na=False)
+    df.columns = df.columns.map(clean_header)
+    df = df[pd.to_numeric(df["Number"], errors="coerce").notna()]
+    headers = _headers_by_attr()
+    return {
+        model_attr: [SCALAR_CONVERTERS[type_name](raw) for raw in df[headers[model_attr]]]
+        for model_attr, type_name in RESERVATION_SPEC["column_types"].items()
+    }
+
+def _parsed_columns(batch_rows):
+    columns = {model_attr: [] for model_attr in RESERVATION_SPEC["column_types"]}
+    for batch, _ in parse_csv(RESERVATION_PLAN, io.BytesIO(FIXTURE.read_bytes()), 1, batch_rows=batch_rows):
+        for model_attr, values in columns.items():
+            values.extend(batch[model_attr])
+    return columns
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or (math.isnan(a) and math.isnan(b))
+    return a == b and type(a) is type(b)
+
+@pytest.mark.parametrize("batch_rows", [None, 500, 37, 7])
+def test_column_converters_match_scalar_helpers(batch_rows):
+    expected = _expected_columns()
+    parsed = _parsed_columns(batch_rows)
+    for model_attr, values in expected.items():
+        assert len(parsed[model_attr]) == len(values), model_attr
+        mismatches = [
+            (index, raw, got)
+            for index, (raw, got) in enumerate(zip(values, parsed[model_attr]))
+            if not _same(raw, got)
+        ]
+        assert not mismatches, f"{model_attr}: {mismatches[:5]}"
@@ -0,0 +1,42 @@
+# tests/test_row_fingerprint.py
+import hashlib
+
+from app.utils.row_fingerprint import FINGERPRINT_SIZE, fingerprint_batch
+
+BATCH = {
+    "name": ["Ann", "Ann", None],
+    "guest_id": ["1", "1", "2"],
+    "email": ["a@x.id", "a@x.id", None],
+}
+CONTENT = ("email", "guest_id", "name")
+KEY = ("name", "guest_id")
+
+def _canonical_digest(values, person: bytes) -> bytes:
+    # Each value is its UTF-8 text hashed to 8 bytes, a missing value is 8 zero bytes
+    words = b"".join(
+        bytes(8) if value is None else hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        for value in values
+    )
+    return hashlib.blake2b(words, digest_size=FINGERPRINT_SIZE, person=person).digest()
+
+def test_fingerprints_follow_the_canonical_encoding():
+    row_hashes, key_hashes = fingerprint_batch("profile_guest", BATCH, CONTENT, KEY, 3)
+    for position in range(3):
+        content = [BATCH[column][position] for column in CONTENT]
+        key = [BATCH[column][position] for column in KEY]
+        assert row_hashes[position] == _canonical_digest(content, b"row:profile_gues")
+        assert key_hashes[position] == _canonical_digest(key, b"key:profile_gues")
+
+def test_fingerprints_are_pinned():
+    # Stored fingerprints are compared across uploads, so these values must never change
+    row_hashes, key_hashes = fingerprint_batch("profile_guest", BATCH, CONTENT, KEY, 3)
+    assert [h.hex() for h in row_hashes] == [
+        "240177f6534c24eea375e6d58b092bf0",
+        "240177f6534c24eea375e6d58b092bf0",
+        "4e7f7b47cf60da978bcb9d91dcf11938",
+    ]
+    assert [h.hex() for h in key_hashes] == [
+        "d5d3fe96c2a6b175080565f73773980c",
+        "d5d3fe96c2a6b175080565f73773980c",
+        "c7a9fa07cc0bb9dde4e1fb7882e704e0",
+    ]
@@ -0,0 +1,68 @@
+-- Expands every row written to reservations_transformed into its stay dates, arrival through
+-- depart inclusive as the analytics queries always counted them. Stays are capped at 1000
+-- nights so a mistyped year cannot blow up an insert. room_type_desc stays NULL when room_type
+-- is, so argMax skips those rows the way it skips a NULL room_type in datamart_reservations.
+CREATE MATERIALIZED VIEW IF NOT EXISTS default.mv_reservation_nights
+TO default.reservation_nights
+AS
+SELECT
+    toDate(arrival_date) + night AS stay_date,
+    id,
+    csv_upload_id,
+    guest_name,
+    arrival_date,
+    depart_date,
+    room_number,
+    reservation_id,
+    room_type,
+    CASE
+        WHEN room_type IS NULL THEN NULL
+        WHEN room_type = '' THEN ''
+        WHEN startsWith(upper(room_type), 'FS') THEN 'Family Suite'
+        WHEN startsWith(upper(room_type), 'D')  THEN 'Deluxe'
+        WHEN startsWith(upper(room_type), 'E')  THEN 'Executive Suite'
+        WHEN startsWith(upper(room_type), 'J')  THEN 'Executive Suite'
+        WHEN startsWith(upper(room_type), 'B')  THEN 'Suite'
+        ELSE ''
+    END AS room_type_desc,
+    segment,
+    nationality,
+    local_region,
+    age,
+    room_rate,
+    deleted_at,
+    version
+FROM default.reservations_transformed
+ARRAY JOIN range(toUInt32(least(greatest(dateDiff('day', toDate(arrival_date), toDate(depart_date)) + 1, 0), 1000))) AS night;
+
+-- Backfill once, right after creating the view, for rows written before it existed
+INSERT INTO default.reservation_nights
+SELECT
+    toDate(arrival_date) + night AS stay_date,
+    id,
+    csv_upload_id,
+    guest_name,
+    arrival_date,
+    depart_date,
+    room_number,
+    reservation_id,
+    room_type,
+    CASE
+        WHEN room_type IS NULL THEN NULL
+        WHEN room_type = '' THEN ''
+        WHEN startsWith(upper(room_type), 'FS') THEN 'Family Suite'
+        WHEN startsWith(upper(room_type), 'D')  THEN 'Deluxe'
+        WHEN startsWith(upper(room_type), 'E')  THEN 'Executive Suite'
+        WHEN startsWith(upper(room_type), 'J')  THEN 'Executive Suite'
+        WHEN startsWith(upper(room_type), 'B')  THEN 'Suite'
+        ELSE ''
+    END AS room_type_desc,
+    segment,
+    nationality,
+    local_region,
+    age,
+    room_rate,
+    deleted_at,
+    version
+FROM default.reservations_transformed FINAL
+ARRAY JOIN range(toUInt32(least(greatest(dateDiff('day', toDate(arrival_date), toDate(depart_date)) + 1, 0), 1000))) AS night;
@@ -0,0 +1,26 @@
+-- One row per reservations_transformed row and stay date, filled by mv_reservation_nights.
+-- Rows of one id share a key with every later version of that id, so a soft delete or a
+-- rehomed csv_upload_id replaces the nights it was expanded into.
+CREATE TABLE IF NOT EXISTS default.reservation_nights (
+    stay_date        Date,
+    id               Int32,
+    csv_upload_id    Int32,
+    guest_name       Nullable(String),
+    arrival_date     DateTime64(3),
+    depart_date      DateTime64(3),
+    room_number      String,
+    reservation_id   Nullable(Int32),
+    room_type        Nullable(String),
+    room_type_desc   Nullable(String),
+    segment          Nullable(String),
+    nationality      Nullable(String),
+    local_region     Nullable(String),
+    age              Nullable(Int32),
+    room_rate        Nullable(Decimal(18,2)),
+    deleted_at       Nullable(DateTime64(3)),
+    version          UInt32
+)
+ENGINE = ReplacingMergeTree(version)
+PARTITION BY toYYYYMM(stay_date)
+ORDER BY (stay_date, id)
+SETTINGS index_granularity = 8192;
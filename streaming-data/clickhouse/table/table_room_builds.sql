@@ -0,0 +1,12 @@
+-- Mirror of the Postgres room_builds table. The backend writes a full snapshot after every
+-- room build change and on startup; the highest version of each room_build_id wins.
+CREATE TABLE IF NOT EXISTS default.room_builds (
+    room_build_id    Int32,
+    built_date       Date,
+    room_count       Int32,
+    room_type_desc   String,
+    version          UInt64
+)
+ENGINE = ReplacingMergeTree(version)
+ORDER BY room_build_id
+SETTINGS index_granularity = 8192;
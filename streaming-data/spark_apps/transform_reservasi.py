@@ -188,8 +188,15 @@ def _guest_id_fallback(df):
 def _norm_phone_id_logic(c):
     s = regexp_replace(_nz(c).cast("string"), r"[^0-9+]", "")
     s = regexp_replace(s, r"(?<!^)\+", "")
-    s = when(_is_blank(s), lit(None).cast("string")).otherwise(s)
-    s = when((s.isNotNull()) & s.rlike(r"^62[0-9]+$"), concat_ws("", lit("+"), s)).otherwise(s)
+    s = when(_is_blank(s) | s.isin("0", "+"), lit(None).cast("string")).otherwise(s)
+    # Same prefix rules as PHONE_PREFIX_RULES in backend/app/utils/phone_normalize.py; other bare numbers
+    # are dropped there too. "+..." numbers are kept as they are: the backend also checks them with
+    # phonenumbers, which this job does not ship
+    s = when((s.isNotNull()) & s.rlike(r"^0[0-9]+$"), concat_ws("", lit("+62"), substring(s, 2, 1000))) \
+        .when((s.isNotNull()) & s.rlike(r"^8[0-9]*$"), concat_ws("", lit("+62"), s)) \
+        .when((s.isNotNull()) & s.rlike(r"^62[0-9]+$"), concat_ws("", lit("+"), s)) \
+        .when((s.isNotNull()) & s.startswith("+"), s) \
+        .otherwise(lit(None).cast("string"))
     return s
 
 def run(spark: SparkSession, kafka_bootstrap: str, source_topic: str, sink_topic: str, checkpoint: str):